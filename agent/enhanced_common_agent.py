@@ -1,16 +1,27 @@
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 from difflib import SequenceMatcher
 
 from nice_ui.configure.signal import data_bridge
+from services.config_manager import get_target_multiplier, get_token_chunking_config, get_translate_concurrency
 from utils import logger
 from utils.agent_dict import agent_settings, AgentConfig
 
 from .srt_translator_adapter import create_trans_compatible_data
+from .token_budget import create_chunk_budget, estimate_tokens, get_chunk_tuner
+from .translation_checkpoint import (TranslationCheckpoint, checkpoint_path, chunk_hash, default_checkpoint_dir,
+                                     entries_hash, prune_checkpoints)
 from .translator import Translator, search_things_to_note_in_prompt
 from .terminology_manager import TerminologyManager
 
 
+# 每块提示词中上下文的行数（前3行、后2行）
+CONTEXT_LINES = 5
+# 每块提示词中术语注意事项的token余量
+TERMS_ALLOWANCE = 300
+
+
 def similar(a, b):
     """计算相似度"""
     return SequenceMatcher(None, a, b).ratio()
@@ -36,6 +47,8 @@ class DocumentTranslator:
         self.theme_prompt = None
         self.adapter = None
         self.compat_data = None
+        self.chunk_tuner = None  # 按token预算切分时，根据校验失败和耗时调整下一次切分的块大小
+        self.checkpoint: Optional[TranslationCheckpoint] = None  # 翻译断点，已完成的块不再翻译
     
     def _load_srt_content(self, in_document: str) -> str:
         """加载SRT文件内容"""
@@ -70,88 +83,214 @@ class DocumentTranslator:
         # 创建翻译器
         self.translator = Translator(agent, self.target_language, self.source_language)
         self.translator.terminology_manager = terminology_manager
+
+        if get_token_chunking_config().get('enabled', False):
+            self.chunk_tuner = get_chunk_tuner(agent)
+            self._split_by_token_budget(agent)
+
+    def _split_by_token_budget(self, agent: AgentConfig):
+        """按模型的token预算重新切分翻译块，代替chunk_size和max_entries，每块的行数不超过token_chunking.max_lines"""
+        entries = self.compat_data['original_entries']
+        if not entries:
+            return
+        # 提示词开销：模板、主题、注意事项，加上前后各几行上下文和术语的余量
+        average_line = sum(estimate_tokens(entry.text) for entry in entries) / len(entries)
+        overhead = (self.translator.prompt_overhead_tokens(self.theme_prompt, '')
+                    + int(CONTEXT_LINES * average_line) + TERMS_ALLOWANCE)
+        budget = create_chunk_budget(agent, overhead, output_ratio=get_target_multiplier())
+
+        self._set_entry_chunks(self.adapter.split_entries_into_chunks(entries, budget=budget))
+
+    def _set_entry_chunks(self, entry_chunks: List):
+        self.compat_data['entry_chunks'] = entry_chunks
+        self.compat_data['text_chunks'] = self.adapter.entries_to_text_chunks(entry_chunks)
+
+    def _open_checkpoint(self, srt_content: str, checkpoint_dir: Optional[str] = None):
+        """
+        读取翻译断点，同一份字幕按上次的方式切分，使已完成的块能够对应
+        断点按字幕内容和API配置查找，重新添加同一个文件的翻译任务也能继续上次的进度
+
+        Args:
+            srt_content: 待翻译的字幕文件内容
+            checkpoint_dir: 断点目录，默认为项目tmp目录下的translation_checkpoints
+        """
+        if checkpoint_dir is None:
+            checkpoint_dir = default_checkpoint_dir()
+        prune_checkpoints(checkpoint_dir)
+        agent = self.translator.agent
+        agent_key = f'{agent.base_url}|{agent.model}'
+        path = checkpoint_path(srt_content, agent_key, self.target_language, checkpoint_dir)
+        self.checkpoint = TranslationCheckpoint(path, agent_key)
+        self.checkpoint.load()
+
+        entries = self.compat_data['original_entries']
+        texts_hash = entries_hash([entry.text for entry in entries])
+        chunk_sizes = self.checkpoint.layout_for(texts_hash)
+        if chunk_sizes and sum(chunk_sizes) == len(entries):
+            entry_chunks, start = [], 0
+            for size in chunk_sizes:
+                entry_chunks.append(entries[start:start + size])
+                start += size
+            self._set_entry_chunks(entry_chunks)
+            logger.info(f"按翻译断点中的方式切分为 {len(entry_chunks)} 个翻译块")
+        else:
+            self.checkpoint.save_layout(texts_hash, [len(chunk) for chunk in self.compat_data['entry_chunks']])
     
-    def _translate_chunks(self, unid: str, sleep_time: int) -> List:
-        """翻译所有文本块"""
+    def _translate_chunks(self, unid: str, concurrency: int = 1) -> List:
+        """
+        翻译所有文本块
+
+        多个块并发翻译，请求速率由ask_gpt中按API配置共享的令牌桶限制。
+        返回结果按块顺序排列
+
+        Args:
+            unid: 任务ID
+            concurrency: 同时翻译的块数
+        """
         text_chunks = self.compat_data['text_chunks']
         entry_chunks = self.compat_data['entry_chunks']
         duration = len(text_chunks)
-        
-        logger.info(f"共{duration}个翻译块，开始翻译...")
-        
-        results = []
-        for i, chunk_text in enumerate(text_chunks):
-            try:
-                # 获取上下文
-                previous_context, after_context = self.adapter.get_context_for_chunk(entry_chunks, i)
+        concurrency = max(1, min(concurrency, duration))
 
-                # 直接调用翻译函数
-                result = self._translate_chunk(
-                    chunk_text, previous_context, after_context, i
-                )
-                results.append(result)
+        logger.info(f"共{duration}个翻译块，并发数{concurrency}，开始翻译...")
 
-                progress_now = int((i + 1) / duration * 100)
-                data_bridge.emit_whisper_working(unid, progress_now)
-                logger.info(f"翻译进度: {i + 1}/{duration}")
+        # 每行译文接收完整后立即发送，任务列表显示最新译文
+        offsets = [0]
+        for chunk_entries in entry_chunks:
+            offsets.append(offsets[-1] + len(chunk_entries))
+        self.translator.line_callback = lambda chunk, line, text: data_bridge.emit_translation_line(
+            unid, offsets[chunk] + line, text)
 
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+        # 断点中已完成的块直接使用
+        results = [None] * duration
+        keys = [None] * duration
+        if self.checkpoint is not None:
+            scope = self.translator.memory_scope()
+            for i, text in enumerate(text_chunks):
+                keys[i] = chunk_hash(text, scope)
+                translation = self.checkpoint.get(keys[i])
+                if translation is not None:
+                    results[i] = (i, text, translation)
+        restored = sum(result is not None for result in results)
+        if restored:
+            logger.info(f"从翻译断点恢复 {restored}/{duration} 个块")
+            data_bridge.emit_whisper_working(unid, int(restored / duration * 100))
 
+        def translate_at(i: int) -> tuple:
+            # 获取上下文
+            previous_context, after_context = self.adapter.get_context_for_chunk(entry_chunks, i)
+            result = self._translate_chunk(text_chunks[i], previous_context, after_context, i)
+            if self.checkpoint is not None:
+                self.checkpoint.put(keys[i], result[2])
+            return result
+
+        pending = [i for i in range(duration) if results[i] is None]
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'translate-{unid[:8]}') as executor:
+            futures = {executor.submit(translate_at, i): i for i in pending}
+            try:
+                # 进度只在当前线程发送，保证进度单调递增
+                for done, future in enumerate(as_completed(futures), restored + 1):
+                    results[futures[future]] = future.result()
+                    data_bridge.emit_whisper_working(unid, int(done / duration * 100))
+                    logger.info(f"翻译进度: {done}/{duration}")
             except Exception as e:
                 logger.error(f"Translation task failed: {e}")
+                for future in futures:
+                    future.cancel()
+                if self.checkpoint is not None:
+                    logger.info(f"已完成的块保存在翻译断点中，重新翻译时跳过: {self.checkpoint.path}")
                 raise e
-        
+
         return results
     
     def _translate_chunk(self, chunk_text: str, previous_context: List[str], 
                         after_context: List[str], chunk_index: int) -> tuple:
         """翻译单个文本块"""
         try:
-            # 使用术语管理器搜索相关术语
-            if hasattr(self.translator, 'terminology_manager') and self.translator.terminology_manager:
-                things_to_note_prompt = self.translator.terminology_manager.search_terms_in_sentence(
-                    chunk_text) or "Please pay attention to technical terms, proper nouns, and maintain consistency in translation style."
-            else:
-                # 回退到原始方法
-                things_to_note_prompt = search_things_to_note_in_prompt()
-
-            translation, original = self.translator.translate_lines(
+            translation = self._translate_text(chunk_text, previous_context, after_context, chunk_index)
+            return chunk_index, chunk_text, translation
+
+        except Exception as e:
+            logger.error(f"Enhanced translation error for chunk {chunk_index}: {e}")
+            raise e
+
+    def _translate_text(self, chunk_text: str, previous_context: List[str],
+                        after_context: List[str], chunk_index: int, line_offset: int = 0) -> str:
+        """
+        翻译文本，按token预算切分时，校验失败的块对半拆分后分别重试。
+        文档在翻译前已经切分好，ChunkTuner记录的失败和耗时只影响之后翻译的文档的切分
+
+        Args:
+            line_offset: 拆分后的文本在块中的起始行号
+        """
+        # 使用术语管理器搜索相关术语
+        if hasattr(self.translator, 'terminology_manager') and self.translator.terminology_manager:
+            things_to_note_prompt = self.translator.terminology_manager.search_terms_in_sentence(
+                chunk_text) or "Please pay attention to technical terms, proper nouns, and maintain consistency in translation style."
+        else:
+            # 回退到原始方法
+            things_to_note_prompt = search_things_to_note_in_prompt()
+
+        start = time.monotonic()
+        try:
+            translation, _ = self.translator.translate_lines(
                 chunk_text,
                 previous_context,
                 after_context,
                 things_to_note_prompt,
                 self.theme_prompt,
-                chunk_index
+                chunk_index,
+                line_offset
             )
+        except ValueError as e:
+            lines = chunk_text.split('\n')
+            if self.chunk_tuner is None or len(lines) < 2:
+                raise
+            self.chunk_tuner.record_failure()
+            half = len(lines) // 2
+            logger.warning(f"Chunk {chunk_index} failed validation, retrying as {half}+{len(lines) - half} lines: {e}")
+            first = self._translate_text('\n'.join(lines[:half]), previous_context, lines[half:half + 2], chunk_index,
+                                         line_offset)
+            second = self._translate_text('\n'.join(lines[half:]), lines[max(0, half - 3):half], after_context,
+                                          chunk_index, line_offset + half)
+            return first + '\n' + second
 
-            return chunk_index, original, translation
+        if self.chunk_tuner is not None:
+            self.chunk_tuner.record_success(time.monotonic() - start)
+        return translation
 
-        except Exception as e:
-            logger.error(f"Enhanced translation error for chunk {chunk_index}: {e}")
-            raise e
-    
     def _match_translations_to_entries(self, results: List) -> List[str]:
-        """将翻译结果匹配到原始条目"""
+        """
+        将翻译结果匹配到原始条目
+
+        results中的每一项为(块序号, 原文, 译文)，按块序号直接对应，不再逐块比较相似度；
+        相似度只在原文与块内容不一致时用于诊断
+        """
         entry_chunks = self.compat_data['entry_chunks']
         text_chunks = self.compat_data['text_chunks']
-        
-        # results 已经按照顺序处理，不需要排序
-        
-        all_translations = []
-        for i, chunk_entries in enumerate(entry_chunks):
-            chunk_text = text_chunks[i]
 
-            # 找到匹配的翻译结果
-            matching_results = [(r, similar(''.join(r[1].split('\n')).lower(), chunk_text.lower()))
-                                for r in results]
-            best_match = max(matching_results, key=lambda x: x[1])
+        # 完整性检查：每个块恰好有一个结果
+        by_index = {}
+        for result in results:
+            if result is None:
+                continue
+            if result[0] in by_index:
+                raise ValueError(f"Duplicate translation result for chunk {result[0]}")
+            by_index[result[0]] = result
+        missing = [i for i in range(len(entry_chunks)) if i not in by_index]
+        if missing or len(by_index) != len(entry_chunks):
+            raise ValueError(f"Translation results incomplete: missing chunks {missing[:10]}, "
+                             f"got {len(by_index)} results for {len(entry_chunks)} chunks")
 
-            if best_match[1] < 0.8:
-                logger.warning(f"Low similarity match for chunk {i}: {best_match[1]:.3f}")
+        all_translations = []
+        for i, chunk_entries in enumerate(entry_chunks):
+            _, original, translation = by_index[i]
+            if original != text_chunks[i]:
+                ratio = similar(original.lower(), text_chunks[i].lower())
+                logger.warning(f"Translation result for chunk {i} has different source text, similarity: {ratio:.3f}")
 
             # 将翻译结果分割并匹配到各个条目
-            translation_lines = best_match[0][2].split('\n')
+            translation_lines = translation.split('\n')
 
             if len(translation_lines) != len(chunk_entries):
                 logger.warning(f"Translation lines count mismatch for chunk {i}: {len(translation_lines)} vs {len(chunk_entries)}")
@@ -161,9 +300,9 @@ class DocumentTranslator:
                 translation_lines = translation_lines[:len(chunk_entries)]
 
             all_translations.extend(translation_lines)
-        
+
         return all_translations
-    
+
     def _save_translated_srt(self, all_translations: List[str], out_document: str):
         """保存翻译后的SRT文件"""
         original_entries = self.compat_data['original_entries']
@@ -176,7 +315,7 @@ class DocumentTranslator:
             output_file.write(final_srt)
     
     def translate(self, unid: str, in_document: str, out_document: str,
-                 chunk_size: int = 600, max_entries: int = 10, sleep_time: int = 1):
+                 chunk_size: int = 600, max_entries: int = 10, concurrency: Optional[int] = None):
         """
         执行翻译
         
@@ -186,9 +325,11 @@ class DocumentTranslator:
             out_document: 输出SRT文件路径
             chunk_size: 每个块的字符数限制
             max_entries: 每个块的最大条目数
-            sleep_time: 翻译间隔时间
+            concurrency: 同时翻译的块数，默认读取translator.concurrency配置
         """
-        logger.info(f'翻译开始 - chunk_size: {chunk_size}, max_entries: {max_entries}')
+        if concurrency is None:
+            concurrency = get_translate_concurrency()
+        logger.info(f'翻译开始 - chunk_size: {chunk_size}, max_entries: {max_entries}, concurrency: {concurrency}')
 
         try:
             # 1. 加载和准备数据
@@ -197,18 +338,22 @@ class DocumentTranslator:
             
             # 2. 设置翻译器
             self._setup_translator()
-            
+            self._open_checkpoint(srt_content)
+
             # 3. 执行翻译
-            results = self._translate_chunks(unid, sleep_time)
+            results = self._translate_chunks(unid, concurrency)
             
             # 4. 匹配翻译结果
             all_translations = self._match_translations_to_entries(results)
             
             # 5. 保存结果
             self._save_translated_srt(all_translations, out_document)
+            self.checkpoint.remove()
 
             data_bridge.emit_whisper_finished(unid)
             logger.info("翻译完成")
+            if self.translator.translation_memory is not None:
+                logger.info(f"翻译记忆统计: {self.translator.translation_memory.stats()}")
             
         except Exception as e:
             logger.error(f"翻译过程出错: {e}")
@@ -218,9 +363,9 @@ class DocumentTranslator:
 def translate_document(unid: str, in_document: str, out_document: str,
                        agent_name: str,
                        chunk_size: int = 600, max_entries: int = 10,
-                       sleep_time: int = 1,
                        target_language: str = "中文",
-                       source_language: str = "English"):
+                       source_language: str = "English",
+                       concurrency: Optional[int] = None):
     """
     翻译SRT文件（兼容性函数）
     
@@ -231,12 +376,12 @@ def translate_document(unid: str, in_document: str, out_document: str,
         agent_name: API提供方名称
         chunk_size: 每个块的字符数限制
         max_entries: 每个块的最大条目数
-        sleep_time: 翻译间隔时间
         target_language: 目标语言
         source_language: 源语言
+        concurrency: 同时翻译的块数，默认读取配置
     """
     translator = DocumentTranslator(agent_name, target_language, source_language)
-    translator.translate(unid, in_document, out_document, chunk_size, max_entries, sleep_time)
+    translator.translate(unid, in_document, out_document, chunk_size, max_entries, concurrency)
 
 
 
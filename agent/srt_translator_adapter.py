@@ -4,6 +4,7 @@ from typing import List, Dict, Tuple, Optional
 
 from utils import logger
 from services.config_manager import get_summary_length
+from .token_budget import ChunkBudget
 
 
 @dataclass
@@ -46,8 +47,20 @@ class SRTTranslatorAdapter:
         return entries
 
     @staticmethod
-    def split_entries_into_chunks(entries: List[SRTEntry], chunk_size: int = 600, max_entries: int = 10) -> List[List[SRTEntry]]:
-        """将SRT条目分割为适合翻译的块"""
+    def split_entries_into_chunks(entries: List[SRTEntry], chunk_size: int = 600, max_entries: int = 10,
+                                  budget: Optional[ChunkBudget] = None) -> List[List[SRTEntry]]:
+        """
+        将SRT条目分割为适合翻译的块
+
+        Args:
+            entries: SRT条目
+            chunk_size: 每块的字符数限制
+            max_entries: 每块的最大条目数
+            budget: token预算，提供时按token数切分，代替chunk_size和max_entries
+        """
+        if budget is not None:
+            return SRTTranslatorAdapter.split_entries_by_budget(entries, budget)
+
         chunks = []
         current_chunk = []
         current_length = 0
@@ -71,6 +84,32 @@ class SRTTranslatorAdapter:
         logger.info(f"分割为 {len(chunks)} 个翻译块")
         return chunks
 
+    @staticmethod
+    def split_entries_by_budget(entries: List[SRTEntry], budget: ChunkBudget) -> List[List[SRTEntry]]:
+        """按token预算切分：每块的输入和输出token数、行数都不超过预算"""
+        chunks = []
+        current_chunk = []
+        input_tokens = output_tokens = 0
+        input_limit, output_limit, line_limit = budget.input_limit, budget.output_limit, budget.line_limit
+
+        for entry in entries:
+            entry_input, entry_output = budget.line_cost(entry.text)
+            if current_chunk and (input_tokens + entry_input > input_limit or
+                                  output_tokens + entry_output > output_limit or
+                                  len(current_chunk) >= line_limit):
+                chunks.append(current_chunk)
+                current_chunk = []
+                input_tokens = output_tokens = 0
+            current_chunk.append(entry)
+            input_tokens += entry_input
+            output_tokens += entry_output
+
+        if current_chunk:
+            chunks.append(current_chunk)
+
+        logger.info(f"按token预算分割为 {len(chunks)} 个翻译块，每块最多输出 {output_limit} tokens、{line_limit} 行")
+        return chunks
+
     @staticmethod
     def entries_to_text_chunks(entry_chunks: List[List[SRTEntry]]) -> List[str]:
         """将SRT条目块转换为纯文本块"""
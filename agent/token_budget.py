@@ -0,0 +1,170 @@
+"""
+按token预算切分翻译块
+- 估算token数：安装了tiktoken时使用cl100k_base，否则按字符类型估算（中日韩文字约每字1个token，拉丁文字约每词1个token）
+- 每块的输入（字幕原文两遍 + JSON格式示例 + 提示词模板和上下文）不超过模型上下文，
+  输出（原文回显 + 直译 + 意译 + JSON结构）不超过模型最大输出的一定比例
+- ChunkTuner 按API配置记录校验失败和耗时，调整之后切分时的块大小：失败时缩小，耗时过长时缩小，连续成功后逐步恢复
+"""
+import importlib.util
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from services.config_manager import get_token_chunking_config
+from utils import logger
+from utils.agent_dict import AgentConfig
+
+TIKTOKEN_AVAILABLE = importlib.util.find_spec('tiktoken') is not None
+
+# 常见模型的(上下文token数, 最大输出token数)，配置中的token_chunking.models可以覆盖
+MODEL_LIMITS: Dict[str, Tuple[int, int]] = {
+    'qwen-plus': (131072, 8192),
+    'moonshot-v1-8k': (8192, 4096),
+    'glm-4': (128000, 4096),
+    'deepseek-chat': (65536, 8192),
+}
+DEFAULT_LIMITS = (8192, 4096)
+
+# 每行在提示词JSON示例中的结构开销（键、origin/direct/free字段名和占位文本）
+LINE_PROMPT_OVERHEAD = 30
+# 每行在响应JSON中的结构开销
+LINE_RESPONSE_OVERHEAD = 20
+# 输出只使用最大输出token数的这一比例，估算有误差时不会被截断
+OUTPUT_SAFETY = 0.75
+
+_CJK = re.compile(r'[⺀-鿿가-힯豈-﫿＀-￯]')
+_WORD = re.compile(r'[A-Za-zÀ-ɏЀ-ӿ]+|\d|[^\sA-Za-z\d]')
+
+_encoder = None
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数"""
+    global _encoder
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        if _encoder is None:
+            import tiktoken
+            _encoder = tiktoken.get_encoding('cl100k_base')
+        return len(_encoder.encode(text))
+
+    cjk = len(_CJK.findall(text))
+    rest = _CJK.sub(' ', text)
+    tokens = cjk
+    for word in _WORD.findall(rest):
+        # 长单词会被切成多个token
+        tokens += 1 + len(word) // 8
+    return tokens
+
+
+@dataclass
+class ChunkBudget:
+    """一个翻译块的token预算"""
+    context_tokens: int
+    max_output_tokens: int
+    prompt_overhead: int  # 提示词模板、上下文、主题和注意事项
+    output_ratio: float = 1.2  # 译文与原文的token数之比
+    max_lines: int = 40  # 每块最多行数，行数过多时模型容易漏行
+    scale: float = 1.0  # 动态调整系数
+
+    @property
+    def input_limit(self) -> int:
+        return self.context_tokens - self.max_output_tokens - self.prompt_overhead
+
+    @property
+    def output_limit(self) -> int:
+        return int(self.max_output_tokens * OUTPUT_SAFETY * self.scale)
+
+    @property
+    def line_limit(self) -> int:
+        return max(1, int(self.max_lines * self.scale))
+
+    def line_cost(self, text: str) -> Tuple[int, int]:
+        """一行字幕的(输入, 输出)token数"""
+        source = estimate_tokens(text)
+        # 输入：<subtitles>中一遍，JSON示例的origin中一遍
+        input_tokens = 2 * source + LINE_PROMPT_OVERHEAD
+        # 输出：origin回显、直译、意译
+        output_tokens = source + math.ceil(2 * source * self.output_ratio) + LINE_RESPONSE_OVERHEAD
+        return input_tokens, output_tokens
+
+
+class ChunkTuner:
+    """按运行时的校验失败和耗时调整块大小"""
+
+    def __init__(self, target_latency: float = 60.0, min_scale: float = 0.25):
+        """
+        Args:
+            target_latency: 每块期望的最长耗时（秒），超过时缩小块
+            min_scale: 最小调整系数
+        """
+        self.target_latency = target_latency
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self.lock = threading.Lock()
+
+    def record_failure(self) -> float:
+        """块校验失败（漏行、JSON不完整），缩小块"""
+        with self.lock:
+            self.scale = max(self.min_scale, self.scale * 0.7)
+            logger.info(f"翻译块校验失败，块大小系数调整为 {self.scale:.2f}")
+            return self.scale
+
+    def record_success(self, latency: float) -> float:
+        """块翻译成功，耗时过长时缩小块，否则逐步恢复"""
+        with self.lock:
+            if latency > self.target_latency:
+                self.scale = max(self.min_scale, self.scale * self.target_latency / latency)
+                logger.info(f"翻译块耗时{latency:.1f}秒，块大小系数调整为 {self.scale:.2f}")
+            else:
+                self.scale = min(1.0, self.scale * 1.05)
+            return self.scale
+
+
+_tuners: Dict[Tuple[str, str], ChunkTuner] = {}
+_tuners_lock = threading.Lock()
+
+
+def get_chunk_tuner(agent: AgentConfig) -> ChunkTuner:
+    """获取API配置对应的块大小调整器，同一个模型的多个翻译任务共用"""
+    key = (agent.base_url, agent.model)
+    with _tuners_lock:
+        if key not in _tuners:
+            _tuners[key] = ChunkTuner(target_latency=get_token_chunking_config().get('target_latency', 60))
+        return _tuners[key]
+
+
+def model_limits(model: str) -> Tuple[int, int]:
+    """模型的(上下文token数, 最大输出token数)"""
+    configured = get_token_chunking_config().get('models') or {}
+    if model in configured:
+        limits = configured[model]
+        return int(limits['context_tokens']), int(limits['max_output_tokens'])
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+
+def create_chunk_budget(agent: AgentConfig, prompt_overhead: int, output_ratio: float = 1.2,
+                        scale: Optional[float] = None) -> ChunkBudget:
+    """
+    按模型限制创建块预算
+
+    Args:
+        agent: API配置
+        prompt_overhead: 提示词中与字幕无关部分的token数
+        output_ratio: 译文与原文的token数之比
+        scale: 调整系数，默认使用该模型ChunkTuner的当前值
+    """
+    context_tokens, max_output_tokens = model_limits(agent.model)
+    if scale is None:
+        scale = get_chunk_tuner(agent).scale
+    return ChunkBudget(
+        context_tokens=context_tokens,
+        max_output_tokens=max_output_tokens,
+        prompt_overhead=prompt_overhead,
+        output_ratio=output_ratio,
+        max_lines=get_token_chunking_config().get('max_lines', 40),
+        scale=scale,
+    )
@@ -0,0 +1,154 @@
+"""
+文档翻译断点
+每个块翻译完成后追加一行JSON到断点目录下的 <键>.checkpoint.jsonl，
+翻译中途失败或程序退出后重新翻译同一份字幕时（即使是新建的任务，任务ID和输出目录都不同），只翻译没有完成的块；
+翻译全部完成后删除断点文件
+
+- 断点文件按 (字幕原文内容, API配置, 目标语言) 的哈希命名，与任务ID和输出路径无关
+- 块的键为块原文和翻译范围（语言、模型、提示词版本）的哈希，原文或设置变化的块重新翻译
+- 同时保存块的切分方式，恢复时按原来的方式切分，块的键才能对应
+- 超过CHECKPOINT_MAX_AGE_DAYS天没有更新的断点文件在打开断点时清理
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from utils import logger
+
+CHECKPOINT_SUFFIX = '.checkpoint.jsonl'
+CHECKPOINT_MAX_AGE_DAYS = 7
+
+
+def default_checkpoint_dir() -> Path:
+    """断点文件目录：项目tmp目录下，不随任务输出目录变化"""
+    from nice_ui.configure import config
+    return Path(config.root_path) / 'tmp' / 'translation_checkpoints'
+
+
+def checkpoint_path(srt_content: str, agent_key: str, target_language: str,
+                    checkpoint_dir: Optional[Union[str, Path]] = None) -> Path:
+    """
+    断点文件路径
+
+    Args:
+        srt_content: 待翻译的字幕文件内容
+        agent_key: API配置（base_url|model）
+        target_language: 目标语言
+        checkpoint_dir: 断点目录，默认为default_checkpoint_dir()
+    """
+    digest = hashlib.sha1()
+    for part in (srt_content, agent_key, target_language):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    directory = Path(checkpoint_dir) if checkpoint_dir is not None else default_checkpoint_dir()
+    return directory / f"{digest.hexdigest()}{CHECKPOINT_SUFFIX}"
+
+
+def prune_checkpoints(checkpoint_dir: Union[str, Path], max_age_days: float = CHECKPOINT_MAX_AGE_DAYS) -> int:
+    """删除长时间没有更新的断点文件（放弃重新翻译的任务），返回删除数量"""
+    directory = Path(checkpoint_dir)
+    if not directory.is_dir():
+        return 0
+    expire_before = time.time() - max_age_days * 86400
+    removed = 0
+    for path in directory.glob(f'*{CHECKPOINT_SUFFIX}'):
+        try:
+            if path.stat().st_mtime < expire_before:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"清理过期翻译断点 {removed} 个")
+    return removed
+
+
+def chunk_hash(text: str, scope: Dict[str, str]) -> str:
+    """块的键：原文和翻译范围的哈希"""
+    payload = json.dumps([text, scope], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def entries_hash(texts: List[str]) -> str:
+    """整个文件字幕原文的哈希，用于判断切分方式是否仍然适用"""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class TranslationCheckpoint:
+    """追加写入的文档翻译断点"""
+
+    def __init__(self, path: Path, agent_key: str):
+        """
+        Args:
+            path: 断点文件路径
+            agent_key: API配置（base_url|model）
+        """
+        self.path = Path(path)
+        self.agent_key = agent_key
+        self.lock = threading.Lock()
+        self.layout: Optional[Dict] = None  # {'entries_hash': str, 'chunk_sizes': List[int]}
+        self.chunks: Dict[str, str] = {}  # 块的键 -> 译文
+
+    def load(self) -> int:
+        """
+        读取断点，忽略其他API配置的记录
+
+        Returns:
+            int: 已完成的块数
+        """
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 上次退出时可能只写了一半
+                        continue
+                    if record.get('agent') != self.agent_key:
+                        continue
+                    if record.get('type') == 'layout':
+                        self.layout = {'entries_hash': record['entries_hash'], 'chunk_sizes': record['chunk_sizes']}
+                    elif record.get('type') == 'chunk':
+                        self.chunks[record['hash']] = record['translation']
+        if self.chunks:
+            logger.info(f"读取翻译断点: {self.path}, 已完成 {len(self.chunks)} 个块")
+        return len(self.chunks)
+
+    def _append(self, record: Dict) -> None:
+        record.update(agent=self.agent_key)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+
+    def layout_for(self, texts_hash: str) -> Optional[List[int]]:
+        """同一份字幕上次的切分方式"""
+        if self.layout and self.layout['entries_hash'] == texts_hash:
+            return self.layout['chunk_sizes']
+        return None
+
+    def save_layout(self, texts_hash: str, chunk_sizes: List[int]) -> None:
+        self.layout = {'entries_hash': texts_hash, 'chunk_sizes': chunk_sizes}
+        self._append({'type': 'layout', 'entries_hash': texts_hash, 'chunk_sizes': chunk_sizes})
+
+    def get(self, key: str) -> Optional[str]:
+        return self.chunks.get(key)
+
+    def put(self, key: str, translation: str) -> None:
+        """块翻译完成，立即写入"""
+        self.chunks[key] = translation
+        self._append({'type': 'chunk', 'hash': key, 'translation': translation})
+
+    def remove(self) -> None:
+        """翻译全部完成，删除断点文件"""
+        with self.lock:
+            self.path.unlink(missing_ok=True)
@@ -0,0 +1,148 @@
+"""
+翻译记忆
+按 (原文, 源语言, 目标语言, 模型, 提示词版本) 缓存逐行译文，保存在 orm/translation_memory.db
+片头片尾、系列剧集中重复的台词、失败后重跑的任务不再重复请求LLM
+
+条目数超过上限时按最近使用时间淘汰
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.config_manager import get_translation_memory_config
+from utils import logger
+
+DB_PATH = Path(__file__).parent.parent / 'orm' / 'translation_memory.db'
+
+
+class TranslationMemory:
+    """基于SQLite的逐行翻译记忆"""
+
+    def __init__(self, db_path: Path | str = DB_PATH, max_entries: int = 200000):
+        """
+        Args:
+            db_path: 数据库文件路径
+            max_entries: 最多保存的条目数，超出后删除最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS memory (
+            key TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            last_used REAL NOT NULL
+        )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_memory_last_used ON memory(last_used)')
+        self.conn.commit()
+
+        # 统计指标（逐行计数）
+        self.hits = 0
+        self.misses = 0
+        self.skipped_chunks = 0
+
+    @staticmethod
+    def make_key(source: str, source_language: str, target_language: str, model: str, prompt_version: str) -> str:
+        """生成缓存键"""
+        raw = '\x1f'.join((source_language, target_language, model, prompt_version, source))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, lines: List[str], **scope) -> List[Optional[str]]:
+        """
+        查询每一行的译文
+
+        Args:
+            lines: 原文行
+            **scope: source_language, target_language, model, prompt_version
+
+        Returns:
+            List[Optional[str]]: 与lines一一对应，未命中的为None
+        """
+        keys = [self.make_key(line, **scope) for line in lines]
+        with self.lock:
+            placeholders = ','.join('?' * len(keys))
+            rows = self.conn.execute(f'SELECT key, translation FROM memory WHERE key IN ({placeholders})', keys).fetchall()
+            found: Dict[str, str] = dict(rows)
+            if found:
+                now = time.time()
+                self.conn.executemany('UPDATE memory SET last_used = ? WHERE key = ?', [(now, key) for key in found])
+                self.conn.commit()
+            results = [found.get(key) for key in keys]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+            if results and hits == len(results):
+                self.skipped_chunks += 1
+        return results
+
+    def store(self, lines: List[str], translations: List[str], **scope) -> None:
+        """保存译文，lines和translations一一对应"""
+        now = time.time()
+        rows = [(self.make_key(line, **scope), line, translation, now)
+                for line, translation in zip(lines, translations)]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO memory (key, source, translation, last_used) VALUES (?, ?, ?, ?)', rows)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self) -> None:
+        """超出条目上限时删除最久未使用的条目，调用方需持有self.lock"""
+        if self.max_entries <= 0:
+            return
+        count = self.conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # 多删除10%，避免每次写入都触发淘汰
+        remove = count - int(self.max_entries * 0.9)
+        self.conn.execute('DELETE FROM memory WHERE key IN (SELECT key FROM memory ORDER BY last_used LIMIT ?)', (remove,))
+        logger.info(f'翻译记忆超出上限，删除 {remove} 条最久未使用的译文')
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            entries = self.conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'skipped_chunks': self.skipped_chunks,
+                'entries': entries,
+            }
+
+    def clear(self) -> None:
+        """清空翻译记忆"""
+        with self.lock:
+            self.conn.execute('DELETE FROM memory')
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+# 单例模式
+_translation_memory_instance: Optional[TranslationMemory] = None
+
+
+def get_translation_memory() -> Optional[TranslationMemory]:
+    """
+    获取翻译记忆实例，配置中关闭翻译记忆时返回None
+
+    Returns:
+        Optional[TranslationMemory]: 翻译记忆实例
+    """
+    global _translation_memory_instance
+    memory_config = get_translation_memory_config()
+    if not memory_config.get('enabled', True):
+        return None
+    if _translation_memory_instance is None:
+        _translation_memory_instance = TranslationMemory(max_entries=memory_config.get('max_entries', 200000))
+    return _translation_memory_instance
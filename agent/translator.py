@@ -1,9 +1,19 @@
 import json
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
-from services.llm_client import ask_gpt
+import httpx
+from openai import APIConnectionError
+
+from services.config_manager import get_fused_translate, get_stream_translate
+from services.llm_client import LLMStreamStalled, ask_gpt, ask_gpt_stream
 from utils import logger
 from utils.agent_dict import AgentConfig
+from .token_budget import estimate_tokens
+from .translation_memory import get_translation_memory
+
+# 提示词版本，修改翻译提示词后需要递增，使翻译记忆中的旧译文失效
+PROMPT_VERSION = "1"
 
 
 class Translator:
@@ -14,7 +24,16 @@ class Translator:
         self.target_language = target_language
         self.source_language = source_language
         self.reflect_translate = True  # 是否使用两步翻译
+        self.fused_translate = get_fused_translate()  # 反思翻译时一次请求同时返回直译和意译
+        stream_config = get_stream_translate()
+        self.stream_translate = stream_config.get('enabled', False)  # 流式接收译文
+        self.stream_stall_timeout = stream_config.get('stall_timeout', 20)
+        self.stream_retry = stream_config.get('retry', 3)  # 流卡住或连接中断后的重试次数，间隔指数增长
+        self.stream_retry_delay = stream_config.get('retry_delay', 1)
+        # 每行最终译文接收完整时的回调(块序号, 块内行号, 译文)，用于在任务列表中显示翻译进度
+        self.line_callback: Optional[Callable[[int, int, str], None]] = None
         self.terminology_manager = None  # 术语管理器，由外部设置
+        self.translation_memory = get_translation_memory()  # 翻译记忆，None表示不使用
 
     def generate_shared_prompt(self, previous_content_prompt: Optional[List[str]],
                                after_content_prompt: Optional[List[str]],
@@ -145,6 +164,55 @@ Note: Start you answer with ```json and end with ```, do not add any other text.
 '''
         return prompt_expressiveness.strip()
 
+    def get_prompt_fused(self, lines: str, shared_prompt: str) -> str:
+        """获取一次完成直译和意译的提示"""
+        json_dict = {
+            f"{i}": {
+                "origin": line,
+                "direct": f"direct {self.target_language} translation {i}.",
+                "free": f"free {self.target_language} translation {i}."
+            }
+            for i, line in enumerate(lines.split('\n'), 1)
+        }
+        json_format = json.dumps(json_dict, indent=2, ensure_ascii=False)
+
+        prompt_fused = f'''
+## Role
+You are a professional Netflix subtitle translator and language consultant, fluent in both {self.source_language} and {self.target_language}, as well as their respective cultures.
+
+## Task
+Translate the original {self.source_language} subtitles into {self.target_language} line by line, in two passes for every line:
+
+1. direct: a faithful translation that accurately conveys the original meaning and terminology, without adding or omitting content
+2. free: reflect on the direct translation (fluency, consistency with the original style, conciseness) and rewrite it into natural, fluent {self.target_language} that suits the audience and the theme of the content
+
+Do not add comments or explanations, and do not leave any translation empty, as the subtitles are for the audience to read.
+
+{shared_prompt}
+
+## INPUT
+<subtitles>
+{lines}
+</subtitles>
+
+## Output in only JSON format and no other text
+```json
+{json_format}
+```
+
+Note: Start you answer with ```json and end with ```, do not add any other text.
+'''
+        return prompt_fused.strip()
+
+    def prompt_overhead_tokens(self, summary_prompt: str, things_to_note_prompt: str) -> int:
+        """提示词中与待翻译字幕无关部分（模板、主题、注意事项）的token数"""
+        shared_prompt = self.generate_shared_prompt(None, None, summary_prompt, things_to_note_prompt)
+        if self.reflect_translate and not self.fused_translate:
+            prompt = self.get_prompt_expressiveness({}, '', shared_prompt)
+        else:
+            prompt = self.get_prompt_fused('', shared_prompt)
+        return estimate_tokens(prompt)
+
     def valid_translate_result(self, result: dict, required_keys: list, required_sub_keys: list) -> Dict[str, str]:
         """验证翻译结果"""
         # 检查所需键
@@ -159,48 +227,177 @@ Note: Start you answer with ```json and end with ```, do not add any other text.
 
         return {"status": "success", "message": "Translation completed"}
 
+    def translate_mode(self) -> str:
+        if not self.reflect_translate:
+            return "direct"
+        return "fused" if self.fused_translate else "reflect"
+
+    def memory_scope(self) -> Dict[str, str]:
+        """翻译记忆的作用范围，不同语言、模型、提示词的译文互不复用"""
+        return {
+            'source_language': self.source_language,
+            'target_language': self.target_language,
+            'model': f'{self.agent.base_url}|{self.agent.model}',
+            'prompt_version': f'{PROMPT_VERSION}-{self.translate_mode()}',
+        }
+
     def translate_lines(self, lines: str, previous_content_prompt: Optional[List[str]],
                         after_content_prompt: Optional[List[str]],
                         things_to_note_prompt: str,
                         summary_prompt: str,
-                        index: int = 0) -> Tuple[str, str]:
-        """翻译文本行"""
+                        index: int = 0,
+                        line_offset: int = 0) -> Tuple[str, str]:
+        """
+        翻译文本行，优先使用翻译记忆
+        全部命中时不请求API，部分命中时只发送未命中的行
+
+        Args:
+            line_offset: lines在块中的起始行号，块被拆分重试时用于line_callback
+        """
+        line_map = None  # 只翻译部分行时，请求中的行号 -> 块内行号
+        on_line = None
+        if self.line_callback is not None:
+            def on_line(line_no: int, text: str) -> None:
+                self.line_callback(index, line_offset + (line_map[line_no] if line_map else line_no), text)
+
+        if self.translation_memory is None:
+            return self._translate_lines_with_llm(lines, previous_content_prompt, after_content_prompt,
+                                                  things_to_note_prompt, summary_prompt, index, on_line)
+
+        scope = self.memory_scope()
+        source_lines = lines.split('\n')
+        cached = self.translation_memory.lookup(source_lines, **scope)
+        miss_indexes = [i for i, translation in enumerate(cached) if translation is None]
+        if not miss_indexes:
+            logger.info(f"Block {index} - All {len(source_lines)} lines found in translation memory")
+            return '\n'.join(cached), lines
+
+        if on_line:
+            for i, translation in enumerate(cached):
+                if translation is not None:
+                    on_line(i, translation)
+        line_map = miss_indexes
+        miss_lines = [source_lines[i] for i in miss_indexes]
+        translated, _ = self._translate_lines_with_llm('\n'.join(miss_lines), previous_content_prompt, after_content_prompt,
+                                                       things_to_note_prompt, summary_prompt, index, on_line)
+        translated_lines = translated.split('\n')
+        self.translation_memory.store(miss_lines, translated_lines, **scope)
+
+        for i, translation in zip(miss_indexes, translated_lines):
+            cached[i] = translation
+        if len(miss_indexes) < len(source_lines):
+            logger.info(f"Block {index} - {len(source_lines) - len(miss_indexes)}/{len(source_lines)} lines from translation memory")
+        return '\n'.join(cached), lines
+
+    def _translate_lines_with_llm(self, lines: str, previous_content_prompt: Optional[List[str]],
+                                  after_content_prompt: Optional[List[str]],
+                                  things_to_note_prompt: str,
+                                  summary_prompt: str,
+                                  index: int = 0,
+                                  on_line: Optional[Callable[[int, str], None]] = None) -> Tuple[str, str]:
+        """调用LLM翻译文本行，on_line在每行最终译文接收完整时调用(行号, 译文)"""
         shared_prompt = self.generate_shared_prompt(previous_content_prompt, after_content_prompt, summary_prompt, things_to_note_prompt)
 
-        # 翻译函数
-        def translate_with_validation(prompt: str, length: int, step_name: str):
-            def valid_faith(response_data):
-                return self.valid_translate_result(response_data, [str(i) for i in range(1, length + 1)], ['direct'])
-
-            def valid_express(response_data):
-                return self.valid_translate_result(response_data, [str(i) for i in range(1, length + 1)], ['free'])
-
+        # 一次请求完成直译和意译，结果不完整时回退为两步翻译
+        if self.reflect_translate and self.fused_translate:
             try:
+                return self._fused_translate(lines, shared_prompt, index, on_line), lines
+            except ValueError as e:
+                logger.warning(f"Block {index} - Fused translation invalid, falling back to two-step: {e}")
+
+        return self._two_step_translate(lines, shared_prompt, index, on_line), lines
+
+    def _ask_translation(self, prompt: str, length: int, sub_keys: List[str], step_name: str, index: int,
+                         on_line: Optional[Callable[[int, str], None]] = None, line_key: str = '') -> Dict:
+        """
+        请求翻译并校验结果
+
+        Args:
+            on_line: 流式接收时，每行的line_key字段接收完整后调用(行号, 译文)
+            line_key: 回调的字段，为空时不回调
+        """
+
+        def valid(response_data):
+            return self.valid_translate_result(response_data, [str(i) for i in range(1, length + 1)], sub_keys)
+
+        try:
+            if self.stream_translate:
+                result = self._ask_translation_stream_with_retry(prompt, step_name, index, on_line, line_key)
+                valid_resp = valid(result)
+                if valid_resp['status'] != 'success':
+                    raise ValueError(f"API response error: {valid_resp['message']}")
+            else:
                 # 使用ask_gpt函数，它自带重试机制
                 result = ask_gpt(
                     model_api=self.agent,
                     prompt=prompt,
                     resp_type='json',
-                    valid_def=valid_faith if step_name == 'faithfulness' else valid_express,
+                    valid_def=valid,
                     log_title=f'translate_{step_name}_{index}'
                 )
 
-                # 验证结果长度
-                expected_length = len(lines.split('\n'))
-                if expected_length != len(result):
-                    error_msg = f'{step_name.capitalize()} translation length mismatch: expected {expected_length}, got {len(result)}'
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
+            # 验证结果长度
+            if length != len(result):
+                error_msg = f'{step_name.capitalize()} translation length mismatch: expected {length}, got {len(result)}'
+                logger.error(error_msg)
+                raise ValueError(error_msg)
 
-                return result
+            return result
 
-            except Exception as e:
-                logger.error(f'Block {index} {step_name} translation failed: {e}')
-                raise e
+        except Exception as e:
+            logger.error(f'Block {index} {step_name} translation failed: {e}')
+            raise e
+
+    def _ask_translation_stream_with_retry(self, prompt: str, step_name: str, index: int,
+                                           on_line: Optional[Callable[[int, str], None]], line_key: str) -> Dict:
+        """流卡住或连接中断时按指数退避重试，重试次数用完后抛出最后一次的异常"""
+        for attempt in range(self.stream_retry + 1):
+            try:
+                return self._ask_translation_stream(prompt, step_name, index, on_line, line_key)
+            except (LLMStreamStalled, APIConnectionError, httpx.TransportError) as e:
+                if attempt == self.stream_retry:
+                    raise
+                delay = self.stream_retry_delay * (2 ** attempt)
+                logger.warning(f'Block {index} {step_name} stream failed: {e}, '
+                               f'retry {attempt + 1}/{self.stream_retry} in {delay}s')
+                time.sleep(delay)
+
+    def _ask_translation_stream(self, prompt: str, step_name: str, index: int,
+                                on_line: Optional[Callable[[int, str], None]], line_key: str) -> Dict:
+        """流式请求翻译，每行接收完整后立即回调"""
+        result = {}
+        for key, item in ask_gpt_stream(self.agent, prompt, log_title=f'translate_{step_name}_{index}',
+                                        stall_timeout=self.stream_stall_timeout):
+            result[key] = item
+            if on_line and line_key and key.isdigit() and isinstance(item, dict) and item.get(line_key):
+                on_line(int(key) - 1, str(item[line_key]).replace('\n', ' ').strip())
+        return result
+
+    def _fused_translate(self, lines: str, shared_prompt: str, index: int,
+                         on_line: Optional[Callable[[int, str], None]] = None) -> str:
+        """一次请求同时得到直译和意译"""
+        length = len(lines.split('\n'))
+        result = self._ask_translation(self.get_prompt_fused(lines, shared_prompt), length, ['direct', 'free'], 'fused',
+                                       index, on_line, 'free')
+        logger.trace(f"Block {index} - Using fused")
+        logger.trace(result)
+
+        translations = [str(result[str(i)]["free"]).replace('\n', ' ').strip() for i in range(1, length + 1)]
+        if not all(translations):
+            raise ValueError(f'Empty free translation in block {index}')
+
+        logger.info(f"Block {index} - Fused translation completed")
+        return "\n".join(translations)
+
+    def _two_step_translate(self, lines: str, shared_prompt: str, index: int,
+                            on_line: Optional[Callable[[int, str], None]] = None) -> str:
+        """先忠实翻译，启用反思翻译时再优化表达"""
+        length = len(lines.split('\n'))
 
         # 第一步：忠实翻译
         prompt1 = self.get_prompt_faithfulness(lines, shared_prompt)
-        faith_result = translate_with_validation(prompt1, len(lines.split('\n')), 'faithfulness')
+        faith_result = self._ask_translation(prompt1, length, ['direct'], 'faithfulness', index,
+                                             on_line, '' if self.reflect_translate else 'direct')
         logger.trace(f"Block {index} - Using faithfulness")
         logger.trace(faith_result)
 
@@ -211,22 +408,22 @@ Note: Start you answer with ```json and end with ```, do not add any other text.
         if not self.reflect_translate:
             translate_result = "\n".join([faith_result[i]["direct"].strip() for i in faith_result])
             logger.info(f"Block {index} - Using direct translation only")
-            return translate_result, lines
+            return translate_result
 
         # 第二步：表达优化
         prompt2 = self.get_prompt_expressiveness(faith_result, lines, shared_prompt)
-        express_result = translate_with_validation(prompt2, len(lines.split('\n')), 'expressiveness')
+        express_result = self._ask_translation(prompt2, length, ['free'], 'expressiveness', index, on_line, 'free')
         logger.trace(f"Block {index} - Using expressiveness")
         logger.trace(express_result)
 
         translate_result = "\n".join([express_result[i]["free"].replace('\n', ' ').strip() for i in express_result])
 
-        if len(lines.split('\n')) != len(translate_result.split('\n')):
+        if length != len(translate_result.split('\n')):
             logger.error(f'Translation of block {index} failed, Length Mismatch')
             raise ValueError(f'Origin: {lines}, but got: {translate_result}')
 
         logger.info(f"Block {index} - Two-step translation completed")
-        return translate_result, lines
+        return translate_result
 
 
 def search_things_to_note_in_prompt() -> str:
@@ -0,0 +1,204 @@
+"""
+音频提取缓存
+同一个源文件用不同模型重新识别、或者识别+翻译时，直接复用已经提取好的音频，跳过解码
+
+缓存键 = 源文件内容哈希 + 解码参数（采样率、声道、输出格式）
+缓存总大小超过上限时，按最近最少使用顺序删除
+输出到任务目录的是缓存文件的独立副本，任务就地修改输出文件不会影响缓存
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.video_tools import FFmpegJobs
+from nice_ui.configure import config
+from utils import logger
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def file_content_hash(file_path: str) -> str:
+    """计算文件内容的blake2b哈希"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            h.update(block)
+    return h.hexdigest()
+
+
+class AudioCache:
+    """按内容寻址的音频提取缓存"""
+
+    def __init__(self, cache_dir: Path, max_size_mb: float = 2048):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_size_mb: 缓存总大小上限（MB），<=0表示不缓存
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.index_file = self.cache_dir / "index.json"
+        self.lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # 源文件内容哈希缓存，(路径, 大小, 修改时间)不变时不重复计算
+        self._hash_memo: Dict[tuple, str] = {}
+        self._hash_memo_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.entries: Dict[str, dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, dict]:
+        """加载缓存索引，丢弃文件已不存在的条目"""
+        if not self.index_file.exists():
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return {key: entry for key, entry in entries.items() if (self.cache_dir / entry['file']).exists()}
+        except Exception as e:
+            logger.error(f"加载音频缓存索引失败: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """保存缓存索引，调用方需持有self.lock"""
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def _source_hash(self, input_path: str) -> str:
+        stat = os.stat(input_path)
+        memo_key = (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns)
+        with self._hash_memo_lock:
+            content_hash = self._hash_memo.get(memo_key)
+        if content_hash is None:
+            # 计算哈希时不持锁，同一个文件同时计算两次结果也相同
+            content_hash = file_content_hash(input_path)
+            with self._hash_memo_lock:
+                self._hash_memo[memo_key] = content_hash
+        return content_hash
+
+    def make_key(self, input_path: str, sample_rate: int, layout: str, suffix: str) -> str:
+        """生成缓存键：内容哈希 + 解码参数"""
+        return f"{self._source_hash(input_path)}_{sample_rate}_{layout}{suffix.lower()}"
+
+    def convert(self, input_path: Path | str, output_path: Path | str, sample_rate: int = 16000, layout: str = 'mono') -> bool:
+        """
+        提取音频到output_path，命中缓存时直接复制缓存文件，不再解码
+
+        Args:
+            input_path: 音视频源文件
+            output_path: 输出音频文件，格式由后缀决定
+            sample_rate: 采样率
+            layout: 声道布局
+        """
+        input_path, output_path = str(input_path), str(output_path)
+        if self.max_size <= 0:
+            return FFmpegJobs.convert_audio(input_path, output_path, sample_rate, layout)
+
+        try:
+            key = self.make_key(input_path, sample_rate, layout, Path(output_path).suffix)
+        except OSError as e:
+            logger.warning(f"计算音频缓存键失败，直接转码: {str(e)}")
+            return FFmpegJobs.convert_audio(input_path, output_path, sample_rate, layout)
+
+        with self.lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一个源文件同时只解码一次
+        with key_lock:
+            cached_file = self._lookup(key)
+            if cached_file is None:
+                self.misses += 1
+                cached_file = self.cache_dir / key
+                if not FFmpegJobs.convert_audio(input_path, str(cached_file), sample_rate, layout):
+                    cached_file.unlink(missing_ok=True)
+                    return False
+                self._add(key, cached_file)
+            else:
+                self.hits += 1
+                logger.info(f"命中音频缓存，跳过解码: {input_path}")
+
+            self._materialize(cached_file, output_path)
+        return True
+
+    def _lookup(self, key: str) -> Optional[Path]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            cached_file = self.cache_dir / entry['file']
+            if not cached_file.exists():
+                self.entries.pop(key, None)
+                return None
+            entry['last_used'] = time.time()
+            self._save_index()
+            return cached_file
+
+    def _add(self, key: str, cached_file: Path) -> None:
+        with self.lock:
+            self.entries[key] = {
+                'file': cached_file.name,
+                'size': cached_file.stat().st_size,
+                'last_used': time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+
+    def _evict(self, keep: str) -> None:
+        """超出大小上限时按LRU删除缓存文件，调用方需持有self.lock"""
+        total = sum(entry['size'] for entry in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+            self.entries.pop(key)
+            total -= entry['size']
+            logger.info(f"删除音频缓存: {entry['file']}")
+
+    @staticmethod
+    def _materialize(cached_file: Path, output_path: str) -> None:
+        """把缓存文件复制到任务输出目录，先写临时文件再替换，不会留下写了一半的输出"""
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp_output = output.with_name(f"{output.name}.tmp")
+        shutil.copyfile(cached_file, tmp_output)
+        os.replace(tmp_output, output)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'size_mb': sum(entry['size'] for entry in self.entries.values()) / 1024 / 1024,
+            }
+
+
+# 单例模式
+_audio_cache_instance: Optional[AudioCache] = None
+
+
+def get_audio_cache() -> AudioCache:
+    """
+    获取音频缓存实例
+
+    Returns:
+        AudioCache: 音频缓存实例
+    """
+    global _audio_cache_instance
+    if _audio_cache_instance is None:
+        _audio_cache_instance = AudioCache(
+            cache_dir=Path(config.root_path) / "tmp" / "audio_cache",
+            max_size_mb=config.settings.get('audio_cache_max_mb', 2048),
+        )
+    return _audio_cache_instance
@@ -1,7 +1,7 @@
 import os
 import time
 from http import HTTPStatus
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
 
 import dashscope
 import requests
@@ -9,6 +9,8 @@ from dashscope.audio.asr import Transcription
 from pydantic import BaseModel, Field, field_validator
 
 from app.cloud_asr import aliyun_sdk
+from app.cloud_asr.result_stream import iter_stream_segments
+from app.cloud_asr.segment_converter import convert_to_segments, convert_to_subtitles, get_sentences
 from utils import logger
 
 
@@ -256,6 +258,43 @@ class AliyunASRClient:
             logger.error(f"下载文件时发生未知错误: {str(e)}")
             raise ASRRequestError(f"下载文件失败: {str(e)}") from e
 
+    def stream_segments(self, url: str, save_path: str, batch_sentences: int = 50) -> Iterator[Dict[str, Any]]:
+        """
+        边下载转写结果边转换为segments，原始结果同时保存到save_path
+
+        Args:
+            url: 转写结果文件的URL
+            save_path: 保存路径
+            batch_sentences: 每批转换的句子数
+
+        Yields:
+            Dict[str, Any]: segment，格式同convert_to_segments_format
+        """
+        logger.info(f"开始流式下载并解析文件: {url}")
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        count = 0
+        try:
+            with requests.get(url, stream=True, timeout=60) as response, open(save_path, 'wb') as f:
+                response.raise_for_status()
+
+                def chunks():
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if chunk:  # 过滤保持活动的断开连接
+                            f.write(chunk)
+                            yield chunk
+
+                for segment in iter_stream_segments(chunks(), batch_sentences):
+                    count += 1
+                    yield segment
+        except requests.RequestException as e:
+            logger.error(f"下载文件时发生网络错误: {str(e)}")
+            raise ASRRequestError(f"下载文件失败: {str(e)}") from e
+        except ValueError as e:
+            logger.error(f"解析转写结果失败: {str(e)}")
+            raise ASRRequestError(f"解析转写结果失败: {str(e)}") from e
+
+        logger.info(f"文件已保存到: {save_path}, 成功转换了{count}个segments")
+
     def parse_transcription(self, json_file_path: dict) -> List[Dict[str, Any]]:
         """
         解析转写结果JSON文件，提取字幕信息
@@ -267,97 +306,7 @@ class AliyunASRClient:
         Returns:
             List[Dict[str, Any]]: 解析后的字幕信息列表，每个元素包含begin_time, end_time和text
         """
-        # 快速处理空输入情况
-        if not json_file_path:
-            return []
-
-        # 使用单次遍历和直接索引获取transcripts
-        transcript = None
-        if 'transcripts' in json_file_path:
-            transcripts = json_file_path['transcripts']
-            if isinstance(transcripts, list) and transcripts:
-                transcript = transcripts[0]
-            elif isinstance(transcripts, dict):
-                transcript = transcripts
-
-        if not transcript or 'sentences' not in transcript:
-            return []
-
-        sentences = transcript['sentences']
-        if not sentences:
-            return []
-
-        # 预分配结果列表 - 使用更精确的估计
-
-        # 计算所有句子中标点符号的数量
-        punctuation_count = 0
-        for sentence in sentences:
-            if 'words' in sentence:
-                for word in sentence['words']:
-                    if word.get('punctuation', '').strip():
-                        punctuation_count += 1
-
-        # 根据标点符号数量预分配结果数组
-
-        # 每个句子至少有一个标点符号，再加10%的缓冲
-        result_capacity = max(punctuation_count, len(sentences)) + len(sentences) // 10
-        result = [None] * result_capacity
-        result_index = 0
-
-        # 使用单次遍历和直接索引处理所有句子
-        for sentence_idx, sentence in enumerate(sentences):
-            if 'words' not in sentence or not sentence['words']:
-                continue
-
-            words = sentence['words']
-            word_count = len(words)
-
-            # 当前句子的起始时间
-            current_begin_time = words[0]['begin_time']
-            # 使用字符串列表而不是单个字符串，减少内存分配
-            current_text_parts = []
-            current_text_length = 0
-
-            # 使用单次遍历和直接索引处理所有单词
-            i = 0
-            while i < word_count:
-                word = words[i]
-                word_text = word['text']
-                punctuation = word.get('punctuation', '')
-
-                # 使用列表收集文本片段，避免频繁的字符串连接
-                current_text_parts.append(word_text)
-                current_text_length += len(word_text)
-
-                # 如果有标点符号或者是最后一个单词
-                if punctuation.strip() or i == word_count - 1:
-                    # 添加标点符号到文本
-                    if punctuation.strip():
-                        current_text_parts.append(punctuation)
-                        current_text_length += len(punctuation)
-
-                    # 使用预分配的空间创建新的句子对象
-                    if result_index < result_capacity:
-                        # 仅当有实际文本时才创建新的句子
-                        if current_text_length > 0:
-                            # 使用join一次性创建字符串，避免多次连接
-                            result[result_index] = {
-                                'begin_time': current_begin_time,
-                                'end_time': word['end_time'],
-                                'text': ''.join(current_text_parts)
-                            }
-                            result_index += 1
-
-                    # 重置当前句子的状态
-                    if i < word_count - 1:
-                        current_begin_time = word['end_time']
-                        current_text_parts = []
-                        current_text_length = 0
-
-                i += 1
-
-        # 只返回实际使用的部分，避免复制整个数组
-        return result[:result_index] if result_index > 0 else []
+        return convert_to_subtitles(json_file_path)
 
     def convert_to_segments_format(self, json_data: dict) -> List[Dict[str, Any]]:
         """
@@ -379,87 +328,11 @@ class AliyunASRClient:
                 ...
             ]
         """
-        segments = []
-
-        # 获取转写结果
-        if 'transcripts' not in json_data:
-            logger.warning("JSON数据中没有找到transcripts字段")
-            return segments
-
-        transcripts = json_data['transcripts']
-        if isinstance(transcripts, list) and transcripts:
-            transcript = transcripts[0]
-        elif isinstance(transcripts, dict):
-            transcript = transcripts
-        else:
-            logger.warning("无效的transcripts格式")
-            return segments
-
-        if 'sentences' not in transcript:
-            logger.warning("transcript中没有找到sentences字段")
-            return segments
-
-        sentences = transcript['sentences']
-
-        # 处理每个句子
-        for sentence in sentences:
-            if 'words' not in sentence or not sentence['words']:
-                continue
-
-            words = sentence['words']
-            current_text_parts = []
-            current_timestamps = []
-
-            for word in words:
-                word_text = word.get('text', '')
-                punctuation = word.get('punctuation', '').strip()
-                begin_time = word.get('begin_time', 0)
-                end_time = word.get('end_time', 0)
-
-                # 添加当前词的文本和时间戳
-                current_text_parts.append(word_text)
-                current_timestamps.append([begin_time, end_time])
-
-                # 如果有标点符号，表示当前segment结束
-                if punctuation:
-                    # 将标点符号添加到文本末尾
-                    if current_text_parts:
-                        current_text_parts[-1] = current_text_parts[-1].rstrip() + punctuation
-
-                    # 创建新的segment
-                    if current_text_parts and current_timestamps:
-                        # 计算segment的开始和结束时间
-                        start_time = current_timestamps[0][0] if current_timestamps else 0
-                        end_time = current_timestamps[-1][1] if current_timestamps else 0
-
-                        segment = {
-                            'text': ''.join(current_text_parts).strip(),
-                            'timestamp': current_timestamps.copy(),
-                            'start': start_time,
-                            'end': end_time,
-                            'spk': 0  # 阿里云ASR默认单说话人
-                        }
-                        segments.append(segment)
-
-                        # 重置当前segment
-                        current_text_parts = []
-                        current_timestamps = []
-
-            # 处理句子末尾没有标点符号的情况
-            if current_text_parts and current_timestamps:
-                # 计算segment的开始和结束时间
-                start_time = current_timestamps[0][0] if current_timestamps else 0
-                end_time = current_timestamps[-1][1] if current_timestamps else 0
-
-                segment = {
-                    'text': ''.join(current_text_parts).strip(),
-                    'timestamp': current_timestamps.copy(),
-                    'start': start_time,
-                    'end': end_time,
-                    'spk': 0  # 阿里云ASR默认单说话人
-                }
-                segments.append(segment)
+        if not get_sentences(json_data):
+            logger.warning("JSON数据中没有找到有效的transcripts或sentences字段")
+            return []
 
+        segments = convert_to_segments(json_data)
         logger.info(f"成功转换了{len(segments)}个segments")
         return segments
 
@@ -9,13 +9,70 @@ import mimetypes
 import os
 import time
 import uuid
-from typing import Tuple, Optional, Callable
+from pathlib import Path
+from typing import Tuple, Optional, Callable, Dict, List
 
 import alibabacloud_oss_v2 as oss
 
 from app.cloud_asr import aliyun_sdk
+from app.cloud_asr.multipart_upload import MultipartUploader
+from app.cloud_asr.upload_index import get_upload_index
+from nice_ui.configure import config
 from utils import logger
 
+# 超过该大小的文件使用分片上传
+MULTIPART_THRESHOLD = 20 * 1024 * 1024
+# 分片大小
+PART_SIZE = 5 * 1024 * 1024
+# 并行上传的分片数
+PART_PARALLEL = 4
+# 分片上传断点文件目录
+CHECKPOINT_DIR = Path(config.root_path) / "tmp" / "oss_checkpoints"
+
+
+class OSSMultipartBackend:
+    """OSS分片上传接口"""
+
+    def __init__(self, client: oss.Client, bucket_name: str):
+        self.client = client
+        self.bucket_name = bucket_name
+
+    def initiate(self, key: str, content_type: str) -> str:
+        result = self.client.initiate_multipart_upload(oss.InitiateMultipartUploadRequest(
+            bucket=self.bucket_name,
+            key=key,
+            content_type=content_type
+        ))
+        return result.upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        result = self.client.upload_part(oss.UploadPartRequest(
+            bucket=self.bucket_name,
+            key=key,
+            upload_id=upload_id,
+            part_number=part_number,
+            body=data
+        ))
+        return result.etag
+
+    def list_parts(self, key: str, upload_id: str) -> Dict[int, str]:
+        parts = {}
+        paginator = self.client.list_parts_paginator()
+        for page in paginator.iter_page(oss.ListPartsRequest(bucket=self.bucket_name, key=key, upload_id=upload_id)):
+            for part in page.parts or []:
+                parts[part.part_number] = part.etag
+        return parts
+
+    def complete(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        self.client.complete_multipart_upload(oss.CompleteMultipartUploadRequest(
+            bucket=self.bucket_name,
+            key=key,
+            upload_id=upload_id,
+            complete_multipart_upload=oss.CompleteMultipartUpload(
+                parts=[oss.UploadPart(part_number=number, etag=etag) for number, etag in parts]
+            )
+        ))
+
 
 class AliyunOSSClientV2:
     """阿里云OSS客户端 (使用SDK V2)"""
@@ -49,6 +106,15 @@ class AliyunOSSClientV2:
         # 创建OSS客户端
         self.client = oss.Client(self.cfg)
 
+        # 大文件分片上传
+        self.multipart_threshold = MULTIPART_THRESHOLD
+        self.multipart_uploader = MultipartUploader(
+            OSSMultipartBackend(self.client, bucket_name),
+            checkpoint_dir=CHECKPOINT_DIR,
+            part_size=PART_SIZE,
+            parallel=PART_PARALLEL
+        )
+
     def upload_file(self,
                     local_file_path: str,
                     oss_path: Optional[str] = None,
@@ -56,11 +122,12 @@ class AliyunOSSClientV2:
                     ) -> Tuple[bool, str, str]:
         """
         上传文件到OSS
+        超过multipart_threshold的文件分片并行上传，中断后再次上传同一个文件时从断点继续
 
         Args:
             local_file_path: 本地文件路径
             oss_path: OSS上的文件路径，如果不指定，将自动生成
-            progress_callback: 进度回调函数，参数为上传进度（0-100）
+            progress_callback: 进度回调函数，参数为按字节计算的上传进度（0-100）
 
         Returns:
             Tuple[bool, str, str]: (是否成功, OSS文件路径, 错误信息)
@@ -74,7 +141,9 @@ class AliyunOSSClientV2:
             return False, "", error_msg
 
         try:
-            # 如果没有指定OSS路径，则自动生成
+            # 如果没有指定OSS路径，有未完成的分片上传时续传到原路径，否则自动生成
+            if not oss_path:
+                oss_path = self.multipart_uploader.pending_key(local_file_path)
             if not oss_path:
                 file_ext = os.path.splitext(local_file_path)[1]
                 timestamp = int(time.time())
@@ -91,25 +160,26 @@ class AliyunOSSClientV2:
                 "Content-Type": content_type
             }
 
-            # 上传文件
-            with open(local_file_path, 'rb') as file_obj:
-                data = file_obj.read()
+            # 大文件分片上传
+            if os.path.getsize(local_file_path) > self.multipart_threshold:
+                self.multipart_uploader.upload(local_file_path, oss_path, content_type, progress_callback)
+                logger.trace(f"文件上传成功: {oss_path}")
+                return True, oss_path, ""
 
-                # 如果有进度回调，模拟进度
-                if progress_callback:
-                    progress_callback(10)  # 开始上传
+            def progress_fn(n, written, total):
+                if progress_callback and total:
+                    progress_callback(int(written * 100 / total))
 
-                # 执行上传
+            # 小文件直接以文件流上传，不整体读入内存
+            with open(local_file_path, 'rb') as file_obj:
                 result = self.client.put_object(oss.PutObjectRequest(
                     bucket=self.bucket_name,
                     key=oss_path,
-                    body=data,
-                    metadata=metadata
+                    body=file_obj,
+                    metadata=metadata,
+                    progress_fn=progress_fn
                 ))
 
-                if progress_callback:
-                    progress_callback(100)  # 上传完成
-
                 if result.status_code == 200:
                     logger.trace(f"文件上传成功: {oss_path}")
                     return True, oss_path, ""
@@ -123,6 +193,10 @@ class AliyunOSSClientV2:
             logger.error(error_msg)
             return False, "", error_msg
 
+    def object_exists(self, oss_path: str) -> bool:
+        """检查OSS上的文件是否存在"""
+        return self.client.is_object_exist(bucket=self.bucket_name, key=oss_path)
+
     def generate_url(self, oss_path: str, expires: int = 3600) -> str:
         """
         生成文件的访问链接
@@ -272,6 +346,7 @@ def create_oss_client() -> Optional[AliyunOSSClientV2]:
 def upload_file_for_asr(local_file_path: str, progress_callback: Optional[Callable[[int], None]] = None, expires: int = 24 * 3600) -> Tuple[bool, str, str]:
     """
     上传文件到OSS并生成URL，为ASR任务提供服务
+    内容相同的文件已上传且仍有效时跳过上传，只重新生成访问链接
 
     Args:
         local_file_path: 本地文件路径
@@ -288,10 +363,27 @@ def upload_file_for_asr(local_file_path: str, progress_callback: Optional[Callab
             logger.error(error_msg)
             return False, "", error_msg
 
-        # 为segment_data文件生成特定的OSS路径
+        upload_index = get_upload_index()
+        digest = upload_index.content_hash(local_file_path)
+        cached_path = upload_index.lookup(digest)
+        if cached_path:
+            try:
+                if client.object_exists(cached_path):
+                    url = client.generate_url(cached_path, expires)
+                    saved = upload_index.mark_reused(digest)
+                    if progress_callback:
+                        progress_callback(100)
+                    logger.info(f"文件已在OSS上，跳过上传: {cached_path}, 节省 {saved / 1024 / 1024:.2f}MB, "
+                                f"累计节省 {upload_index.stats()['bytes_saved'] / 1024 / 1024:.2f}MB")
+                    return True, url, ""
+                upload_index.invalidate(digest)
+            except Exception as e:
+                logger.warning(f"复用已上传文件失败，重新上传: {str(e)}")
+
+        # 为segment_data文件生成特定的OSS路径，有未完成的分片上传时续传到原路径
         file_name = os.path.basename(local_file_path)
         timestamp = int(time.time())
-        oss_path = f"nlp_segments/{timestamp}_{file_name}"
+        oss_path = client.multipart_uploader.pending_key(local_file_path) or f"nlp_segments/{timestamp}_{file_name}"
 
         logger.trace(f"开始上传segment_data文件到OSS: {oss_path}")
 
@@ -305,6 +397,7 @@ def upload_file_for_asr(local_file_path: str, progress_callback: Optional[Callab
 
         if success:
             logger.trace(f"segment_data文件上传成功: {url}")
+            upload_index.record(digest, oss_path, os.path.getsize(local_file_path), expires)
         else:
             logger.error(f"segment_data文件上传失败: {error}")
 
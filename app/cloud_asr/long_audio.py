@@ -0,0 +1,187 @@
+"""
+长音频切分与结果合并
+长音频在静音处切成若干段分别提交云ASR，识别完成后按时间偏移合并为一个segments列表
+
+- 静音检测：按帧计算能量，在每个目标切分点附近的窗口内找能量最低的位置
+- 每段音频在切分点两侧各多保留overlap的音频，避免切分点附近的词被截断
+- 合并：每个切分点两侧的重叠区域，按segment中点归属到一侧；两侧都识别出的同一句话只保留一份
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import soundfile as sf
+
+from utils import logger
+
+# 静音检测的帧长（毫秒）
+FRAME_MS = 30
+# 读取音频的块大小（帧数）
+BLOCK_FRAMES = 2000
+
+
+@dataclass
+class AudioPiece:
+    """切分出的一段音频，时间均为相对原音频的毫秒数"""
+    index: int
+    path: str
+    offset_ms: int  # 这段音频文件在原音频中的起始时间
+    core_start_ms: int  # 归属这一段的时间范围
+    core_end_ms: int
+
+    @property
+    def duration_ms(self) -> int:
+        return self.core_end_ms - self.core_start_ms
+
+
+def frame_energy(audio_file: str, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """分块读取音频，计算每帧的平均能量（dB）"""
+    info = sf.info(audio_file)
+    frame_size = max(1, int(info.samplerate * frame_ms / 1000))
+    energies = []
+    for block in sf.blocks(audio_file, blocksize=frame_size * BLOCK_FRAMES, dtype='float32', always_2d=True):
+        mono = block.mean(axis=1)
+        frames = len(mono) // frame_size
+        if frames == 0:
+            continue
+        power = np.square(mono[:frames * frame_size].reshape(frames, frame_size)).mean(axis=1)
+        energies.append(10 * np.log10(power + 1e-10))
+    return np.concatenate(energies) if energies else np.zeros(0)
+
+
+def find_split_points(energy: np.ndarray, piece_ms: int, search_ms: int, frame_ms: int = FRAME_MS) -> List[int]:
+    """
+    在每个目标切分点前后search_ms范围内找最安静的位置
+
+    Args:
+        energy: 每帧能量
+        piece_ms: 目标分段时长
+        search_ms: 搜索窗口半径
+        frame_ms: 帧长
+
+    Returns:
+        List[int]: 切分点（毫秒），不包含开头和结尾
+    """
+    total_ms = len(energy) * frame_ms
+    if total_ms <= piece_ms:
+        return []
+    # 用约0.3秒的滑动平均，找持续的静音而不是单个安静的帧
+    width = max(1, 300 // frame_ms)
+    smoothed = np.convolve(energy, np.ones(width) / width, mode='same')
+    pieces = int(round(total_ms / piece_ms))
+    step = total_ms / max(pieces, 1)
+    points = []
+    for k in range(1, pieces):
+        target = int(k * step / frame_ms)
+        lo = max(0, target - search_ms // frame_ms)
+        hi = min(len(smoothed), target + search_ms // frame_ms + 1)
+        points.append(int((lo + int(np.argmin(smoothed[lo:hi]))) * frame_ms))
+    return points
+
+
+def plan_pieces(duration_ms: int, split_points: Sequence[int], overlap_ms: int) -> List[tuple]:
+    """
+    由切分点计算每段的(起始时间, 结束时间, 归属开始, 归属结束)
+
+    音频文件覆盖归属范围并向两侧各延伸overlap_ms
+    """
+    bounds = [0] + sorted(split_points) + [duration_ms]
+    plans = []
+    for core_start, core_end in zip(bounds[:-1], bounds[1:]):
+        start = max(0, core_start - overlap_ms)
+        end = min(duration_ms, core_end + overlap_ms)
+        plans.append((start, end, core_start, core_end))
+    return plans
+
+
+def split_long_audio(audio_file: str, output_dir: str, piece_seconds: float, overlap_seconds: float = 2.0,
+                     search_seconds: float = 30.0) -> List[AudioPiece]:
+    """
+    在静音处把长音频切分为多段wav文件
+
+    Args:
+        audio_file: 音频文件
+        output_dir: 分段文件目录
+        piece_seconds: 目标分段时长
+        overlap_seconds: 每段在切分点两侧多保留的时长
+        search_seconds: 在目标切分点前后查找静音的范围
+
+    Returns:
+        List[AudioPiece]: 分段信息
+    """
+    info = sf.info(audio_file)
+    duration_ms = int(info.frames * 1000 / info.samplerate)
+    points = find_split_points(frame_energy(audio_file), int(piece_seconds * 1000), int(search_seconds * 1000))
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(audio_file))[0]
+
+    pieces = []
+    with sf.SoundFile(audio_file) as source:
+        for index, (start, end, core_start, core_end) in enumerate(
+                plan_pieces(duration_ms, points, int(overlap_seconds * 1000))):
+            start_frame = int(start * info.samplerate / 1000)
+            end_frame = int(end * info.samplerate / 1000)
+            path = os.path.join(output_dir, f"{name}_part{index:03d}.wav")
+            source.seek(start_frame)
+            with sf.SoundFile(path, 'w', samplerate=info.samplerate, channels=info.channels, subtype='PCM_16') as target:
+                remaining = end_frame - start_frame
+                while remaining > 0:
+                    block = source.read(min(remaining, info.samplerate * 60), dtype='int16', always_2d=True)
+                    if len(block) == 0:
+                        break
+                    target.write(block)
+                    remaining -= len(block)
+            pieces.append(AudioPiece(index, path, start, core_start, core_end))
+
+    logger.info(f"长音频切分为 {len(pieces)} 段: {audio_file}, 切分点: {[p / 1000 for p in points]}秒")
+    return pieces
+
+
+def _shift(segment: Dict[str, Any], offset_ms: int) -> Dict[str, Any]:
+    shifted = dict(segment)
+    shifted['timestamp'] = [[begin + offset_ms, end + offset_ms] for begin, end in segment.get('timestamp', [])]
+    shifted['start'] = segment['start'] + offset_ms
+    shifted['end'] = segment['end'] + offset_ms
+    return shifted
+
+
+def _overlap_ratio(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """两个segment时间重叠部分占较短者的比例"""
+    overlap = min(a['end'], b['end']) - max(a['start'], b['start'])
+    shorter = min(a['end'] - a['start'], b['end'] - b['start'])
+    if shorter <= 0:
+        return 1.0 if overlap >= 0 else 0.0
+    return max(0, overlap) / shorter
+
+
+def merge_piece_segments(pieces: Sequence[AudioPiece], piece_segments: Sequence[List[Dict[str, Any]]],
+                         duplicate_ratio: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    按时间偏移合并各段的识别结果
+
+    Args:
+        pieces: 分段信息
+        piece_segments: 每段的segments，时间相对于该段音频
+        duplicate_ratio: 切分点两侧的segment时间重叠超过该比例时视为同一句话
+
+    Returns:
+        List[Dict[str, Any]]: 合并后的segments，时间相对于原音频
+    """
+    merged = []
+    for piece, segments in zip(pieces, piece_segments):
+        kept = []
+        for segment in segments:
+            segment = _shift(segment, piece.offset_ms)
+            middle = (segment['start'] + segment['end']) / 2
+            if piece.core_start_ms <= middle < piece.core_end_ms:
+                kept.append(segment)
+
+        # 切分点两侧都识别出了跨越切分点的同一句话，保留词更多（切得更完整）的一份
+        while merged and kept and _overlap_ratio(merged[-1], kept[0]) > duplicate_ratio:
+            if len(kept[0].get('timestamp', [])) > len(merged[-1].get('timestamp', [])):
+                merged.pop()
+            else:
+                kept.pop(0)
+        merged.extend(kept)
+    return merged
@@ -0,0 +1,163 @@
+"""
+分片上传
+大文件按分片直接从磁盘读取并行上传，每个分片完成后写入断点文件，连接中断后重新上传时跳过已完成的分片，
+并按已上传字节数报告进度
+
+分片相关的存储接口由MultipartBackend定义，AliyunOSSClientV2提供OSS实现，测试时可以用本地实现代替
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from utils import logger
+
+
+class MultipartBackend(Protocol):
+    """分片上传的存储接口"""
+
+    def initiate(self, key: str, content_type: str) -> str:
+        """初始化分片上传，返回upload_id"""
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """上传一个分片，返回etag"""
+
+    def list_parts(self, key: str, upload_id: str) -> Dict[int, str]:
+        """列出已上传的分片 {part_number: etag}，upload_id失效时抛出异常"""
+
+    def complete(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        """合并分片"""
+
+
+class MultipartUploader:
+    """支持断点续传的并行分片上传"""
+
+    def __init__(self, backend: MultipartBackend, checkpoint_dir: Path | str,
+                 part_size: int = 5 * 1024 * 1024, parallel: int = 4):
+        """
+        Args:
+            backend: 存储接口
+            checkpoint_dir: 断点文件目录
+            part_size: 分片大小（字节）
+            parallel: 并行上传的分片数
+        """
+        self.backend = backend
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.part_size = part_size
+        self.parallel = max(1, parallel)
+
+    def checkpoint_path(self, local_file_path: str) -> Path:
+        """断点文件路径，同一个文件（路径、大小、修改时间不变）对应同一个断点文件"""
+        stat = os.stat(local_file_path)
+        identity = f"{os.path.abspath(local_file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return self.checkpoint_dir / f"{hashlib.sha1(identity.encode('utf-8')).hexdigest()}.json"
+
+    def pending_key(self, local_file_path: str) -> Optional[str]:
+        """文件有未完成的分片上传时，返回其OSS路径，用于续传到同一个路径"""
+        try:
+            with open(self.checkpoint_path(local_file_path), 'r', encoding='utf-8') as f:
+                return json.load(f).get('key')
+        except (OSError, ValueError):
+            return None
+
+    def _load_checkpoint(self, path: Path, key: str, file_size: int) -> Optional[dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('key') != key or checkpoint.get('size') != file_size or checkpoint.get('part_size') != self.part_size:
+            return None
+        try:
+            # 以服务端实际已有的分片为准
+            remote_parts = self.backend.list_parts(key, checkpoint['upload_id'])
+        except Exception as e:
+            logger.warning(f"断点记录的分片上传已失效，重新上传: {str(e)}")
+            return None
+        checkpoint['parts'] = {str(number): etag for number, etag in remote_parts.items()
+                               if checkpoint['parts'].get(str(number)) == etag}
+        return checkpoint
+
+    @staticmethod
+    def _save_checkpoint(path: Path, checkpoint: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def upload(self, local_file_path: str, key: str, content_type: str = 'application/octet-stream',
+               progress_callback: Optional[Callable[[int], None]] = None) -> None:
+        """
+        分片上传文件，失败时抛出异常并保留断点文件
+
+        Args:
+            local_file_path: 本地文件路径
+            key: OSS路径
+            content_type: 文件类型
+            progress_callback: 进度回调，参数为按字节计算的上传进度（0-100）
+        """
+        file_size = os.path.getsize(local_file_path)
+        checkpoint_file = self.checkpoint_path(local_file_path)
+        checkpoint = self._load_checkpoint(checkpoint_file, key, file_size)
+        if checkpoint is None:
+            checkpoint = {
+                'key': key,
+                'size': file_size,
+                'part_size': self.part_size,
+                'upload_id': self.backend.initiate(key, content_type),
+                'parts': {},
+            }
+            self._save_checkpoint(checkpoint_file, checkpoint)
+        else:
+            logger.info(f"从断点继续上传: {key}, 已完成 {len(checkpoint['parts'])} 个分片")
+
+        part_count = max(1, (file_size + self.part_size - 1) // self.part_size)
+        lock = threading.Lock()
+        uploaded = {'bytes': 0, 'percent': -1}
+
+        def part_length(number: int) -> int:
+            return min(self.part_size, file_size - (number - 1) * self.part_size)
+
+        def report(nbytes: int) -> None:
+            with lock:
+                uploaded['bytes'] += nbytes
+                percent = int(uploaded['bytes'] * 100 / file_size) if file_size else 100
+                if percent == uploaded['percent']:
+                    return
+                uploaded['percent'] = percent
+            if progress_callback:
+                progress_callback(percent)
+
+        def upload_part(number: int) -> None:
+            # 每个分片单独打开文件读取，内存占用为 并行数 × 分片大小
+            with open(local_file_path, 'rb') as f:
+                f.seek((number - 1) * self.part_size)
+                data = f.read(part_length(number))
+            etag = self.backend.upload_part(key, checkpoint['upload_id'], number, data)
+            with lock:
+                checkpoint['parts'][str(number)] = etag
+                self._save_checkpoint(checkpoint_file, checkpoint)
+            report(len(data))
+
+        done = [number for number in range(1, part_count + 1) if str(number) in checkpoint['parts']]
+        report(sum(part_length(number) for number in done))
+        todo = [number for number in range(1, part_count + 1) if str(number) not in checkpoint['parts']]
+
+        with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix='oss-part') as executor:
+            futures = [executor.submit(upload_part, number) for number in todo]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        parts = sorted((int(number), etag) for number, etag in checkpoint['parts'].items())
+        self.backend.complete(key, checkpoint['upload_id'], parts)
+        checkpoint_file.unlink(missing_ok=True)
+        logger.info(f"分片上传完成: {key}, {part_count} 个分片, {file_size / 1024 / 1024:.2f}MB")
@@ -0,0 +1,132 @@
+"""
+阿里云ASR转写结果的流式解析
+下载过程中逐块解析 transcripts[0].sentences 数组，每解析出一批完整的句子就转换生成segments，
+不需要等下载完成，也不需要把整个JSON读入内存
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+
+from app.cloud_asr.segment_converter import iter_segments, paused_gc
+from utils import logger
+
+_SENTENCES_KEY = re.compile(r'"sentences"\s*:\s*\[')
+_NON_SPACE = re.compile(r'\S')
+# 查找sentences键时保留的缓冲区尾部长度，避免键被分在两个数据块中
+_KEY_TAIL = 256
+
+
+class SentenceStreamParser:
+    """增量解析sentences数组，缓冲区只保留尚未解析完的部分"""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._state = 'seek'  # seek: 查找sentences数组, items: 解析数组元素, done: 数组已结束
+
+    @property
+    def buffered(self) -> int:
+        """当前缓冲的字符数"""
+        return len(self._buffer)
+
+    @property
+    def found(self) -> bool:
+        """是否找到了sentences数组"""
+        return self._state != 'seek'
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        输入一块数据
+
+        Returns:
+            List[Dict[str, Any]]: 本次解析出的完整句子
+        """
+        if self._state == 'done':
+            return []
+        self._buffer += self._decoder.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        数据结束，返回剩余的句子
+
+        Raises:
+            ValueError: sentences数组不完整
+        """
+        if self._state == 'done':
+            return []
+        self._buffer += self._decoder.decode(b'', final=True)
+        sentences = self._parse(final=True)
+        if self._state == 'items':
+            raise ValueError("转写结果不完整，sentences数组没有结束")
+        return sentences
+
+    def _parse(self, final: bool) -> List[Dict[str, Any]]:
+        if self._state == 'seek':
+            match = _SENTENCES_KEY.search(self._buffer)
+            if not match:
+                self._buffer = self._buffer[-_KEY_TAIL:]
+                return []
+            self._buffer = self._buffer[match.end():]
+            self._state = 'items'
+
+        sentences = []
+        pos = 0
+        while True:
+            match = _NON_SPACE.search(self._buffer, pos)
+            if not match:
+                break
+            pos = match.start()
+            char = self._buffer[pos]
+            if char == ']':
+                self._state = 'done'
+                break
+            if char == ',':
+                pos += 1
+                continue
+            try:
+                sentence, pos = self._json.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError as e:
+                # 数据还没到齐，等待下一块
+                if final:
+                    raise ValueError(f"解析转写结果失败: {str(e)}") from e
+                break
+            sentences.append(sentence)
+
+        self._buffer = '' if self._state == 'done' else self._buffer[pos:]
+        return sentences
+
+
+def _convert_batch(sentences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """转换一批句子，转换期间暂停垃圾回收，交给调用方处理时已恢复"""
+    with paused_gc():
+        return list(iter_segments(sentences))
+
+
+def iter_stream_segments(chunks: Iterable[bytes], batch_sentences: int = 50) -> Iterator[Dict[str, Any]]:
+    """
+    从转写结果的数据块流中生成segments
+
+    segments不会跨句子，所以按句子分批转换与整体转换的结果相同
+
+    Args:
+        chunks: 转写结果JSON的数据块
+        batch_sentences: 每批转换的句子数
+
+    Yields:
+        Dict[str, Any]: segment
+    """
+    parser = SentenceStreamParser()
+    batch = []
+    for chunk in chunks:
+        batch.extend(parser.feed(chunk))
+        if len(batch) >= batch_sentences:
+            yield from _convert_batch(batch)
+            batch = []
+    batch.extend(parser.close())
+    if not parser.found:
+        logger.warning("JSON数据中没有找到有效的transcripts或sentences字段")
+    if batch:
+        yield from _convert_batch(batch)
@@ -0,0 +1,77 @@
+"""
+云ASR任务提交调度
+- SubmissionScheduler: 上传和提交在线程池中执行，同时进行的任务数有上限，调用方拿到Future后立即返回
+- CompletionRegistry: 等待任务完成的一方拿到Future，任务结束时设置结果，不再循环sleep查询状态
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from utils import logger
+
+
+class SubmissionScheduler:
+    """并发数有上限的任务提交调度器"""
+
+    def __init__(self, submit: Callable[[str], Any], max_concurrency: int = 4):
+        """
+        Args:
+            submit: 提交函数，参数为任务ID
+            max_concurrency: 同时上传/提交的任务数
+        """
+        self.submit = submit
+        self.max_concurrency = max(1, max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='asr-submit')
+        self.pending: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, key: str) -> Future:
+        """安排提交任务，同一个任务重复安排时返回同一个Future"""
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            future = self.executor.submit(self._run, key)
+            self.pending[key] = future
+        future.add_done_callback(lambda _: self._done(key))
+        logger.debug(f"已安排提交任务: {key}, 排队/进行中: {self.pending_count()}")
+        return future
+
+    def _run(self, key: str) -> Any:
+        try:
+            return self.submit(key)
+        except Exception as e:
+            logger.error(f"提交任务失败: {key}, 错误: {str(e)}")
+            raise
+
+    def _done(self, key: str) -> None:
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class CompletionRegistry:
+    """任务完成通知"""
+
+    def __init__(self):
+        self.futures: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def future(self, key: str) -> Future:
+        """获取任务完成的Future，任务结束时被设置结果"""
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = Future()
+            return self.futures[key]
+
+    def resolve(self, key: str, result: Any) -> None:
+        """任务结束，通知所有等待方"""
+        with self.lock:
+            future = self.futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
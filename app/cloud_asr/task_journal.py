@@ -0,0 +1,181 @@
+"""
+ASR任务状态日志
+每次状态变化只追加一行JSON（JSON Lines），不再重写全部任务：
+
+- 同一任务在刷新间隔内的多次更新合并为一条记录，由后台线程批量写入
+- 任务进入终态（完成/失败）时立即同步写入，不依赖后台线程在程序退出前运行
+- 加载时按顺序重放，同一任务以最后一条记录为准，忽略写了一半的最后一行
+- 日志行数远大于任务数时压缩为每个任务一行
+- 已完成/失败的任务超过保留天数后在加载和压缩时删除
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from utils import logger
+
+# 终态任务，超过保留时间后删除
+FINISHED_STATUSES = ("COMPLETED", "FAILED")
+
+
+class TaskJournal:
+    """追加写入的任务状态日志"""
+
+    def __init__(self, path: Path, flush_interval: float = 1.0, retention_days: float = 7,
+                 compact_min_lines: int = 200):
+        """
+        Args:
+            path: 日志文件路径
+            flush_interval: 批量写入间隔（秒），<=0表示每次记录立即写入
+            retention_days: 已完成/失败任务的保留天数，<=0表示永久保留
+            compact_min_lines: 日志至少达到多少行才考虑压缩
+        """
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.retention = retention_days * 24 * 3600
+        self.compact_min_lines = compact_min_lines
+        self.lock = threading.Lock()
+        self.state: Dict[str, Dict[str, Any]] = {}  # 每个任务的最新记录
+        self.pending: Dict[str, Optional[Dict[str, Any]]] = {}  # 待写入的记录，None表示删除
+        self.line_count = 0
+        self.writes = 0
+        self._flush_event = threading.Event()
+        self._closed = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def load(self, legacy_file: Optional[Path] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        重放日志，返回每个任务的最新记录
+
+        Args:
+            legacy_file: 旧版全量JSON文件，日志不存在时从中导入
+        """
+        state: Dict[str, Dict[str, Any]] = {}
+        line_count = 0
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line_count += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 上次退出时可能只写了一半
+                        logger.warning(f"忽略损坏的任务日志行: {line[:100]!r}")
+                        continue
+                    if record.get("_deleted"):
+                        state.pop(record["task_id"], None)
+                    else:
+                        state[record["task_id"]] = record
+        elif legacy_file is not None and Path(legacy_file).exists():
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                state = {record["task_id"]: record for record in json.load(f)}
+            logger.info(f"从旧版任务文件导入 {len(state)} 个任务: {legacy_file}")
+
+        with self.lock:
+            self.state = self._apply_retention(state)
+            self.line_count = line_count
+            # 导入旧文件、删除过期任务或损坏的行都通过压缩写回
+            if line_count != len(self.state):
+                self._compact()
+        if legacy_file is not None and Path(legacy_file).exists() and self.path.exists():
+            os.replace(legacy_file, f"{legacy_file}.bak")
+        return dict(self.state)
+
+    def _apply_retention(self, state: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        if self.retention <= 0:
+            return state
+        deadline = time.time() - self.retention
+        return {task_id: record for task_id, record in state.items()
+                if not (record.get("status") in FINISHED_STATUSES and record.get("updated_at", 0) < deadline)}
+
+    def record(self, task_data: Dict[str, Any]) -> None:
+        """记录任务的最新状态，终态立即写入"""
+        with self.lock:
+            self.state[task_data["task_id"]] = task_data
+            self.pending[task_data["task_id"]] = task_data
+        if task_data.get("status") in FINISHED_STATUSES:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def delete(self, task_id: str) -> None:
+        """记录删除任务"""
+        with self.lock:
+            self.state.pop(task_id, None)
+            self.pending[task_id] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        if self._flush_thread is None or not self._flush_thread.is_alive():
+            self._closed.clear()
+            self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True, name="asr-task-journal")
+            self._flush_thread.start()
+        self._flush_event.set()
+
+    def _flush_loop(self) -> None:
+        """后台线程：有待写入记录时等待flush_interval后批量写入"""
+        while not self._closed.is_set():
+            self._flush_event.wait()
+            self._flush_event.clear()
+            if self._closed.wait(self.flush_interval):
+                break
+            self.flush()
+
+    def flush(self) -> None:
+        """把待写入的记录追加到日志文件，必要时压缩"""
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                lines = [json.dumps(record if record is not None else {"task_id": task_id, "_deleted": True},
+                                    ensure_ascii=False, default=str)
+                         for task_id, record in pending.items()]
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.line_count += len(lines)
+                self.writes += 1
+                if self.line_count > max(self.compact_min_lines, len(self.state) * 4):
+                    self._compact()
+            except Exception as e:
+                logger.error(f"写入ASR任务日志失败: {str(e)}")
+
+    def _compact(self) -> None:
+        """把日志重写为每个任务一行，调用方需持有self.lock"""
+        self.state = self._apply_retention(self.state)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.state.values():
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_path, self.path)
+        logger.debug(f"压缩ASR任务日志: {self.line_count} 行 -> {len(self.state)} 行")
+        self.line_count = len(self.state)
+
+    def compact(self, records: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        立即压缩日志
+
+        Args:
+            records: 全部任务的最新记录，不传时使用日志中的状态
+        """
+        with self.lock:
+            if records is not None:
+                self.state = {record["task_id"]: record for record in records}
+            self.pending.clear()
+            self._compact()
+
+    def close(self) -> None:
+        """停止后台线程并写入剩余记录"""
+        self._closed.set()
+        self._flush_event.set()
+        if self._flush_thread and self._flush_thread.is_alive():
+            self._flush_thread.join(timeout=2)
+        self.flush()
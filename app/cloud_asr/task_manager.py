@@ -1,19 +1,27 @@
-import json
+import atexit
 import os
+import shutil
 import threading
 import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Union
 
+import soundfile as sf
 from pydantic import BaseModel, Field, field_validator
-from pydantic.json import pydantic_encoder
 
 from app.cloud_asr.aliyun_asr_client import create_aliyun_asr_client
 from app.cloud_asr.aliyun_oss_client import upload_file_for_asr
+from app.cloud_asr.long_audio import AudioPiece, merge_piece_segments, split_long_audio
+from app.cloud_asr.submit_scheduler import CompletionRegistry, SubmissionScheduler
+from app.cloud_asr.task_journal import TaskJournal
+from app.cloud_asr.task_poller import TranscriptionPoller
 from nice_ui.configure import config
 from nice_ui.configure.signal import data_bridge
 from nice_ui.services.service_provider import ServiceProvider
+from services.rate_limiter import TokenBucket
 from utils import logger
 from utils.file_utils import funasr_write_srt_file
 
@@ -28,6 +36,8 @@ class ASRTaskStatus:
     COMPLETED = "COMPLETED"  # 已完成
     FAILED = "FAILED"  # 失败
 
+    FINAL = (COMPLETED, FAILED)
+
 
 class ASRTaskModel(BaseModel):
     """ASR任务数据模型"""
@@ -38,6 +48,7 @@ class ASRTaskModel(BaseModel):
     status: str = Field(ASRTaskStatus.PENDING, description="任务状态")
     error: Optional[str] = Field(None, description="错误信息")
     progress: int = Field(0, description="任务进度（0-100）")
+    pieces: Optional[List[Dict[str, Any]]] = Field(None, description="长音频分段：AudioPiece的字段和阿里云任务ID")
     created_at: float = Field(default_factory=time.time, description="创建时间")
     updated_at: float = Field(default_factory=time.time, description="更新时间")
 
@@ -91,6 +102,7 @@ class ASRTask:
         self.status = ASRTaskStatus.PENDING
         self.error = None
         self.progress = 0
+        self.pieces = None  # 长音频分段提交后的分段列表
         self.created_at = time.time()
         self.updated_at = time.time()
 
@@ -110,6 +122,7 @@ class ASRTask:
             status=self.status,
             error=self.error,
             progress=self.progress,
+            pieces=self.pieces,
             created_at=self.created_at,
             updated_at=self.updated_at
         )
@@ -145,6 +158,7 @@ class ASRTask:
         task.audio_url = model.audio_url
         task.status = model.status
         task.progress = model.progress
+        task.pieces = model.pieces
         task.created_at = model.created_at
         task.updated_at = model.updated_at
         task.error = model.error
@@ -159,79 +173,97 @@ class ASRTaskManager:
         """初始化任务管理器"""
         self.tasks: Dict[str, ASRTask] = {}
         self.lock = threading.Lock()
-        self.polling_thread = None
-        self.stop_polling = threading.Event()
-        self.task_state_file = Path(config.root_path) / "tmp" / "asr_tasks.json"
+        self._asr_client = None
+        # 切分提交的长音频任务: 任务ID -> 分段信息和各段识别结果
+        self.split_jobs: Dict[str, Dict[str, Any]] = {}
+        # 上传和提交在后台并行进行，任务结束时通过Future通知等待方
+        self.scheduler = SubmissionScheduler(
+            self.submit_task,
+            max_concurrency=config.settings.get('cloud_asr_submit_concurrency', 4),
+        )
+        self.completions = CompletionRegistry()
+        # 服务商提交配额，<=0表示不限制
+        self.submit_quota = TokenBucket(config.settings.get('cloud_asr_submit_per_minute', 0) / 60)
+        self.poller = TranscriptionPoller(
+            fetch=lambda handle: self._get_asr_client().query_task(handle),
+            on_running=self._on_task_running,
+            on_succeeded=self._on_task_succeeded,
+            on_failed=self._on_task_failed,
+            max_concurrency=config.settings.get('asr_poll_concurrency', 4),
+            min_interval=config.settings.get('asr_poll_min_interval', 2),
+            max_interval=config.settings.get('asr_poll_max_interval', 60),
+        )
+        self.task_state_file = Path(config.root_path) / "tmp" / "asr_tasks.jsonl"
+        self.legacy_task_state_file = Path(config.root_path) / "tmp" / "asr_tasks.json"
+        self.journal = TaskJournal(
+            self.task_state_file,
+            flush_interval=config.settings.get('asr_task_flush_interval', 1.0),
+            retention_days=config.settings.get('asr_task_retention_days', 7),
+        )
+        # 后台写入线程是守护线程，正常退出时写入剩余记录
+        atexit.register(self.journal.close)
         self._load_tasks()
 
     def _load_tasks(self) -> None:
-        """从文件加载任务状态，使用Pydantic模型进行验证和转换"""
-        if not self.task_state_file.exists():
-            return
+        """重放任务日志加载任务状态，使用Pydantic模型进行验证和转换"""
         try:
-            with open(self.task_state_file, "r", encoding="utf-8") as f:
-                tasks_data = json.load(f)
+            records = self.journal.load(legacy_file=self.legacy_task_state_file)
+        except Exception as e:
+            logger.error(f"加载ASR任务状态失败: {str(e)}")
+            return
+
+        with self.lock:
+            loaded_count = 0
+            for task_data in records.values():
+                try:
+                    task = ASRTask.from_dict(task_data)
+                    self.tasks[task.task_id] = task
+                    loaded_count += 1
+                except Exception as task_e:
+                    logger.error(f"加载任务数据失败: {str(task_e)}")
+
+        logger.info(f"从任务日志加载了 {loaded_count} 个ASR任务")
+        self._resume_split_jobs()
 
+    def _resume_split_jobs(self) -> None:
+        """按任务日志中的分段列表继续轮询未完成的长音频任务，已结束任务残留的分段文件直接删除"""
+        with self.lock:
+            split_tasks = [task for task in self.tasks.values() if task.pieces]
+        for task in split_tasks:
+            piece_dir = self._piece_dir(task.task_id)
+            if task.status in ASRTaskStatus.FINAL:
+                shutil.rmtree(piece_dir, ignore_errors=True)
+                continue
+            try:
+                pieces = [AudioPiece(**{name: record[name] for name in AudioPiece.__dataclass_fields__})
+                          for record in task.pieces]
+            except (KeyError, TypeError) as e:
+                logger.error(f"长音频分段记录无效 - 内部ID: {task.task_id}, 错误: {str(e)}")
+                continue
+            # 分段的转写结果下载到分段目录
+            piece_dir.mkdir(parents=True, exist_ok=True)
             with self.lock:
-                loaded_count = 0
-                for task_data in tasks_data:
-                    try:
-                        # 使用Pydantic模型验证数据
-                        model = ASRTaskModel(**task_data)
-                        # 使用验证后的数据创建ASRTask对象
-                        task = ASRTask.from_dict(model.model_dump())
-                        self.tasks[task.task_id] = task
-                        loaded_count += 1
-                    except Exception as task_e:
-                        logger.error(f"加载任务数据失败: {str(task_e)}")
-                        # 尝试使用旧方法
-                        try:
-                            task = ASRTask.from_dict(task_data)
-                            self.tasks[task.task_id] = task
-                            loaded_count += 1
-                        except Exception as fallback_e:
-                            logger.error(f"使用旧方法加载任务数据也失败: {str(fallback_e)}")
-
-            logger.info(f"从文件加载了 {loaded_count} 个ASR任务")
+                self.split_jobs[task.task_id] = {'pieces': pieces, 'segments': [None] * len(pieces), 'dir': piece_dir}
+            for piece, record in zip(pieces, task.pieces):
+                # 查询接口接受阿里云任务ID
+                self.poller.add(self._piece_key(task.task_id, piece.index), record['aliyun_task_id'],
+                                piece.duration_ms / 1000)
+            logger.info(f"继续轮询长音频任务的 {len(pieces)} 段 - 内部ID: {task.task_id}")
+
+    def _record_task(self, task: 'ASRTask') -> None:
+        """把单个任务的最新状态追加到任务日志，写入开销与任务总数无关"""
+        try:
+            self.journal.record(task.to_dict())
         except Exception as e:
-            logger.error(f"加载ASR任务状态失败: {str(e)}")
+            logger.error(f"记录ASR任务状态失败: {str(e)}")
 
     def _save_tasks(self) -> None:
-        """保存任务状态到文件，使用Pydantic模型进行序列化"""
+        """把全部任务状态写入任务日志（压缩为每个任务一行）"""
         try:
             with self.lock:
-                # 使用Pydantic模型序列化任务数据
-                tasks_data = []
-                for task in self.tasks.values():
-                    try:
-                        # 创建Pydantic模型
-                        model = ASRTaskModel(
-                            task_id=task.task_id,
-                            audio_file=task.audio_file,
-                            audio_url=task.audio_url,
-                            language=task.language,
-                            status=task.status,
-                            error=task.error,
-                            progress=task.progress,
-                            created_at=task.created_at,
-                            updated_at=task.updated_at
-                        )
-                        # 转换为字典
-                        tasks_data.append(model.model_dump(exclude_none=True))
-                    except Exception as task_e:
-                        logger.error(f"序列化任务数据失败: {str(task_e)}")
-                        # 如果序列化失败，使用旧方法
-                        tasks_data.append(task.to_dict())
-
-            # 确保目录存在
-            self.task_state_file.parent.mkdir(parents=True, exist_ok=True)
-
-            # 使用自定义编码器序列化JSON
-            with open(self.task_state_file, "w", encoding="utf-8") as f:
-                json.dump(tasks_data, f, ensure_ascii=False, indent=2, default=pydantic_encoder)
-
+                tasks_data = [task.to_dict() for task in self.tasks.values()]
+            self.journal.compact(tasks_data)
             logger.debug(f"成功保存 {len(tasks_data)} 个ASR任务到文件")
-
         except Exception as e:
             logger.error(f"保存ASR任务状态失败: {str(e)}")
 
@@ -254,7 +286,7 @@ class ASRTaskManager:
         with self.lock:
             self.tasks[task_id] = task
 
-        self._save_tasks()
+        self._record_task(task)
         return task_id
 
     def get_task(self, task_id: str) -> Optional[ASRTask]:
@@ -298,7 +330,40 @@ class ASRTaskManager:
                         setattr(task, key, value)
                 task.updated_at = time.time()
 
-        self._save_tasks()
+        if task:
+            self._record_task(task)
+            if kwargs.get('status') in ASRTaskStatus.FINAL:
+                self.completions.resolve(task_id, task)
+
+    def schedule_submit(self, task_id: str) -> Future:
+        """
+        在后台上传并提交任务，立即返回
+
+        Returns:
+            Future: 提交完成（已提交到阿里云或提交失败）时完成
+        """
+        return self.scheduler.schedule(task_id)
+
+    def wait_for_task(self, task_id: str, timeout: Optional[float] = None) -> Optional[ASRTask]:
+        """
+        等待任务完成或失败
+
+        Args:
+            task_id: 任务ID
+            timeout: 超时时间（秒），None表示一直等待
+
+        Returns:
+            Optional[ASRTask]: 结束的任务，任务不存在时返回None
+
+        Raises:
+            TimeoutError: 超时
+        """
+        future = self.completions.future(task_id)
+        # 先注册再检查状态，任务在两者之间结束也不会错过通知
+        task = self.get_task(task_id)
+        if task is None or task.status in ASRTaskStatus.FINAL:
+            self.completions.resolve(task_id, task)
+        return future.result(timeout)
 
     def submit_task(self, task_id: str) -> None:
         """
@@ -333,6 +398,11 @@ class ASRTaskManager:
                     )
                     return
 
+                # 长音频在静音处切分后并行提交
+                if self._should_split(audio_file):
+                    self._submit_split_task(task)
+                    return
+
                 # 更新任务状态为上传中
                 self.update_task(
                     task_id,
@@ -394,11 +464,12 @@ class ASRTaskManager:
                 # 通知UI更新进度
                 self._notify_task_progress(task.task_id, 10)
 
-            # 创建阿里云ASR客户端
-            client = create_aliyun_asr_client()
+            # 获取阿里云ASR客户端
+            client = self._get_asr_client()
 
             # 提交任务
             logger.info(f"开始提交ASR任务 - 内部ID: {task_id}")
+            self.submit_quota.acquire()
             response = client.submit_task(audio_file, task.language)
 
             # 保存响应对象
@@ -418,8 +489,8 @@ class ASRTaskManager:
 
             logger.info(f"成功提交ASR任务 - 内部ID: {task_id}, 阿里云ID: {aliyun_task_id}")
 
-            # 确保轮询线程正在运行
-            self._ensure_polling_thread()
+            # 加入轮询器，按音频时长安排查询
+            self._ensure_polling_thread(task)
 
         except Exception as e:
             logger.error(f"提交ASR任务失败: {str(e)}")
@@ -429,157 +500,275 @@ class ASRTaskManager:
                 error=str(e)
             )
 
-    def _ensure_polling_thread(self) -> None:
-        """确保轮询线程正在运行"""
-        if self.polling_thread is None or not self.polling_thread.is_alive():
-            self.stop_polling.clear()
-            self.polling_thread = threading.Thread(target=self._poll_tasks)
-            self.polling_thread.daemon = True
-            self.polling_thread.start()
+    def _should_split(self, audio_file: str) -> bool:
+        """音频时长超过cloud_asr_split_minutes时切分提交，设置为0时不切分"""
+        split_minutes = config.settings.get('cloud_asr_split_minutes', 120)
+        if not split_minutes or split_minutes <= 0:
+            return False
+        duration = self._audio_duration(audio_file)
+        return duration is not None and duration > split_minutes * 60
+
+    @staticmethod
+    def _piece_key(task_id: str, index: int) -> str:
+        return f"{task_id}#{index}"
+
+    @staticmethod
+    def _parse_key(key: str) -> tuple:
+        """轮询键 -> (任务ID, 分段序号)，不是分段时序号为None"""
+        task_id, _, index = key.partition('#')
+        return task_id, int(index) if index else None
+
+    @staticmethod
+    def _piece_dir(task_id: str) -> Path:
+        return Path(config.root_path) / "tmp" / "asr_pieces" / task_id
+
+    def _submit_split_task(self, task: 'ASRTask') -> None:
+        """
+        把长音频切分为多段，并行上传并提交，每段单独轮询
 
-    def _poll_tasks(self) -> None:  # sourcery skip: low-code-quality
-        """轮询任务状态"""
-        logger.info("启动ASR任务状态轮询线程")
+        任意一段上传或提交失败时不再开始其余分段，已提交的分段不加入轮询（结果被忽略），
+        删除分段文件后抛出异常，由调用方把任务标记为失败
+        """
+        task_id = task.task_id
+        self.update_task(task_id, status=ASRTaskStatus.UPLOADING, progress=5)
+        self._notify_task_progress(task_id, 5)
 
-        while not self.stop_polling.is_set():
+        piece_dir = self._piece_dir(task_id)
+        submitted: Dict[int, Any] = {}
+        try:
+            pieces = split_long_audio(
+                task.audio_file,
+                str(piece_dir),
+                piece_seconds=config.settings.get('cloud_asr_piece_minutes', 30) * 60,
+            )
+            client = self._get_asr_client()
+
+            def submit_piece(piece: AudioPiece):
+                success, url, error = upload_file_for_asr(local_file_path=piece.path, expires=24 * 3600)
+                if not success:
+                    raise RuntimeError(f"上传第{piece.index + 1}段音频失败: {error}")
+                self.submit_quota.acquire()
+                response = client.submit_task(url, task.language)
+                if response is None:
+                    raise RuntimeError(f"提交第{piece.index + 1}段音频失败")
+                submitted[piece.index] = response
+                return response
+
+            workers = max(1, min(len(pieces), config.settings.get('cloud_asr_split_concurrency', 4)))
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asr-piece')
             try:
-                # 获取所有需要轮询的任务
-                tasks_to_poll = []
-                with self.lock:
-                    tasks_to_poll.extend(
-                        task
-                        for task in self.tasks.values()
-                        if task.status
-                        in [ASRTaskStatus.SUBMITTED, ASRTaskStatus.RUNNING]
-                        and task.response
-                    )
-                if not tasks_to_poll:
-                    # 如果没有需要轮询的任务，等待一段时间后再检查
-                    time.sleep(5)
-                    continue
-
-                # 创建阿里云ASR客户端
-                client = create_aliyun_asr_client()
-                logger.info(f'开始轮询 {len(tasks_to_poll)} 个ASR任务状态')
-
-                # 轮询每个任务
-                for task in tasks_to_poll:
-                    try:
-                        # 查询任务状态
-                        aliyun_task_id = task.response.output.task_id if hasattr(task.response, 'output') else 'unknown'
-                        logger.info(f'查询任务状态 - 内部ID: {task.task_id}, 阿里云ID: {aliyun_task_id}')
-                        response = client.query_task(task.response)
-
-                        # 更新任务状态
-                        if response.output.task_status == 'RUNNING':
-                            # 任务正在运行
-                            # 进度从15%到90%
-                            progress = min(15 + int((task.progress - 15) * 0.8), 90)
-                            self.update_task(
-                                task.task_id,
-                                response=response,
-                                status=ASRTaskStatus.RUNNING,
-                                progress=progress
-                            )
-
-                            # 通知UI更新进度
-                            self._notify_task_progress(task.task_id, progress)
-                        elif response.output.task_status == 'SUCCEEDED':
-                            # 解析结果，获取转写结果的URL
-                            transcription_url = client.parse_result(response)
-
-                            # 下载转写结果文件
-                            json_file_path = f"{os.path.splitext(task.audio_file)[0]}_asr_result.json"
-                            saved_path = client.download_file(transcription_url, json_file_path)
-
-                            # 更新任务状态为分词中
-                            self.update_task(
-                                task.task_id,
-                                status=ASRTaskStatus.SPLITING,
-                                progress=92
-                            )
-                            self._notify_task_progress(task.task_id, 92)
-
-                            # 读取下载的JSON文件
-                            try:
-                                with open(saved_path, 'r', encoding='utf-8') as f:
-                                    json_data = json.load(f)
-                            except Exception as e:
-                                logger.error(f"读取ASR结果文件失败: {str(e)}")
-                                raise
-
-                            # 使用convert_to_segments_format转换格式
-                            logger.info("开始转换ASR结果格式...")
-                            segments = client.convert_to_segments_format(json_data)
-                            logger.info(f"转换完成，得到 {len(segments)} 个segments")
-
-                            # 更新进度
-                            self.update_task(task.task_id, progress=95)
-                            self._notify_task_progress(task.task_id, 95)
-
-                            # 生成本地SRT文件（基础版本，不使用NLP分句）
-                            srt_file_path = f"{os.path.splitext(task.audio_file)[0]}.srt"
-                            logger.info(f'生成本地SRT文件: {srt_file_path}')
-                            funasr_write_srt_file(segments, srt_file_path)
-
-                            # 更新进度
-                            self.update_task(task.task_id, progress=97)
-                            self._notify_task_progress(task.task_id, 97)
-
-                            # 生成segment_data文件（供智能分句功能使用）
-                            try:
-                                segment_data_path = self._create_segment_data_file(segments, task.audio_file)
-                                # 保存segment_data路径信息到工作对象中，供UI使用
-                                self._save_segment_data_path(segment_data_path, task.audio_file, task.language)
-                                logger.info(f"已生成segment_data文件，智能分句功能可用")
-                            except Exception as e:
-                                logger.warning(f"segment_data文件生成失败，智能分句功能将不可用: {str(e)}")
-
-                            # 更新进度
-                            self.update_task(task.task_id, progress=99)
-                            self._notify_task_progress(task.task_id, 99)
-
-                            # 更新任务状态为完成
-                            self.update_task(
-                                task.task_id,
-                                response=response,
-                                status=ASRTaskStatus.COMPLETED,
-                                progress=100
-                            )
-
-                            # 通知UI更新进度为100% - 使用线程安全的信号发送
-                            data_bridge.whisper_working.emit(task.task_id, 100)
-
-                            # 消费代币
-                            self._consume_tokens_for_task(task)
-
-                            # 通知UI任务完成
-                            self._notify_task_completed(task.task_id)
-
-                            aliyun_task_id = response.output.task_id if hasattr(response, 'output') else 'unknown'
-                            logger.info(f"ASR任务完成 - 内部ID: {task.task_id}, 阿里云ID: {aliyun_task_id}")
-                        elif response.output.task_status == 'FAILED':
-                            # 任务失败
-                            error_msg = response.message if hasattr(response, 'message') else "未知错误"
-                            self.update_task(
-                                task.task_id,
-                                response=response,
-                                status=ASRTaskStatus.FAILED,
-                                error=error_msg,
-                                progress=0
-                            )
-                            aliyun_task_id = response.output.task_id if hasattr(response, 'output') else 'unknown'
-                            logger.error(f"ASR任务失败 - 内部ID: {task.task_id}, 阿里云ID: {aliyun_task_id}, 错误: {error_msg}")
-                    except Exception as e:
-                        aliyun_task_id = task.response.output.task_id if hasattr(task.response, 'output') else 'unknown'
-                        logger.error(f"轮询任务时出错 - 内部ID: {task.task_id}, 阿里云ID: {aliyun_task_id}, 错误: {str(e)}")
-
-                # 等待一段时间后再次轮询
-                time.sleep(5)
-
-            except Exception as e:
-                logger.error(f"任务轮询线程出错: {str(e)}")
-                time.sleep(10)  # 出错后等待较长时间再重试
+                responses = list(executor.map(submit_piece, pieces))
+            finally:
+                # 出错时取消还没有开始的分段
+                executor.shutdown(wait=True, cancel_futures=True)
+        except BaseException:
+            if submitted:
+                logger.warning(f"长音频提交失败，忽略已提交的 {len(submitted)} 段 - 内部ID: {task_id}")
+            shutil.rmtree(piece_dir, ignore_errors=True)
+            raise
+
+        # 分段列表写入任务日志，重启后可以继续轮询
+        piece_records = [{**asdict(piece), 'aliyun_task_id': response.output.task_id}
+                         for piece, response in zip(pieces, responses)]
+        with self.lock:
+            self.split_jobs[task_id] = {'pieces': pieces, 'segments': [None] * len(pieces), 'dir': piece_dir}
+        self.update_task(task_id, status=ASRTaskStatus.SUBMITTED, progress=15, pieces=piece_records)
+        self._notify_task_progress(task_id, 15)
+        logger.info(f"长音频分 {len(pieces)} 段提交ASR任务 - 内部ID: {task_id}")
+
+        for piece, response in zip(pieces, responses):
+            self.poller.add(self._piece_key(task_id, piece.index), response, piece.duration_ms / 1000)
+
+    def _cancel_split_job(self, task_id: str) -> None:
+        """停止轮询其余分段并清理分段文件"""
+        with self.lock:
+            job = self.split_jobs.pop(task_id, None)
+        if job is None:
+            return
+        for piece in job['pieces']:
+            self.poller.remove(self._piece_key(task_id, piece.index))
+        shutil.rmtree(job['dir'], ignore_errors=True)
+
+    def _get_asr_client(self):
+        """复用同一个阿里云ASR客户端，不再每轮轮询重新创建"""
+        if self._asr_client is None:
+            self._asr_client = create_aliyun_asr_client()
+        return self._asr_client
+
+    @staticmethod
+    def _audio_duration(audio_file: str) -> Optional[float]:
+        """获取本地音频时长（秒），用于估算轮询间隔"""
+        try:
+            return sf.info(audio_file).duration
+        except Exception:
+            return None
+
+    def _ensure_polling_thread(self, task: Optional['ASRTask'] = None) -> None:
+        """把任务加入轮询器，轮询器按需启动"""
+        if task is not None and task.response is not None:
+            self.poller.add(task.task_id, task.response, self._audio_duration(task.audio_file))
+
+    def _on_task_running(self, key: str, response) -> None:
+        """任务仍在运行"""
+        task_id, index = self._parse_key(key)
+        task = self.get_task(task_id)
+        if not task:
+            return
+        # 进度从15%到90%
+        progress = min(15 + int((task.progress - 15) * 0.8), 90)
+        # 分段任务的响应不保存到整体任务上
+        extra = {'response': response} if index is None else {}
+        self.update_task(
+            task_id,
+            status=ASRTaskStatus.RUNNING,
+            progress=progress,
+            **extra
+        )
+        # 通知UI更新进度
+        self._notify_task_progress(task_id, progress)
+
+    def _on_task_failed(self, key: str, response) -> None:
+        """任务失败，长音频任务任意一段失败时整体失败"""
+        task_id, index = self._parse_key(key)
+        if index is not None:
+            self._cancel_split_job(task_id)
+        error_msg = response.message if hasattr(response, 'message') else "未知错误"
+        self.update_task(
+            task_id,
+            response=response,
+            status=ASRTaskStatus.FAILED,
+            error=error_msg,
+            progress=0
+        )
+        aliyun_task_id = response.output.task_id if hasattr(response, 'output') else 'unknown'
+        logger.error(f"ASR任务失败 - 内部ID: {task_id}, 阿里云ID: {aliyun_task_id}, 错误: {error_msg}")
+
+    def _on_task_succeeded(self, key: str, response) -> None:
+        """任务识别成功，在后处理线程中下载结果并生成字幕"""
+        task_id, index = self._parse_key(key)
+        task = self.get_task(task_id)
+        if not task:
+            return
+        try:
+            if index is None:
+                self._process_succeeded_task(task, response)
+            else:
+                self._process_succeeded_piece(task, index, response)
+        except Exception as e:
+            if index is not None:
+                self._cancel_split_job(task_id)
+            logger.error(f"处理ASR结果失败 - 内部ID: {task_id}, 错误: {str(e)}")
+            self.update_task(task_id, status=ASRTaskStatus.FAILED, error=str(e))
+            data_bridge.emit_task_error(task_id, str(e))
+
+    def _process_succeeded_task(self, task: 'ASRTask', response) -> None:
+        """下载转写结果，生成SRT和segment_data文件"""
+        client = self._get_asr_client()
+
+        # 解析结果，获取转写结果的URL
+        transcription_url = client.parse_result(response)
+
+        # 更新任务状态为分词中
+        self.update_task(
+            task.task_id,
+            status=ASRTaskStatus.SPLITING,
+            progress=92
+        )
+        self._notify_task_progress(task.task_id, 92)
+
+        # 边下载转写结果边转换，SRT文件随下载逐条写入，原始结果仍保存到本地
+        json_file_path = f"{os.path.splitext(task.audio_file)[0]}_asr_result.json"
+        srt_file_path = f"{os.path.splitext(task.audio_file)[0]}.srt"
+        logger.info(f'生成本地SRT文件: {srt_file_path}')
+        segments = []
+
+        def collect_segments():
+            for segment in client.stream_segments(transcription_url, json_file_path):
+                segments.append(segment)
+                yield segment
+
+        # 生成本地SRT文件（基础版本，不使用NLP分句）
+        # 先写到同目录的临时文件，下载完成后再替换，下载中断时不会留下不完整的SRT
+        temp_srt_path = f"{srt_file_path}.tmp"
+        try:
+            funasr_write_srt_file(collect_segments(), temp_srt_path)
+            os.replace(temp_srt_path, srt_file_path)
+        except BaseException:
+            if os.path.exists(temp_srt_path):
+                os.unlink(temp_srt_path)
+            raise
+        logger.info(f"转换完成，得到 {len(segments)} 个segments")
+
+        self._finish_task(task, segments, response)
+
+    def _process_succeeded_piece(self, task: 'ASRTask', index: int, response) -> None:
+        """下载一段的转写结果，所有分段完成后合并生成SRT和segment_data文件"""
+        with self.lock:
+            job = self.split_jobs.get(task.task_id)
+        if job is None:
+            return
+        client = self._get_asr_client()
+        piece = job['pieces'][index]
+        json_file_path = f"{os.path.splitext(piece.path)[0]}_asr_result.json"
+        segments = list(client.stream_segments(client.parse_result(response), json_file_path))
+
+        with self.lock:
+            job['segments'][index] = segments
+            finished = sum(result is not None for result in job['segments'])
+            if finished < len(job['segments']):
+                logger.info(f"长音频第 {index + 1} 段识别完成 ({finished}/{len(job['segments'])}) - 内部ID: {task.task_id}")
+                return
+            self.split_jobs.pop(task.task_id, None)
+
+        self.update_task(task.task_id, status=ASRTaskStatus.SPLITING, progress=92)
+        self._notify_task_progress(task.task_id, 92)
+
+        merged = merge_piece_segments(job['pieces'], job['segments'])
+        srt_file_path = f"{os.path.splitext(task.audio_file)[0]}.srt"
+        logger.info(f'合并 {len(job["pieces"])} 段识别结果，生成本地SRT文件: {srt_file_path}')
+        funasr_write_srt_file(merged, srt_file_path)
+        shutil.rmtree(job['dir'], ignore_errors=True)
+
+        self._finish_task(task, merged, response)
+
+    def _finish_task(self, task: 'ASRTask', segments: List[Dict[str, Any]], response) -> None:
+        """SRT文件已生成，写segment_data文件并标记任务完成"""
+        # 更新进度
+        self.update_task(task.task_id, progress=97)
+        self._notify_task_progress(task.task_id, 97)
+
+        # 生成segment_data文件（供智能分句功能使用）
+        try:
+            segment_data_path = self._create_segment_data_file(segments, task.audio_file)
+            # 保存segment_data路径信息到工作对象中，供UI使用
+            self._save_segment_data_path(segment_data_path, task.audio_file, task.language)
+            logger.info(f"已生成segment_data文件，智能分句功能可用")
+        except Exception as e:
+            logger.warning(f"segment_data文件生成失败，智能分句功能将不可用: {str(e)}")
+
+        # 更新进度
+        self.update_task(task.task_id, progress=99)
+        self._notify_task_progress(task.task_id, 99)
+
+        # 更新任务状态为完成
+        self.update_task(
+            task.task_id,
+            response=response,
+            status=ASRTaskStatus.COMPLETED,
+            progress=100
+        )
+
+        # 通知UI更新进度为100% - 使用线程安全的信号发送
+        data_bridge.whisper_working.emit(task.task_id, 100)
+
+        # 消费代币
+        self._consume_tokens_for_task(task)
+
+        # 通知UI任务完成
+        self._notify_task_completed(task.task_id)
+
+        aliyun_task_id = response.output.task_id if hasattr(response, 'output') else 'unknown'
+        logger.info(f"ASR任务完成 - 内部ID: {task.task_id}, 阿里云ID: {aliyun_task_id}")
 
     def _consume_tokens_for_task(self, task: 'ASRTask') -> None:
         """
@@ -667,17 +856,18 @@ class ASRTaskManager:
 
     def stop(self) -> None:
         """停止任务管理器"""
-        self.stop_polling.set()
-        if self.polling_thread and self.polling_thread.is_alive():
-            self.polling_thread.join(timeout=2)
-        self._save_tasks()
+        self.scheduler.shutdown()
+        self.poller.stop()
+        self.journal.close()
 
     def _create_segment_data_file(self, segments, audio_file):
         """创建segment_data文件"""
         from utils.file_utils import write_segment_data_file
 
-        segment_data_path = f"{os.path.splitext(audio_file)[0]}_segment_data.json"
-        write_segment_data_file(segments, segment_data_path)
+        compact = config.settings.get('segment_data_compact', False)
+        suffix = 'bin' if compact else 'json'
+        segment_data_path = f"{os.path.splitext(audio_file)[0]}_segment_data.{suffix}"
+        segment_data_path = write_segment_data_file(segments, segment_data_path, compact=compact)
         logger.info(f"已创建segment_data文件: {segment_data_path}")
         return segment_data_path
 
@@ -720,6 +910,13 @@ def get_task_manager() -> ASRTaskManager:
         _task_manager_instance = ASRTaskManager()
     return _task_manager_instance
 
+
+def stop_task_manager() -> None:
+    """程序退出时停止已创建的任务管理器，写入剩余的任务状态"""
+    if _task_manager_instance is not None:
+        _task_manager_instance.stop()
+
+
 def get_trans_task_manager() -> ASRTaskManager:
     """
     获取任务管理器实例
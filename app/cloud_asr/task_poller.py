@@ -0,0 +1,193 @@
+"""
+云ASR任务状态轮询
+- 每个任务独立计算下次查询时间：首次查询时间和最大间隔按音频时长缩放，之后指数退避，并加随机抖动
+- 到期的任务并发查询，最大并发数可配置
+- 识别成功的任务交给单独的后处理线程（下载结果、生成字幕），不会阻塞其他任务的状态查询
+
+查询函数和结果处理函数由调用方传入，可以用模拟的Transcription测试
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from utils import logger
+
+RUNNING_STATUSES = ('PENDING', 'RUNNING')
+
+
+@dataclass
+class PollEntry:
+    """一个待轮询的任务"""
+    key: str
+    handle: Any  # 提交任务时的响应对象，作为查询参数
+    interval: float
+    max_interval: float
+    next_poll: float
+    in_flight: bool = False
+    polls: int = 0
+    errors: int = 0
+
+
+class TranscriptionPoller:
+    """自适应的转写任务轮询器"""
+
+    def __init__(self, fetch: Callable[[Any], Any],
+                 on_running: Callable[[str, Any], None],
+                 on_succeeded: Callable[[str, Any], None],
+                 on_failed: Callable[[str, Any], None],
+                 max_concurrency: int = 4, min_interval: float = 2.0, max_interval: float = 60.0,
+                 first_poll_ratio: float = 0.02, backoff: float = 1.5, jitter: float = 0.2,
+                 post_workers: int = 1):
+        """
+        Args:
+            fetch: 查询函数，参数为任务句柄，返回带output.task_status的响应
+            on_running: 任务仍在运行时的回调(key, response)
+            on_succeeded: 任务成功后的回调(key, response)，在后处理线程中执行
+            on_failed: 任务失败后的回调(key, response)
+            max_concurrency: 同时查询的最大任务数
+            min_interval: 最小查询间隔（秒）
+            max_interval: 最大查询间隔（秒）
+            first_poll_ratio: 首次查询延迟占音频时长的比例
+            backoff: 每次查询后间隔的增长倍数
+            jitter: 间隔的随机抖动比例，避免多个任务同时查询
+            post_workers: 后处理线程数
+        """
+        self.fetch = fetch
+        self.on_running = on_running
+        self.on_succeeded = on_succeeded
+        self.on_failed = on_failed
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.first_poll_ratio = first_poll_ratio
+        self.backoff = backoff
+        self.jitter = jitter
+        self.post_workers = max(1, post_workers)
+
+        self.entries: Dict[str, PollEntry] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.fetch_executor: Optional[ThreadPoolExecutor] = None
+        self.post_executor: Optional[ThreadPoolExecutor] = None
+        self.total_polls = 0
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def add(self, key: str, handle: Any, duration: Optional[float] = None) -> None:
+        """
+        添加待轮询的任务
+
+        Args:
+            key: 任务ID
+            handle: 查询参数
+            duration: 音频时长（秒），未知时按最小间隔查询
+        """
+        duration = duration or 0
+        first_delay = max(self.min_interval, duration * self.first_poll_ratio)
+        max_interval = min(self.max_interval, max(self.min_interval * 2, duration * self.first_poll_ratio * 2))
+        entry = PollEntry(key=key, handle=handle, interval=first_delay, max_interval=max_interval,
+                          next_poll=time.monotonic() + self._jittered(first_delay))
+        with self.lock:
+            self.entries[key] = entry
+        logger.debug(f"添加轮询任务: {key}, 音频时长: {duration:.0f}秒, 首次查询延迟: {first_delay:.1f}秒")
+        self.start()
+        self.wakeup.set()
+
+    def remove(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def start(self) -> None:
+        """启动轮询线程"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopped.clear()
+            self.fetch_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='asr-poll')
+            self.post_executor = ThreadPoolExecutor(max_workers=self.post_workers, thread_name_prefix='asr-post')
+            self.thread = threading.Thread(target=self._run, daemon=True, name='asr-poller')
+            self.thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """停止轮询，等待正在进行的后处理完成"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+        for executor in (self.fetch_executor, self.post_executor):
+            if executor:
+                executor.shutdown(wait=wait)
+
+    def _run(self) -> None:
+        logger.info("启动ASR任务状态轮询线程")
+        while not self.stopped.is_set():
+            now = time.monotonic()
+            with self.lock:
+                due = [entry for entry in self.entries.values() if not entry.in_flight and entry.next_poll <= now]
+                for entry in due:
+                    entry.in_flight = True
+                waiting = [entry.next_poll for entry in self.entries.values() if not entry.in_flight]
+            try:
+                for entry in due:
+                    self.fetch_executor.submit(self._poll_entry, entry)
+            except RuntimeError:
+                # stop()已关闭线程池
+                break
+
+            # 睡到最近一个任务到期，有新任务或查询完成时提前唤醒
+            timeout = max(0.0, min(waiting) - time.monotonic()) if waiting else None
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+    def _reschedule(self, entry: PollEntry) -> None:
+        entry.interval = min(entry.max_interval, max(self.min_interval, entry.interval * self.backoff))
+        entry.next_poll = time.monotonic() + self._jittered(entry.interval)
+        entry.in_flight = False
+
+    def _poll_entry(self, entry: PollEntry) -> None:
+        """查询单个任务状态，在查询线程池中执行"""
+        try:
+            response = self.fetch(entry.handle)
+            status = response.output.task_status
+        except Exception as e:
+            logger.error(f"查询任务状态失败: {entry.key}, 错误: {str(e)}")
+            with self.lock:
+                entry.errors += 1
+                self._reschedule(entry)
+            self.wakeup.set()
+            return
+
+        with self.lock:
+            entry.polls += 1
+            self.total_polls += 1
+            if status in RUNNING_STATUSES:
+                self._reschedule(entry)
+            else:
+                self.entries.pop(entry.key, None)
+        self.wakeup.set()
+
+        try:
+            if status in RUNNING_STATUSES:
+                self.on_running(entry.key, response)
+            elif status == 'SUCCEEDED':
+                self.post_executor.submit(self._post_process, entry.key, response)
+            else:
+                self.on_failed(entry.key, response)
+        except Exception as e:
+            logger.error(f"处理任务状态失败: {entry.key}, 错误: {str(e)}")
+
+    def _post_process(self, key: str, response: Any) -> None:
+        try:
+            self.on_succeeded(key, response)
+        except Exception as e:
+            logger.error(f"任务后处理失败: {key}, 错误: {str(e)}")
@@ -0,0 +1,132 @@
+"""
+OSS上传索引
+记录 文件内容哈希 -> OSS路径和有效期，同一个文件（重新提交同一段音频、多次对同一个segment_data做智能分句）
+在OSS上的对象仍有效时跳过上传，只重新签名访问链接
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.audio_cache import file_content_hash
+from nice_ui.configure import config
+from utils import logger
+
+# 对象剩余有效期小于该值时不再复用，重新上传（秒）
+MIN_REMAINING_SECONDS = 3600
+
+
+class UploadIndex:
+    """按内容哈希复用已上传的OSS对象"""
+
+    def __init__(self, index_file: Path | str):
+        self.index_file = Path(index_file)
+        self.lock = threading.Lock()
+        # (路径, 大小, 修改时间)不变时不重复计算哈希
+        self._hash_memo: Dict[tuple, str] = {}
+        self.entries: Dict[str, dict] = {}
+        self.bytes_saved = 0
+        self.reused = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            self.entries = {digest: entry for digest, entry in data.get('entries', {}).items()
+                            if entry['expires_at'] > now}
+            self.bytes_saved = data.get('bytes_saved', 0)
+        except Exception as e:
+            logger.error(f"加载OSS上传索引失败: {str(e)}")
+
+    def _save(self) -> None:
+        """保存索引，调用方需持有self.lock"""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries, 'bytes_saved': self.bytes_saved}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def content_hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = file_content_hash(file_path)
+        return self._hash_memo[memo_key]
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """
+        查找内容相同且仍有效的OSS对象
+
+        Returns:
+            Optional[str]: OSS路径，没有可复用的对象时返回None
+        """
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            if entry['expires_at'] - time.time() < MIN_REMAINING_SECONDS:
+                del self.entries[digest]
+                self._save()
+                return None
+            return entry['key']
+
+    def record(self, digest: str, oss_path: str, size: int, expires: int) -> None:
+        """
+        记录上传完成的对象
+
+        Args:
+            digest: 文件内容哈希
+            oss_path: OSS路径
+            size: 文件大小（字节）
+            expires: 对象的有效期（秒）
+        """
+        with self.lock:
+            self.entries[digest] = {'key': oss_path, 'size': size, 'expires_at': time.time() + expires}
+            self._save()
+
+    def mark_reused(self, digest: str) -> int:
+        """记录一次复用，返回本次节省的上传字节数"""
+        with self.lock:
+            entry = self.entries.get(digest)
+            size = entry['size'] if entry else 0
+            self.reused += 1
+            self.bytes_saved += size
+            self._save()
+            return size
+
+    def invalidate(self, digest: str) -> None:
+        """对象已不存在时删除记录"""
+        with self.lock:
+            if self.entries.pop(digest, None) is not None:
+                self._save()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'reused': self.reused,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+# 单例模式
+_upload_index_instance: Optional[UploadIndex] = None
+
+
+def get_upload_index() -> UploadIndex:
+    """
+    获取OSS上传索引实例
+
+    Returns:
+        UploadIndex: OSS上传索引实例
+    """
+    global _upload_index_instance
+    if _upload_index_instance is None:
+        _upload_index_instance = UploadIndex(Path(config.root_path) / "tmp" / "oss_upload_index.json")
+    return _upload_index_instance
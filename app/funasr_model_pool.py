@@ -0,0 +1,267 @@
+"""
+FunASR模型池
+在排队的多个ASR任务之间复用已加载的AutoModel，避免每个任务重复加载几百MB的权重
+
+- acquire/release 引用计数，使用中的模型不会被淘汰
+- 空闲超过idle_timeout的模型由后台线程卸载
+- 已加载模型的估算内存超过memory_budget_mb时，按最近最少使用顺序淘汰空闲模型
+- 统计加载耗时和命中率
+- 每个模型一把调用锁（model_lock），AutoModel.generate会修改模型内部状态，共享同一实例的所有线程都要持有它
+"""
+import json
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from nice_ui.configure import config
+from utils import logger
+
+
+@dataclass
+class PooledModel:
+    """模型池中的一个模型"""
+    key: str
+    model: Any
+    size_bytes: int = 0
+    load_time: float = 0.0
+    ref_count: int = 0
+    last_used: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock)  # generate调用锁
+
+
+def _load_auto_model(**model_kwargs):
+    from funasr import AutoModel
+    return AutoModel(**model_kwargs)
+
+
+def estimate_model_size(model: Any) -> int:
+    """估算AutoModel占用的内存（参数+buffer字节数），包括vad/punc/spk子模型"""
+    total = 0
+    for attr in ('model', 'vad_model', 'punc_model', 'spk_model'):
+        module = getattr(model, attr, None)
+        if module is None:
+            continue
+        try:
+            total += sum(p.numel() * p.element_size() for p in module.parameters())
+            total += sum(b.numel() * b.element_size() for b in module.buffers())
+        except Exception:
+            continue
+    return total
+
+
+class FunASRModelPool:
+    """FunASR模型注册表，按加载参数缓存AutoModel实例"""
+
+    def __init__(self, idle_timeout: float = 600, memory_budget_mb: float = 4096,
+                 loader: Callable[..., Any] = _load_auto_model,
+                 size_estimator: Callable[[Any], int] = estimate_model_size):
+        """
+        Args:
+            idle_timeout: 模型空闲多少秒后卸载，<=0表示不按空闲时间卸载
+            memory_budget_mb: 已加载模型的内存预算（MB），<=0表示不限制
+            loader: 模型加载函数，参数为AutoModel的关键字参数
+            size_estimator: 模型内存估算函数
+        """
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._loader = loader
+        self._size_estimator = size_estimator
+        self._models: Dict[str, PooledModel] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # 不是从池中获取的模型（如测试替身）的调用锁
+        self._external_locks: 'weakref.WeakKeyDictionary[Any, threading.Lock]' = weakref.WeakKeyDictionary()
+        self._stop_reaper = threading.Event()
+        self._reaper_thread = None
+
+        # 统计指标
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_time = 0.0
+
+    @staticmethod
+    def make_key(**model_kwargs) -> str:
+        """根据AutoModel加载参数生成缓存键"""
+        return json.dumps(model_kwargs, sort_keys=True, default=str)
+
+    def acquire(self, **model_kwargs) -> Any:
+        """
+        获取模型并增加引用计数，不存在时加载。使用完毕后必须调用release
+
+        Args:
+            **model_kwargs: AutoModel的关键字参数
+        """
+        key = self.make_key(**model_kwargs)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一个模型只加载一次，不同模型可以并行加载
+        with key_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry:
+                    self.hits += 1
+                    entry.ref_count += 1
+                    entry.last_used = time.time()
+                    return entry.model
+                self.misses += 1
+
+            start = time.time()
+            model = self._loader(**model_kwargs)
+            load_time = time.time() - start
+            size_bytes = self._size_estimator(model)
+            logger.info(f"加载FunASR模型: {model_kwargs.get('model')}, 耗时: {load_time:.2f}秒, 估算内存: {size_bytes / 1024 / 1024:.1f}MB")
+
+            with self._lock:
+                self.total_load_time += load_time
+                self._models[key] = PooledModel(key=key, model=model, size_bytes=size_bytes,
+                                                load_time=load_time, ref_count=1)
+                self._enforce_memory_budget()
+
+        self._ensure_reaper_thread()
+        return model
+
+    def release(self, model: Any) -> None:
+        """归还模型，引用计数减一"""
+        with self._lock:
+            for entry in self._models.values():
+                if entry.model is model:
+                    entry.ref_count = max(0, entry.ref_count - 1)
+                    entry.last_used = time.time()
+                    break
+            self._enforce_memory_budget()
+
+    @contextmanager
+    def use(self, **model_kwargs):
+        """with方式获取模型，退出时自动归还"""
+        model = self.acquire(**model_kwargs)
+        try:
+            yield model
+        finally:
+            self.release(model)
+
+    def model_lock(self, model: Any) -> threading.Lock:
+        """
+        模型的调用锁，同一个模型实例在所有任务、所有线程间共用一把锁
+
+        Args:
+            model: acquire返回的模型
+        """
+        with self._lock:
+            for entry in self._models.values():
+                if entry.model is model:
+                    return entry.lock
+            return self._external_locks.setdefault(model, threading.Lock())
+
+    def generate(self, model: Any, **kwargs) -> Any:
+        """持有模型的调用锁执行model.generate"""
+        with self.model_lock(model):
+            return model.generate(**kwargs)
+
+    def warm_up(self, *model_specs: Dict[str, Any]) -> None:
+        """
+        预加载模型，加载后立即归还，供后续任务直接命中
+
+        Args:
+            *model_specs: 每个元素是一组AutoModel关键字参数
+        """
+        for spec in model_specs:
+            self.release(self.acquire(**spec))
+
+    def evict_idle(self) -> int:
+        """卸载空闲时间超过idle_timeout的模型，返回卸载数量"""
+        if self.idle_timeout <= 0:
+            return 0
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._models.items()
+                       if entry.ref_count == 0 and now - entry.last_used >= self.idle_timeout]
+            for key in expired:
+                self._evict(key, '空闲超时')
+        return len(expired)
+
+    def _enforce_memory_budget(self) -> None:
+        """超出内存预算时按LRU淘汰空闲模型，调用方需持有self._lock"""
+        if self.memory_budget <= 0:
+            return
+        idle = sorted((entry for entry in self._models.values() if entry.ref_count == 0),
+                      key=lambda entry: entry.last_used)
+        for entry in idle:
+            if self.loaded_bytes() <= self.memory_budget:
+                break
+            self._evict(entry.key, '超出内存预算')
+
+    def _evict(self, key: str, reason: str) -> None:
+        """卸载模型，调用方需持有self._lock"""
+        entry = self._models.pop(key, None)
+        if entry:
+            self.evictions += 1
+            logger.info(f"卸载FunASR模型({reason}): {json.loads(key).get('model')}, 释放约 {entry.size_bytes / 1024 / 1024:.1f}MB")
+
+    def loaded_bytes(self) -> int:
+        """已加载模型的估算内存总量"""
+        return sum(entry.size_bytes for entry in self._models.values())
+
+    def _ensure_reaper_thread(self) -> None:
+        """确保空闲卸载线程正在运行"""
+        if self.idle_timeout <= 0:
+            return
+        if self._reaper_thread is None or not self._reaper_thread.is_alive():
+            self._stop_reaper.clear()
+            self._reaper_thread = threading.Thread(target=self._reap_idle_models, daemon=True)
+            self._reaper_thread.start()
+
+    def _reap_idle_models(self) -> None:
+        """后台定期卸载空闲模型，池为空时退出"""
+        interval = max(1.0, min(self.idle_timeout / 2, 60))
+        while not self._stop_reaper.wait(interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._models:
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        """模型池统计信息"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'total_load_time': self.total_load_time,
+                'avg_load_time': self.total_load_time / self.misses if self.misses else 0.0,
+                'loaded_models': len(self._models),
+                'loaded_mb': self.loaded_bytes() / 1024 / 1024,
+            }
+
+    def clear(self) -> None:
+        """停止后台线程并卸载所有模型"""
+        self._stop_reaper.set()
+        with self._lock:
+            for key in list(self._models):
+                self._evict(key, '清空模型池')
+
+
+# 单例模式
+_model_pool_instance: Optional[FunASRModelPool] = None
+
+
+def get_model_pool() -> FunASRModelPool:
+    """
+    获取模型池实例
+
+    Returns:
+        FunASRModelPool: 模型池实例
+    """
+    global _model_pool_instance
+    if _model_pool_instance is None:
+        _model_pool_instance = FunASRModelPool(
+            idle_timeout=config.settings.get('funasr_model_idle_timeout', 600),
+            memory_budget_mb=config.settings.get('funasr_model_memory_mb', 4096),
+        )
+    return _model_pool_instance
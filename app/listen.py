@@ -1,12 +1,14 @@
 import os
-import tempfile
 import threading
 import time
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import soundfile as sf  # 用于读取和裁剪音频文件
 
+from app.funasr_model_pool import get_model_pool
 from nice_ui.configure import config
 from nice_ui.configure.signal import data_bridge
 from utils import logger
@@ -17,20 +19,23 @@ funasr = LazyLoader('funasr')
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
 
-@lru_cache(maxsize=None)
-def load_model(model_path, model_revision="v2.0.4"):
-    from funasr import AutoModel
-    return AutoModel(model=model_path, model_revision=model_revision, disable_update=True, disable_pbar=True, disable_log=True)
+def model_spec(model_path, model_revision="v2.0.4") -> dict:
+    """单个FunASR模型的AutoModel加载参数"""
+    return dict(model=model_path, model_revision=model_revision, disable_update=True, disable_pbar=True, disable_log=True)
 
 
 class SrtWriter:
 
-    def __init__(self, unid: str, wav_dirname: str, raw_noextname: str, ln: str):
+    def __init__(self, unid: str, wav_dirname: str, raw_noextname: str, ln: str,
+                 max_workers: Optional[int] = None, batch_size: Optional[int] = None):
         """
 
         Args:
             input_dirname: 需要提取文本的音频文件
             ln: 音频文件语言
+            max_workers: SenseVoice批处理的线程数，默认读取config.settings['funasr_workers']，
+                         同一个模型的generate调用由模型池的调用锁串行化，batch_size和max_workers都<=1时使用串行处理
+            batch_size: SenseVoice每批处理的VAD片段数，默认读取config.settings['funasr_batch_size']
         """
         self.srt_name = raw_noextname
         logger.info(f'wav_dirname : {wav_dirname}')
@@ -42,6 +47,8 @@ class SrtWriter:
         self.data_bridge = data_bridge
         self.unid = unid
         self._stop_progress_thread = False  # 用于停止进度线程，线程是用来更新funasr的进度条的，是一个假的进度条
+        self.max_workers = max(1, max_workers or config.settings.get('funasr_workers', 1))
+        self.batch_size = max(1, batch_size or config.settings.get('funasr_batch_size', 1))
 
     # @log_whisper_progress
     def _update_progress(self):
@@ -64,6 +71,8 @@ class SrtWriter:
         else:
             logger.error(f'模型匹配失败：{model_name}')
 
+        logger.info(f"FunASR模型池状态: {get_model_pool().stats()}")
+
     def funasr_zn_model(self, model_name: str):
         """
         使用FunASR中文模型进行语音识别
@@ -76,6 +85,7 @@ class SrtWriter:
         智能分句功能将在用户手动触发时执行
         """
         logger.info('使用中文模型')
+        model = None
 
         try:
             # 1. 初始化ASR模型
@@ -102,18 +112,20 @@ class SrtWriter:
             logger.error(f"funasr_zn_model执行过程中发生严重错误: {str(e)}")
             # 即使发生严重错误，也要通知UI完成，避免界面卡死
         finally:
+            if model is not None:
+                get_model_pool().release(model)
             # 无论如何都要通知完成
             self.data_bridge.emit_whisper_finished(self.unid)
 
-    def _init_asr_model(self, model_name: str):
-        """初始化ASR模型"""
+    @staticmethod
+    def _asr_model_spec(model_name: str) -> dict:
+        """中文模型（paraformer + VAD + punc + speaker）的AutoModel加载参数"""
         model_dir = f'{config.funasr_model_path}/{model_name}'
         vad_model_dir = f'{config.funasr_model_path}/speech_fsmn_vad_zh-cn-16k-common-pytorch'
         punc_model_dir = f'{config.funasr_model_path}/punc_ct-transformer_cn-en-common-vocab471067-large'
         spk_model_dir = f'{config.funasr_model_path}/speech_campplus_sv_zh-cn_16k-common'
 
-        from funasr import AutoModel
-        return AutoModel(
+        return dict(
             model=model_dir, model_revision="v2.0.4",
             vad_model=vad_model_dir, vad_model_revision="v2.0.4",
             punc_model=punc_model_dir, punc_model_revision="v2.0.4",
@@ -122,13 +134,18 @@ class SrtWriter:
             disable_update=True, disable_pbar=True, disable_log=True
         )
 
+    def _init_asr_model(self, model_name: str):
+        """从模型池获取ASR模型，使用完毕后需要归还"""
+        return get_model_pool().acquire(**self._asr_model_spec(model_name))
+
     def _run_asr_recognition(self, model) -> list:
         """执行ASR识别"""
         progress_thread = threading.Thread(target=self._update_progress)
         progress_thread.start()
 
         try:
-            res = model.generate(
+            res = get_model_pool().generate(
+                model,
                 input=self.input_file,
                 batch_size_s=300,
                 hotword=None,
@@ -142,8 +159,10 @@ class SrtWriter:
 
     def _create_segment_data_file(self, segments):
         """创建segment_data文件"""
-        segment_data_path = f"{os.path.splitext(self.input_file)[0]}_segment_data.json"
-        write_segment_data_file(segments, segment_data_path)
+        compact = config.settings.get('segment_data_compact', False)
+        suffix = 'bin' if compact else 'json'
+        segment_data_path = f"{os.path.splitext(self.input_file)[0]}_segment_data.{suffix}"
+        segment_data_path = write_segment_data_file(segments, segment_data_path, compact=compact)
         logger.info(f"已创建segment_data文件: {segment_data_path}")
         return segment_data_path
 
@@ -189,6 +208,7 @@ class SrtWriter:
         智能分句功能将在用户手动触发时执行
         """
         logger.info('使用SenseVoiceSmall')
+        models = {}
 
         try:
             # 1. 初始化所有需要的模型
@@ -215,12 +235,14 @@ class SrtWriter:
             logger.error(f"funasr_sense_model执行过程中发生严重错误: {str(e)}")
             # 即使发生严重错误，也要通知UI完成，避免界面卡死
         finally:
+            for model in models.values():
+                get_model_pool().release(model)
             # 无论如何都要通知完成
             self.data_bridge.emit_whisper_finished(self.unid)
 
     @staticmethod
-    def _init_models(model_name: str) -> dict:
-        """初始化所有需要的模型"""
+    def _sense_model_specs(model_name: str) -> dict:
+        """SenseVoice流程需要的各个模型的AutoModel加载参数"""
         model_dir = f'{config.funasr_model_path}/{model_name}'
         vad_model_dir = f'{config.funasr_model_path}/speech_fsmn_vad_zh-cn-16k-common-pytorch'
         # 标点恢复
@@ -228,15 +250,41 @@ class SrtWriter:
         fa_zh_dir = f'{config.funasr_model_path}/speech_timestamp_prediction-v1-16k-offline'
 
         return {
-            'vad': load_model(vad_model_dir),
-            'asr': load_model(model_dir),
-            'time': load_model(fa_zh_dir),
-            'punc': load_model(punc_model_dir),
+            'vad': model_spec(vad_model_dir),
+            'asr': model_spec(model_dir),
+            'time': model_spec(fa_zh_dir),
+            'punc': model_spec(punc_model_dir),
         }
 
+    @classmethod
+    def _init_models(cls, model_name: str) -> dict:
+        """从模型池获取所有需要的模型，使用完毕后需要归还"""
+        pool = get_model_pool()
+        models = {}
+        try:
+            for name, spec in cls._sense_model_specs(model_name).items():
+                models[name] = pool.acquire(**spec)
+        except Exception:
+            # 部分模型加载失败时归还已获取的模型，避免引用计数泄漏
+            for model in models.values():
+                pool.release(model)
+            raise
+        return models
+
+    @classmethod
+    def warm_up_models(cls, model_name: str) -> None:
+        """预加载指定识别模型，供排队中的后续任务直接复用"""
+        if model_name == 'SenseVoiceSmall':
+            specs = list(cls._sense_model_specs(model_name).values())
+        else:
+            specs = [cls._asr_model_spec(model_name)]
+        get_model_pool().warm_up(*specs)
+        logger.info(f"模型预加载完成: {model_name}, 模型池状态: {get_model_pool().stats()}")
+
     def _split_audio_by_vad(self, vad_model) -> list:
         """使用VAD模型分割音频"""
-        vad_res = vad_model.generate(
+        vad_res = get_model_pool().generate(
+            vad_model,
             input=self.input_file,
             cache={},
             max_single_segment_time=30000,  # 最大单个片段时长
@@ -250,56 +298,142 @@ class SrtWriter:
             {'start': 1230, 'end': 4590, 'text': 'i really encourage you to try and sense your body more'},
             {'start': 4610, 'end': 6770, 'text': 'and sense the skis on the snow,'}]
         """
+        if self.max_workers <= 1 and self.batch_size <= 1:
+            return self._process_audio_segments_serial(segments, models)
+        return self._process_audio_segments_batched(segments, models)
 
-        audio_data, sample_rate = sf.read(self.input_file)
+    def _process_audio_segments_serial(self, segments: list, models: dict) -> list:
+        """逐个处理音频片段（串行模式）"""
         results = []
         total_segments = len(segments)
 
-        for i, segment in enumerate(segments):
-            # 1. 裁剪音频片段
-            cropped_audio = self.crop_audio(audio_data, segment[0], segment[1], sample_rate)
+        # 按片段seek读取，不把整个wav解码到内存
+        with sf.SoundFile(self.input_file) as audio_file:
+            sample_rate = audio_file.samplerate
+            for i, segment in enumerate(segments):
+                # 1. 读取音频片段
+                cropped_audio = self.read_audio_segment(audio_file, segment[0], segment[1])
+
+                # 2. 处理音频片段
+                segment_results = self._process_single_segment(
+                    cropped_audio,
+                    sample_rate,
+                    segment[0],
+                    models
+                )
+                results.extend(segment_results)
+
+                # 3. 更新进度
+                progress = min(round((i + 1) * 100 / total_segments), 100)
+                self.data_bridge.emit_whisper_working(self.unid, progress)
 
-            # 2. 处理音频片段
-            segment_results = self._process_single_segment(
-                cropped_audio,
-                sample_rate,
-                segment[0],
-                models
-            )
-            results.extend(segment_results)
+        return results
 
-            # 3. 更新进度
-            progress = min(round((i + 1) * 100 / total_segments), 100)
-            self.data_bridge.emit_whisper_working(self.unid, progress)
+    def _process_audio_segments_batched(self, segments: list, models: dict) -> list:
+        """
+        按batch_size将VAD片段分组，asr、time、punc模型每批只调用一次，
+        多个批次由线程池处理，同一个模型的调用由模型池的调用锁串行化，不同模型可以同时处理不同批次，
+        最后按片段开始时间恢复顺序
+        """
+        batches = [segments[i:i + self.batch_size] for i in range(0, len(segments), self.batch_size)]
+        total_segments = len(segments)
+        logger.info(f'SenseVoice批处理: {total_segments}个片段, {len(batches)}批, batch_size={self.batch_size}, max_workers={self.max_workers}')
+
+        batch_results = [[] for _ in batches]
+        done_segments = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sense_voice') as executor:
+            futures = {
+                executor.submit(self._process_segment_batch, batch, models): index
+                for index, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                batch_results[index] = future.result()
+
+                # 进度只在主线程中发送，保证信号顺序
+                done_segments += len(batches[index])
+                progress = min(round(done_segments * 100 / total_segments), 100)
+                self.data_bridge.emit_whisper_working(self.unid, progress)
+
+        results = [item for batch in batch_results for item in batch]
+        results.sort(key=lambda x: x['start'])
+        return results
 
+    def _process_segment_batch(self, batch: list, models: dict) -> list:
+        """批量处理一组VAD片段"""
+        # SoundFile句柄不能跨线程共享，每个批次单独打开并只读取本批次的片段
+        with sf.SoundFile(self.input_file) as audio_file:
+            sample_rate = audio_file.samplerate
+            inputs = [
+                self._prepare_segment_input(self.read_audio_segment(audio_file, segment[0], segment[1]), sample_rate)
+                for segment in batch
+            ]
+
+        # 1. 批量识别文本
+        texts = self._recognize_texts(inputs, models['asr'], sample_rate)
+        valid = [(segment, audio, text) for segment, audio, text in zip(batch, inputs, texts) if text]
+        if not valid:
+            return []
+        valid_segments, valid_inputs, valid_texts = map(list, zip(*valid))
+
+        # 2. 批量获取时间戳
+        time_res = get_model_pool().generate(
+            models['time'],
+            input=(valid_inputs, valid_texts),
+            data_type=("sound", "text"),
+            batch_size=len(valid_inputs),
+            fs=sample_rate
+        )
+
+        # 3. 批量添加标点
+        punctuation_res = self._add_punctuation(valid_texts, models['punc'])
+        if len(punctuation_res) != len(valid_texts) or len(time_res) != len(valid_texts):
+            logger.warning('批处理结果数量不一致，回退为逐个处理')
+            return [item for segment, audio in zip(batch, inputs)
+                    for item in self._process_single_input(audio, sample_rate, segment[0], models)]
+
+        # 4. 创建基础segment
+        results = []
+        for segment, time_item, punc_item in zip(valid_segments, time_res, punctuation_res):
+            results.extend(self._split_and_align_sentences([punc_item], [time_item], segment[0]))
         return results
 
+    @staticmethod
+    def _prepare_segment_input(audio_data, sample_rate) -> np.ndarray:
+        """
+        将裁剪后的音频片段转换为模型输入
+        直接把单声道float32采样数组交给model.generate，不再写临时wav文件
+        """
+        if audio_data.ndim > 1:
+            audio_data = audio_data.mean(axis=1)
+        return np.ascontiguousarray(audio_data, dtype=np.float32)
+
     def _process_single_segment(self, audio_data, sample_rate, start_time, models: dict) -> list:
         """处理单个音频片段"""
-        results = []
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            sf.write(temp_file.name, audio_data, sample_rate)
-
-            # 1. 识别文本
-            text = self._recognize_text(temp_file.name, models['asr'])
-            if not text:
-                return []
-
-            # 2. 获取时间戳
-            time_res = models['time'].generate(
-                input=(temp_file.name, text),
-                data_type=("sound", "text")
-            )
+        return self._process_single_input(self._prepare_segment_input(audio_data, sample_rate), sample_rate, start_time, models)
 
-            # 3. 添加标点
-            punctuation_res = self._add_punctuation(text, models['punc'])
-            if not punctuation_res:
-                return []
+    def _process_single_input(self, audio_input, sample_rate, start_time, models: dict) -> list:
+        """处理单个已准备好的模型输入"""
+        # 1. 识别文本
+        text = self._recognize_text(audio_input, models['asr'], sample_rate)
+        if not text:
+            return []
+
+        # 2. 获取时间戳
+        time_res = get_model_pool().generate(
+            models['time'],
+            input=(audio_input, text),
+            data_type=("sound", "text"),
+            fs=sample_rate
+        )
 
-            # 4. 创建基础segment（不进行复杂分句，智能分句将在用户手动触发时执行）
-            rrl = self._split_and_align_sentences(punctuation_res, time_res, start_time)
-            results.extend(rrl)
-            return results
+        # 3. 添加标点
+        punctuation_res = self._add_punctuation(text, models['punc'])
+        if not punctuation_res:
+            return []
+
+        # 4. 创建基础segment（不进行复杂分句，智能分句将在用户手动触发时执行）
+        return self._split_and_align_sentences(punctuation_res, time_res, start_time)
 
     def _split_and_align_sentences(self, punctuation_res: list, time_res: list, start_time: int) -> list:
         """分割句子并对齐时间戳,返回按照标点切割的list"""
@@ -313,26 +447,57 @@ class SrtWriter:
 
         return msg.create_segmented_transcript(start_time, punc_list)
 
-    def _recognize_text(self, audio_file: str, model) -> str:
-        """识别音频文件中的文本"""
-        res = model.generate(
-            input=audio_file,
+    def _recognize_text(self, audio_input, model, sample_rate: int = 16000) -> str:
+        """识别音频片段中的文本，audio_input为采样数组或音频文件路径"""
+        res = get_model_pool().generate(
+            model,
+            input=audio_input,
             cache={},
             language=self.ln,
             batch_size_s=60,
             merge_vad=True,
             merge_length_s=10000,
+            fs=sample_rate,
         )
         return self.custom_rich_transcription_postprocess(res[0]["text"])
 
-    def _add_punctuation(self, text: str, model) -> list:
+    def _recognize_texts(self, audio_inputs: list, model, sample_rate: int = 16000) -> list:
+        """批量识别多个音频片段的文本，返回顺序与输入一致"""
+        res = get_model_pool().generate(
+            model,
+            input=audio_inputs,
+            cache={},
+            language=self.ln,
+            batch_size=len(audio_inputs),
+            batch_size_s=60,
+            merge_vad=True,
+            merge_length_s=10000,
+            fs=sample_rate,
+        )
+        return [self.custom_rich_transcription_postprocess(item["text"]) if item.get("text") else "" for item in res]
+
+    def _add_punctuation(self, text: str | list, model) -> list:
         """为文本添加标点符号"""
         try:
-            return model.generate(input=text)
+            return get_model_pool().generate(model, input=text)
         except RuntimeError as e:
             logger.error(f"标点符号处理失败: {e}")
             return []
 
+    @staticmethod
+    def read_audio_segment(audio_file: sf.SoundFile, start_time, end_time) -> np.ndarray:
+        """
+        从已打开的音频文件中seek并读取[start_time, end_time)毫秒范围的采样，
+        返回float32数组，峰值内存只与片段长度有关，与整个文件长度无关
+        """
+        sample_rate = audio_file.samplerate
+        start_sample = int(start_time * sample_rate / 1000)  # 转换为样本数
+        end_sample = min(int(end_time * sample_rate / 1000), audio_file.frames)  # 转换为样本数
+        if end_sample <= start_sample:
+            return np.zeros((0, audio_file.channels) if audio_file.channels > 1 else 0, dtype=np.float32)
+        audio_file.seek(start_sample)
+        return audio_file.read(end_sample - start_sample, dtype='float32')
+
     @staticmethod
     def crop_audio(audio_data, start_time, end_time, sample_rate):
         start_sample = int(start_time * sample_rate / 1000)  # 转换为样本数
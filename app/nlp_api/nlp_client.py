@@ -1,12 +1,20 @@
 """
 NLP API 客户端，用于调用服务端的 spacy 分句处理服务
 """
+import gzip
+import json
 import time
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 import httpx
 
 from services.config_manager import ConfigManager
 from utils import logger
+from utils.segment_data import is_compact
+
+# 紧凑格式segment_data的Content-Type
+COMPACT_CONTENT_TYPE = 'application/x-lin-segment-data'
+# 长轮询时每次请求让服务端最多挂起的秒数
+LONG_POLL_SECONDS = 25
 
 
 class NLPAPIClient:
@@ -35,6 +43,10 @@ class NLPAPIClient:
             headers=headers,
             follow_redirects=True
         )
+        # 服务端是否支持任务状态事件(SSE)，None表示尚未确定
+        self.sse_supported: Optional[bool] = None
+        # 服务端是否支持直接提交segment_data(/nlp/process_data)，None表示尚未确定
+        self.direct_submit_supported: Optional[bool] = None
 
     def submit_nlp_task(self, oss_file_url: str, language: str = 'zh') -> Tuple[bool, str, str]:
         """
@@ -67,59 +79,109 @@ class NLPAPIClient:
 
             response = self.client.post(url, json=data, headers=request_headers)
             response.raise_for_status()
+            return self._parse_submit_response(response)
 
-            # 尝试解析JSON响应
-            try:
-                result = response.json()
-
-                # 检查标准响应格式: {code: 200, data: {task_id: "xxx"}, message: "xxx"}
-                if 'code' in result and result.get('code') == 200:
-                    data = result.get('data', {})
-                    if 'task_id' in data:
-                        task_id = data['task_id']
-                        message = result.get('message', '任务创建成功')
-                        logger.info(f"NLP 任务提交成功: {message}")
-                        return True, task_id, ""
-                    else:
-                        error_msg = result.get('message', '响应中缺少task_id')
-                        logger.error(f"NLP 任务提交失败: {error_msg}")
-                        return False, "", error_msg
-
-                # 检查是否有success字段（备用格式）
-                elif 'success' in result:
-                    if result.get('success', False):
-                        task_id = result.get('task_id')
-                        logger.info(f"NLP 任务提交成功，任务ID: {task_id}")
-                        return True, task_id, ""
-                    else:
-                        error_msg = result.get('message', '未知错误')
-                        logger.error(f"NLP 任务提交失败: {error_msg}")
-                        return False, "", error_msg
-
-                # 检查是否有task_id字段（直接成功响应）
-                elif 'task_id' in result:
-                    task_id = result.get('task_id')
-                    logger.info(f"NLP 任务提交成功，任务ID: {task_id}")
-                    return True, task_id, ""
+        except Exception as e:
+            error_msg = f"提交 NLP 任务时发生错误: {str(e)}"
+            logger.error(error_msg)
+            return False, "", error_msg
+
+    @staticmethod
+    def _parse_submit_response(response: httpx.Response) -> Tuple[bool, str, str]:
+        """解析提交任务的响应"""
+        # 尝试解析JSON响应
+        try:
+            result = response.json()
 
+            # 检查标准响应格式: {code: 200, data: {task_id: "xxx"}, message: "xxx"}
+            if 'code' in result and result.get('code') == 200:
+                data = result.get('data', {})
+                if 'task_id' in data:
+                    task_id = data['task_id']
+                    message = result.get('message', '任务创建成功')
+                    logger.info(f"NLP 任务提交成功: {message}")
+                    return True, task_id, ""
                 else:
-                    # 如果响应格式不符合预期
-                    logger.error(f"未知的响应格式: {result}")
-                    return False, "", f"未知的响应格式: {result}"
-
-            except ValueError as json_error:
-                # 如果不是JSON响应，检查文本内容
-                response_text = response.text
-                if '成功' in response_text or 'success' in response_text.lower():
-                    logger.info(f"NLP 任务提交成功: {response_text}")
-                    task_id = f"task_{int(time.time())}"
+                    error_msg = result.get('message', '响应中缺少task_id')
+                    logger.error(f"NLP 任务提交失败: {error_msg}")
+                    return False, "", error_msg
+
+            # 检查是否有success字段（备用格式）
+            elif 'success' in result:
+                if result.get('success', False):
+                    task_id = result.get('task_id')
+                    logger.info(f"NLP 任务提交成功，任务ID: {task_id}")
                     return True, task_id, ""
                 else:
-                    logger.error(f"NLP 任务提交失败，无法解析响应: {response_text}")
-                    return False, "", f"响应解析错误: {str(json_error)}"
+                    error_msg = result.get('message', '未知错误')
+                    logger.error(f"NLP 任务提交失败: {error_msg}")
+                    return False, "", error_msg
+
+            # 检查是否有task_id字段（直接成功响应）
+            elif 'task_id' in result:
+                task_id = result.get('task_id')
+                logger.info(f"NLP 任务提交成功，任务ID: {task_id}")
+                return True, task_id, ""
+
+            else:
+                # 如果响应格式不符合预期
+                logger.error(f"未知的响应格式: {result}")
+                return False, "", f"未知的响应格式: {result}"
+
+        except ValueError as json_error:
+            # 如果不是JSON响应，检查文本内容
+            response_text = response.text
+            if '成功' in response_text or 'success' in response_text.lower():
+                logger.info(f"NLP 任务提交成功: {response_text}")
+                task_id = f"task_{int(time.time())}"
+                return True, task_id, ""
+            else:
+                logger.error(f"NLP 任务提交失败，无法解析响应: {response_text}")
+                return False, "", f"响应解析错误: {str(json_error)}"
+
+    def submit_nlp_data(self, segment_data_path: str, language: str = 'zh') -> Tuple[bool, str, str]:
+        """
+        直接提交segment_data内容（JSON文件gzip压缩后提交，紧凑格式原样提交），不经过OSS
+
+        Args:
+            segment_data_path: segment_data文件路径
+            language: 语言代码
+
+        Returns:
+            Tuple[bool, str, str]: (是否成功, 任务ID, 错误信息)
+        """
+        if self.direct_submit_supported is False:
+            return False, "", "服务端不支持直接提交"
+        try:
+            url = f"{self.api_base_url}/nlp/process_data"
+            with open(segment_data_path, 'rb') as f:
+                raw = f.read()
+            if is_compact(raw):
+                # 紧凑格式本身已压缩
+                body = raw
+                headers = {'Content-Type': COMPACT_CONTENT_TYPE}
+            else:
+                body = gzip.compress(raw, compresslevel=6)
+                headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+            headers['Accept'] = 'application/json'
+            logger.info(f"直接提交 NLP 任务: {url}, 大小: {len(raw) / 1024:.1f}KB, 提交: {len(body) / 1024:.1f}KB")
+
+            response = self.client.post(
+                url,
+                content=body,
+                params={'language': language, 'task_type': 'sentence_split'},
+                headers=headers
+            )
+            if response.status_code in (404, 405):
+                # 旧版服务端没有这个接口，之后直接走OSS上传
+                self.direct_submit_supported = False
+                logger.info(f"服务端不支持直接提交 NLP 任务: {response.status_code}")
+            response.raise_for_status()
+            self.direct_submit_supported = True
+            return self._parse_submit_response(response)
 
         except Exception as e:
-            error_msg = f"提交 NLP 任务时发生错误: {str(e)}"
+            error_msg = f"直接提交 NLP 任务时发生错误: {str(e)}"
             logger.error(error_msg)
             return False, "", error_msg
 
@@ -174,59 +236,128 @@ class NLPAPIClient:
             logger.error(error_msg)
             return False, {}, error_msg
 
-    def wait_for_completion(self, task_id: str, max_wait_time: int = 300, poll_interval: int = 5) -> Tuple[bool, str, str]:
+    def wait_for_completion(self, task_id: str, max_wait_time: int = 300, poll_interval: int = 5,
+                            on_update: Optional[Callable[[float, str], None]] = None) -> Tuple[bool, str, str]:
         """
         等待任务完成
-        
+        优先订阅服务端推送的状态事件(SSE)，服务端不支持时改为长轮询，状态一变化就返回，不再固定间隔sleep
+
         Args:
             task_id: 任务ID
             max_wait_time: 最大等待时间（秒）
-            poll_interval: 轮询间隔（秒）
-            
+            poll_interval: 服务端不支持长轮询时的最大查询间隔（秒）
+            on_update: 状态更新回调(已等待秒数, 状态)
+
         Returns:
             Tuple[bool, str, str]: (是否成功, SRT文件URL或内容, 错误信息)
         """
-        start_time = time.time()
+        start_time = time.monotonic()
+        deadline = start_time + max_wait_time
 
-        while time.time() - start_time < max_wait_time:
-            try:
-                url = f"{self.api_base_url}/nlp/status/{task_id}"
-                response = self.client.get(url)
-                response.raise_for_status()
+        def report(status: str) -> None:
+            if on_update:
+                on_update(time.monotonic() - start_time, status)
 
-                result = response.json()
-                task_data = result.get('data', {})
-                status = task_data.get('status')
-
-                if status == 'completed':
-                    # 从result端点获取SRT文件URL
-                    result_url = f"{self.api_base_url}/nlp/result/{task_id}"
-                    result_response = self.client.get(result_url)
-                    result_response.raise_for_status()
-                    result_data = result_response.json()
-                    srt_file_url = result_data.get('data', {}).get('result_url', '')
-                    logger.info(f"NLP 任务完成，获取到SRT文件URL: {srt_file_url}")
-                    return True, srt_file_url, ""
-                elif status == 'failed':
-                    error_msg = task_data.get('error_message', '任务处理失败')
-                    logger.error(f"NLP 任务失败: {error_msg}")
-                    return False, "", error_msg
-                elif status in ['pending', 'processing']:
-                    logger.info(f"NLP 任务进行中，状态: {status}")
-                    time.sleep(poll_interval)
-                else:
-                    logger.warning(f"未知任务状态: {status}")
-                    time.sleep(poll_interval)
+        if self.sse_supported is not False:
+            result = self._wait_by_events(task_id, deadline, report)
+            if result is not None:
+                return result
 
-            except Exception as e:
-                logger.error(f"查询任务状态时发生错误: {str(e)}")
-                time.sleep(poll_interval)
+        result = self._wait_by_long_poll(task_id, deadline, poll_interval, report)
+        if result is not None:
+            return result
 
         # 超时
         error_msg = f"等待任务完成超时（{max_wait_time}秒）"
         logger.error(error_msg)
         return False, "", error_msg
 
+    def _fetch_result_url(self, task_id: str) -> str:
+        """从result端点获取SRT文件URL"""
+        result_response = self.client.get(f"{self.api_base_url}/nlp/result/{task_id}")
+        result_response.raise_for_status()
+        return result_response.json().get('data', {}).get('result_url', '')
+
+    def _final_result(self, task_id: str, payload: dict) -> Optional[Tuple[bool, str, str]]:
+        """任务已结束时返回结果，仍在处理时返回None"""
+        task_data = payload.get('data', payload) or {}
+        status = task_data.get('status')
+        if status == 'completed':
+            srt_file_url = task_data.get('result_url') or self._fetch_result_url(task_id)
+            if not srt_file_url:
+                return False, "", "任务完成但未获得结果URL"
+            logger.info(f"NLP 任务完成，获取到SRT文件URL: {srt_file_url}")
+            return True, srt_file_url, ""
+        if status == 'failed':
+            error_msg = task_data.get('error_message') or task_data.get('error') or '任务处理失败'
+            logger.error(f"NLP 任务失败: {error_msg}")
+            return False, "", error_msg
+        return None
+
+    def _wait_by_events(self, task_id: str, deadline: float,
+                        report: Callable[[str], None]) -> Optional[Tuple[bool, str, str]]:
+        """
+        订阅任务状态事件
+
+        Returns:
+            任务结束时返回结果；服务端不支持或连接中断时返回None，由长轮询继续等待
+        """
+        url = f"{self.api_base_url}/nlp/events/{task_id}"
+        remaining = deadline - time.monotonic()
+        try:
+            with self.client.stream('GET', url, headers={'Accept': 'text/event-stream'},
+                                    timeout=httpx.Timeout(10, read=remaining)) as response:
+                content_type = response.headers.get('content-type', '')
+                if response.status_code in (404, 405, 406, 501) or 'text/event-stream' not in content_type:
+                    logger.info("服务端不支持任务状态事件，改为长轮询")
+                    self.sse_supported = False
+                    return None
+                response.raise_for_status()
+                self.sse_supported = True
+
+                for line in response.iter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    payload = json.loads(line[5:].strip())
+                    result = self._final_result(task_id, payload)
+                    if result is not None:
+                        return result
+                    report(payload.get('data', payload).get('status', ''))
+                    if time.monotonic() >= deadline:
+                        break
+        except Exception as e:
+            logger.warning(f"订阅任务状态事件失败，改为长轮询: {str(e)}")
+        return None
+
+    def _wait_by_long_poll(self, task_id: str, deadline: float, poll_interval: float,
+                           report: Callable[[str], None]) -> Optional[Tuple[bool, str, str]]:
+        """长轮询任务状态，超时返回None"""
+        url = f"{self.api_base_url}/nlp/status/{task_id}"
+        delay = 0.5
+        while (remaining := deadline - time.monotonic()) > 0:
+            wait = max(1, int(min(LONG_POLL_SECONDS, remaining)))
+            started = time.monotonic()
+            try:
+                response = self.client.get(url, params={'wait': wait}, timeout=wait + 10)
+                response.raise_for_status()
+                payload = response.json()
+                result = self._final_result(task_id, payload)
+                if result is not None:
+                    return result
+                status = payload.get('data', {}).get('status')
+                logger.info(f"NLP 任务进行中，状态: {status}")
+                report(status or '')
+            except Exception as e:
+                logger.error(f"查询任务状态时发生错误: {str(e)}")
+
+            # 服务端立即返回（不支持长轮询或请求出错）时按退避间隔再查
+            if time.monotonic() - started < 1:
+                time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+                delay = min(delay * 2, poll_interval)
+            else:
+                delay = 0.5
+        return None
+
     def download_srt_file(self, srt_url: str, local_path: str) -> Tuple[bool, str]:
         """
         从URL下载 SRT 文件
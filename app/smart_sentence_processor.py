@@ -4,7 +4,6 @@
 """
 import os
 import json
-import time
 from typing import Optional, Tuple
 from utils import logger
 from app.cloud_asr.aliyun_oss_client import upload_file_for_asr
@@ -118,21 +117,31 @@ class SmartSentenceProcessor:
             if not available:
                 return False, segment_data_path
 
-            # 3. 上传segment_data到OSS
-            if progress_callback:
-                progress_callback(20, "上传文件...")
+            # 3. 文件较小时直接提交内容，省去上传OSS的往返
+            success = False
+            if self._use_direct_submit(segment_data_path) and self._direct_submit_supported():
+                if progress_callback:
+                    progress_callback(30, "提交任务...")
+                success, task_id, error = self._submit_nlp_data(segment_data_path, language)
+                if not success:
+                    logger.warning(f"直接提交失败，改为上传OSS后提交: {error}")
 
-            success, oss_url, error = self._upload_segment_data(segment_data_path)
             if not success:
-                return False, f"上传失败: {error}"
+                # 上传segment_data到OSS
+                if progress_callback:
+                    progress_callback(20, "上传文件...")
 
-            # 4. 提交NLP任务（使用检测到的语言）
-            if progress_callback:
-                progress_callback(40, "提交任务...")
+                success, oss_url, error = self._upload_segment_data(segment_data_path)
+                if not success:
+                    return False, f"上传失败: {error}"
 
-            success, task_id, error = self._submit_nlp_task(oss_url, language)
-            if not success:
-                return False, f"任务提交失败: {error}"
+                # 提交NLP任务（使用检测到的语言）
+                if progress_callback:
+                    progress_callback(40, "提交任务...")
+
+                success, task_id, error = self._submit_nlp_task(oss_url, language)
+                if not success:
+                    return False, f"任务提交失败: {error}"
             
             # 4. 等待任务完成
             if progress_callback:
@@ -159,6 +168,40 @@ class SmartSentenceProcessor:
             logger.error(f"智能分句处理时发生异常: {str(e)}")
             return False, f"处理异常: {str(e)}"
     
+    @staticmethod
+    def _use_direct_submit(segment_data_path: str) -> bool:
+        """segment_data是否小到可以直接提交"""
+        try:
+            from nice_ui.configure import config
+            max_kb = config.settings.get('smart_sentence_direct_max_kb', 4096)
+        except Exception:
+            max_kb = 4096
+        return os.path.getsize(segment_data_path) <= max_kb * 1024
+
+    def _direct_submit_supported(self) -> bool:
+        """服务端拒绝过直接提交时不再尝试"""
+        return not (self.nlp_client and self.nlp_client.direct_submit_supported is False)
+
+    def _ensure_client(self) -> bool:
+        if not self.nlp_client:
+            self.nlp_client = create_nlp_client()
+        return self.nlp_client is not None
+
+    def _submit_nlp_data(self, segment_data_path: str, language: str = 'zh') -> Tuple[bool, str, str]:
+        """直接提交segment_data内容"""
+        try:
+            if not self._ensure_client():
+                return False, "", "无法创建NLP客户端"
+
+            success, task_id, error = self.nlp_client.submit_nlp_data(segment_data_path, language)
+            if success:
+                logger.info(f"NLP任务直接提交成功，任务ID: {task_id}，语言: {language}")
+            return success, task_id, error
+
+        except Exception as e:
+            logger.error(f"直接提交NLP任务时发生异常: {str(e)}")
+            return False, "", str(e)
+
     def _upload_segment_data(self, segment_data_path: str) -> Tuple[bool, str, str]:
         """上传segment_data文件到OSS"""
         try:
@@ -176,10 +219,8 @@ class SmartSentenceProcessor:
     def _submit_nlp_task(self, oss_url: str, language: str = 'zh') -> Tuple[bool, str, str]:
         """提交NLP处理任务"""
         try:
-            if not self.nlp_client:
-                self.nlp_client = create_nlp_client()
-                if not self.nlp_client:
-                    return False, "", "无法创建NLP客户端"
+            if not self._ensure_client():
+                return False, "", "无法创建NLP客户端"
 
             success, task_id, error = self.nlp_client.submit_nlp_task(oss_url, language)
             if success:
@@ -196,42 +237,20 @@ class SmartSentenceProcessor:
     def _wait_for_completion(self, task_id: str, progress_callback=None) -> Tuple[bool, str, str]:
         """等待NLP任务完成"""
         try:
-            # 使用带进度更新的等待方法
             max_wait_time = 300  # 最大等待5分钟
-            check_interval = 5   # 每5秒检查一次
-            elapsed_time = 0
-            
-            while elapsed_time < max_wait_time:
-                # 检查任务状态
-                success, result, error = self.nlp_client.check_task_status(task_id)
-                if success:
-                    if result.get('status') == 'completed':
-                        srt_url = result.get('result_url')
-                        if srt_url:
-                            logger.info(f"NLP任务完成，SRT文件URL: {srt_url}")
-                            return True, srt_url, ""
-                        else:
-                            return False, "", "任务完成但未获得结果URL"
-                    elif result.get('status') == 'failed':
-                        return False, "", result.get('error', '任务处理失败')
-                    # 任务仍在处理中，继续等待
-                else:
-                    logger.warning(f"检查任务状态失败: {error}")
-                
-                # 更新进度
+
+            def on_update(elapsed_time: float, status: str) -> None:
                 if progress_callback:
                     progress = min(60 + (elapsed_time / max_wait_time) * 25, 85)
-                    progress_callback(int(progress), f"处理中... ({elapsed_time}s)")
-                
-                time.sleep(check_interval)
-                elapsed_time += check_interval
-            
-            return False, "", "任务超时"
-            
+                    progress_callback(int(progress), f"处理中... ({int(elapsed_time)}s)")
+
+            # 状态变化由服务端推送或长轮询返回，不再固定间隔查询
+            return self.nlp_client.wait_for_completion(task_id, max_wait_time=max_wait_time, on_update=on_update)
+
         except Exception as e:
             logger.error(f"等待NLP任务完成时发生异常: {str(e)}")
             return False, "", str(e)
-    
+
     def _download_and_replace_srt(self, srt_url: str, local_srt_path: str) -> Tuple[bool, str]:
         """下载并替换本地SRT文件"""
         try:
@@ -35,40 +35,53 @@ class FFmpegJobs:
             logger.error(f"转换失败: {str(e)}")
             return False
 
+    # 输出文件后缀 -> (编码器, 采样格式)
+    AUDIO_CODECS = {
+        '.wav': ('pcm_s16le', 's16'),
+        '.flac': ('flac', 's16'),
+        '.opus': ('libopus', 's16'),
+        '.ogg': ('libopus', 's16'),
+    }
+
+    @staticmethod
+    def convert_mp4_to_wav(input_path: Path|str, output_path: Path|str, sample_rate: int = 16000, layout: str = 'mono'):
+        """将 MP4 文件转换为 WAV 文件，默认输出FunASR和云ASR需要的16kHz单声道"""
+        return FFmpegJobs.convert_audio(input_path, output_path, sample_rate, layout)
+
     @staticmethod
-    def convert_mp4_to_wav(input_path: Path|str, output_path: Path|str):
-        """将 MP4 文件转换为 WAV 文件"""
-        logger.info(f'convert mp4 to wav: {input_path} -> {output_path}')
+    def convert_audio(input_path: Path|str, output_path: Path|str, sample_rate: int = 16000, layout: str = 'mono'):
+        """
+        解码音视频中的第一条音轨，一次性重采样为指定采样率和声道后编码输出
+        编码格式由输出文件后缀决定：.wav(pcm_s16le)、.flac、.opus/.ogg(libopus)
+        """
+        logger.info(f'convert audio: {input_path} -> {output_path}, {sample_rate}Hz {layout}')
+        suffix = Path(output_path).suffix.lower()
+        if suffix not in FFmpegJobs.AUDIO_CODECS:
+            logger.error(f"不支持的输出格式: {suffix}")
+            return False
+        codec, sample_format = FFmpegJobs.AUDIO_CODECS[suffix]
+
         try:
             # 确保输出目录存在
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-            
-            # 使用 PyAV 进行转换
+
             with av.open(str(input_path)) as input_container:
                 with av.open(str(output_path), 'w') as output_container:
-                    # 设置音频流参数
-                    output_stream = output_container.add_stream(
-                        'pcm_s16le',  # 音频编码格式
-                        rate=16000,    # 采样率
-                        layout='stereo' # 双声道
-                    )
-                    
-                    # 只处理音频流
+                    # 只处理音频流，每一帧都要解码，不能跳过非关键帧
                     input_stream = input_container.streams.audio[0]
-                    input_stream.codec_context.skip_frame = 'NONKEY'
-                    
-                    # 转换音频
+
+                    output_stream = output_container.add_stream(codec, rate=sample_rate, layout=layout)
+                    resampler = av.AudioResampler(format=sample_format, layout=layout, rate=sample_rate)
+
                     for frame in input_container.decode(input_stream):
-                        # 重采样音频
-                        frame.pts = None
-                        packet = output_stream.encode(frame)
-                        output_container.mux(packet)
-                    
-                    # Flush编码器
-                    packet = output_stream.encode(None)
-                    if packet:
-                        output_container.mux(packet)
-            
+                        for resampled in resampler.resample(frame):
+                            output_container.mux(output_stream.encode(resampled))
+
+                    # Flush重采样器和编码器
+                    for resampled in resampler.resample(None):
+                        output_container.mux(output_stream.encode(resampled))
+                    output_container.mux(output_stream.encode(None))
+
             logger.info("转码完成")
             return True
         except Exception as e:
@@ -73,6 +73,27 @@ def parse_init():
         "cuda_com_type": "float16",
         "whisper_threads": 4,
         "whisper_worker": 1,
+        "funasr_workers": 1,  # SenseVoice批处理的线程数，同一个模型的调用由模型池的调用锁串行化
+        "funasr_batch_size": 8,  # SenseVoice每批处理的VAD片段数
+        "funasr_model_idle_timeout": 600,  # FunASR模型空闲多少秒后卸载
+        "funasr_model_memory_mb": 4096,  # FunASR模型池内存预算(MB)
+        "audio_cache_max_mb": 2048,  # 提取音频缓存大小上限(MB)，0表示不缓存
+        "pipeline_extract_audio_workers": 2,  # 任务流水线音频提取阶段线程数
+        "pipeline_recognize_workers": 1,  # 任务流水线语音识别阶段线程数
+        "pipeline_translate_workers": 2,  # 任务流水线翻译阶段线程数
+        "pipeline_queue_size": 2,  # 任务流水线阶段之间的队列长度
+        "asr_task_flush_interval": 1.0,  # 云ASR任务状态批量写入间隔(秒)
+        "asr_task_retention_days": 7,  # 已完成/失败的云ASR任务保留天数
+        "asr_poll_concurrency": 4,  # 云ASR任务状态同时查询数
+        "asr_poll_min_interval": 2,  # 云ASR任务状态最小查询间隔(秒)
+        "asr_poll_max_interval": 60,  # 云ASR任务状态最大查询间隔(秒)
+        "cloud_asr_split_minutes": 120,  # 云ASR音频超过多少分钟时切分提交，0表示不切分
+        "cloud_asr_piece_minutes": 30,  # 云ASR长音频切分后每段的目标时长(分钟)
+        "cloud_asr_split_concurrency": 4,  # 云ASR长音频分段同时上传提交数
+        "cloud_asr_submit_concurrency": 4,  # 云ASR同时上传提交的任务数
+        "cloud_asr_submit_per_minute": 0,  # 云ASR每分钟最多提交的任务数，0表示不限制
+        "smart_sentence_direct_max_kb": 4096,  # segment_data不超过该大小(KB)时直接提交给NLP服务，不上传OSS
+        "segment_data_compact": False,  # segment_data使用紧凑格式(utils.segment_data)，需要NLP服务端支持
         "beam_size": 1,
         "best_of": 1,
         "vad": True,
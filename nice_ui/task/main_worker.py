@@ -297,9 +297,10 @@ class QueueConsumer(QObject):
             logger.debug("开始消费队列")
             config.is_consuming = True
 
+            # 消费过程中新加入的任务在下一轮处理
             while not config.lin_queue.empty():
-                logger.debug("消费线程准备处理下一个任务")
-                work_queue.consume_queue()
+                logger.debug("消费线程准备处理下一批任务")
+                work_queue.consume_pipeline()
 
             config.is_consuming = False
             self.finished.emit()
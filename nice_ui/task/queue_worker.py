@@ -1,43 +1,74 @@
-import time
-from abc import ABC, abstractmethod
+import threading
+from abc import ABC
+from typing import Tuple
 
-from services.config_manager import get_chunk_size, get_max_entries, get_sleep_time
+from services.config_manager import get_chunk_size, get_max_entries
 from agent.enhanced_common_agent import translate_document
 from app.cloud_asr.task_manager import get_task_manager, ASRTaskStatus
 from app.cloud_trans.task_manager import TransTaskManager
 from app.listen import SrtWriter
-from app.video_tools import FFmpegJobs
+from app.audio_cache import get_audio_cache
 from nice_ui.configure import config
 from nice_ui.configure.signal import data_bridge
 from nice_ui.services.service_provider import ServiceProvider
 from nice_ui.task import WORK_TYPE
+from nice_ui.task.task_pipeline import STAGE_ASR, STAGE_EXTRACT, STAGE_TRANSLATE, TaskPipeline
 from nice_ui.util.tools import VideoFormatInfo, change_job_format
 from orm.queries import ToTranslationOrm, ToSrtOrm
 from utils import logger
 
 
 class TaskProcessor(ABC):
-    """任务处理器抽象基类，定义了处理任务的接口"""
+    """
+    任务处理器抽象基类，定义了处理任务的接口
+    任务按stages中的阶段依次执行，流水线模式下不同任务的不同阶段可以并行
+    """
+
+    # 任务需要经过的阶段，阶段名对应同名方法
+    stages: Tuple[str, ...] = ()
 
-    @abstractmethod
     def process(self, task: VideoFormatInfo):
-        """处理任务的抽象方法"""
-        pass
+        """串行执行任务的所有阶段"""
+        for stage in self.stages:
+            getattr(self, stage)(task)
+
+    @staticmethod
+    def extract_audio(task: VideoFormatInfo):
+        """音视频转wav格式"""
+        final_name = task.wav_dirname
+        logger.debug(f'准备音视频转wav格式:{final_name}')
+        if not get_audio_cache().convert(task.raw_name, final_name):
+            data_bridge.emit_task_error(task.unid, "音频提取失败")
+            raise RuntimeError(f"音频提取失败: {task.raw_name}")
+
+
+def warm_up_asr_model(unid: str) -> None:
+    """后台预加载任务使用的本地识别模型，与音频提取并行，识别阶段开始时直接命中模型池"""
+
+    def _warm_up():
+        try:
+            db_obj = ToSrtOrm().query_data_by_unid(unid)
+            SrtWriter.warm_up_models(db_obj.source_module_name)
+        except Exception as e:
+            # 预加载失败不影响任务，识别阶段会重新加载
+            logger.warning(f'预加载识别模型失败: {unid}, 错误: {e}')
+
+    threading.Thread(target=_warm_up, name=f'asr-warm-up-{unid}', daemon=True).start()
 
 
 class ASRTaskProcessor(TaskProcessor):
     """ASR任务处理器"""
 
-    def process(self, task: VideoFormatInfo):
-        """处理ASR任务"""
-        logger.debug('处理ASR任务')
+    stages = (STAGE_EXTRACT, STAGE_ASR)
 
-        # 音视频转wav格式
-        final_name = task.wav_dirname
-        logger.debug(f'准备音视频转wav格式:{final_name}')
-        FFmpegJobs.convert_mp4_to_wav(task.raw_name, final_name)
+    def extract_audio(self, task: VideoFormatInfo):
+        """音视频转wav格式，同时预加载识别模型"""
+        warm_up_asr_model(task.unid)
+        super().extract_audio(task)
 
-        # 处理音频转文本
+    def recognize(self, task: VideoFormatInfo):
+        """处理音频转文本"""
+        logger.debug('处理ASR任务')
         srt_orm = ToSrtOrm()
         db_obj = srt_orm.query_data_by_unid(task.unid)
         logger.trace(f"source_language_code: {config.params['source_language_code']}")
@@ -50,14 +81,12 @@ class ASRTaskProcessor(TaskProcessor):
 class CloudASRTaskProcessor(TaskProcessor):
     """云ASR任务处理器"""
 
-    def process(self, task: VideoFormatInfo):
-        """处理云ASR任务"""
-        logger.debug('处理云ASR任务')
+    stages = (STAGE_EXTRACT, STAGE_ASR)
 
-        # 音视频转wav格式
+    def recognize(self, task: VideoFormatInfo):
+        """提交云ASR任务"""
+        logger.debug('处理云ASR任务')
         final_name = task.wav_dirname
-        logger.debug(f'准备音视频转wav格式:{final_name}')
-        FFmpegJobs.convert_mp4_to_wav(task.raw_name, final_name)
 
         # 获取任务管理器实例
         task_manager = get_task_manager()
@@ -78,9 +107,9 @@ class CloudASRTaskProcessor(TaskProcessor):
             language=language_code
         )
 
-        # 提交任务到阿里云
+        # 在后台上传并提交到阿里云，不阻塞后续任务
         logger.info(f'提交ASR任务到阿里云: {task.unid}')
-        task_manager.submit_task(task.unid)
+        task_manager.schedule_submit(task.unid)
 
         # 是否等待任务完成
         if config.params.get("cloud_asr_wait_for_completion", False):
@@ -90,27 +119,22 @@ class CloudASRTaskProcessor(TaskProcessor):
             logger.debug('云ASR任务已提交，在后台处理中')
 
     def _wait_for_task_completion(self, task_manager, task_id):
-        """等待任务完成"""
-        while True:
-            # 获取任务状态
-            asr_task = task_manager.get_task(task_id)
-
-            # 检查任务是否完成或失败
-            if asr_task.status == ASRTaskStatus.COMPLETED:
-                logger.info(f'云ASR任务已完成: {task_id}')
-                break
-            elif asr_task.status == ASRTaskStatus.FAILED:
-                logger.error(f'云ASR任务失败: {task_id}, 错误: {asr_task.error}')
-                break
-
-            # 等待一段时间再检查
-            time.sleep(5)
+        """等待任务完成，任务结束时由任务管理器通知"""
+        asr_task = task_manager.wait_for_task(task_id)
+        if asr_task is None:
+            logger.error(f'云ASR任务不存在: {task_id}')
+        elif asr_task.status == ASRTaskStatus.COMPLETED:
+            logger.info(f'云ASR任务已完成: {task_id}')
+        else:
+            logger.error(f'云ASR任务失败: {task_id}, 错误: {asr_task.error}')
 
 
 class TranslationTaskProcessor(TaskProcessor):
     """翻译任务处理器"""
 
-    def process(self, task: VideoFormatInfo):
+    stages = (STAGE_TRANSLATE,)
+
+    def translate(self, task: VideoFormatInfo):
         """处理翻译任务"""
         logger.debug('处理翻译任务')
 
@@ -119,10 +143,9 @@ class TranslationTaskProcessor(TaskProcessor):
             final_name = task.srt_dirname  # 原始文件名_译文.srt
             chunk_size_int = get_chunk_size()
             max_entries_int = get_max_entries()  # 推荐值：8-12
-            sleep_time_int = get_sleep_time()  # API调用间隔
             logger.trace(f'准备翻译任务:{final_name}')
             logger.trace(
-                f'任务参数:{task.unid}, {task.raw_name}, {final_name}, {agent_type},{chunk_size_int},{max_entries_int},{sleep_time_int},{config.params["target_language"]},{config.params["source_language"]}')
+                f'任务参数:{task.unid}, {task.raw_name}, {final_name}, {agent_type},{chunk_size_int},{max_entries_int},{config.params["target_language"]},{config.params["source_language"]}')
 
             translate_document(
                 unid=task.unid,
@@ -131,7 +154,6 @@ class TranslationTaskProcessor(TaskProcessor):
                 agent_name=agent_type,
                 chunk_size=chunk_size_int,  # 推荐值：600-800
                 max_entries=max_entries_int,  # 推荐值：8-12
-                sleep_time=sleep_time_int,  # API调用间隔
                 target_language=config.params["target_language"],  # 目标语言
                 source_language=config.params["source_language"]  # 源语言
             )
@@ -156,15 +178,16 @@ class TranslationTaskProcessor(TaskProcessor):
 class ASRTransTaskProcessor(TaskProcessor):
     """ASR+翻译组合任务处理器"""
 
-    def process(self, task: VideoFormatInfo):
-        """处理ASR+翻译任务"""
-        logger.debug('处理ASR+翻译任务')
+    stages = (STAGE_EXTRACT, STAGE_ASR, STAGE_TRANSLATE)
 
-        # 第一步: ASR 任务
-        final_name = task.wav_dirname
-        logger.debug(f'准备音视频转wav格式:{final_name}')
-        FFmpegJobs.convert_mp4_to_wav(task.raw_name, final_name)
+    def extract_audio(self, task: VideoFormatInfo):
+        """音视频转wav格式，同时预加载识别模型"""
+        warm_up_asr_model(task.unid)
+        super().extract_audio(task)
 
+    def recognize(self, task: VideoFormatInfo):
+        """第一步: ASR 任务"""
+        logger.debug('处理ASR+翻译任务')
         srt_orm = ToSrtOrm()
         db_obj = srt_orm.query_data_by_unid(task.unid)
         srt_worker = SrtWriter(task.unid, task.wav_dirname, task.raw_noextname, db_obj.source_language_code)
@@ -172,7 +195,8 @@ class ASRTransTaskProcessor(TaskProcessor):
 
         logger.debug('ASR 任务完成，准备开始翻译任务')
 
-        # 第二步: 翻译任务
+    def translate(self, task: VideoFormatInfo):
+        """第二步: 翻译任务"""
         new_task = change_job_format(task)
 
         agent_type = config.params['translate_channel']
@@ -195,9 +219,8 @@ class ASRTransTaskProcessor(TaskProcessor):
         )
         chunk_size_int = get_chunk_size()
         max_entries_int = get_max_entries()  # 推荐值：8-12
-        sleep_time_int = get_sleep_time()  # API调用间隔
         logger.trace(
-            f'任务参数:{task.unid}, {srt_name}, {srt_name}, {agent_type},{chunk_size_int},{max_entries_int},{sleep_time_int},{config.params["target_language"]},{config.params["source_language"]}')
+            f'任务参数:{task.unid}, {srt_name}, {srt_name}, {agent_type},{chunk_size_int},{max_entries_int},{config.params["target_language"]},{config.params["source_language"]}')
 
         # 执行翻译
         try:
@@ -208,7 +231,6 @@ class ASRTransTaskProcessor(TaskProcessor):
                 agent_name=agent_type,
                 chunk_size=chunk_size_int,  # 推荐值：600-800
                 max_entries=max_entries_int,  # 推荐值：8-12
-                sleep_time=sleep_time_int,  # API调用间隔
                 target_language=config.params["target_language"],  # 目标语言
                 source_language=config.params["source_language"]  # 源语言
             )
@@ -272,3 +294,9 @@ class LinQueue:
 
         processor.process(task)
         logger.debug('任务处理完成')
+
+    @staticmethod
+    def consume_pipeline():
+        """以流水线方式消费队列中的所有任务，音频提取、识别、翻译三个阶段在不同任务间并行"""
+        logger.debug('流水线消费线程工作中')
+        TaskPipeline(TaskProcessorFactory.create_processor).run(config.lin_queue)
@@ -0,0 +1,134 @@
+"""
+任务流水线
+把队列中的任务拆成 音频提取 → 语音识别 → 翻译 三个阶段，阶段之间用有界队列连接，
+每个阶段有独立的工作线程数，不同任务的不同阶段可以同时进行：
+一个任务在调用LLM翻译时，下一个任务已经在做FunASR识别，再下一个任务在提取音频
+
+同一个任务同一时间只会处于一个阶段，各阶段按顺序执行，所以单个任务的进度信号顺序和串行处理时一致
+"""
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from nice_ui.configure import config
+from utils import logger
+
+STAGE_EXTRACT = 'extract_audio'
+STAGE_ASR = 'recognize'
+STAGE_TRANSLATE = 'translate'
+PIPELINE_STAGES = (STAGE_EXTRACT, STAGE_ASR, STAGE_TRANSLATE)
+
+_STOP = object()
+
+
+@dataclass
+class PipelineStage:
+    """流水线中的一个阶段"""
+    name: str
+    workers: int
+    queue_size: int
+    input: queue.Queue = field(init=False)
+    threads: List[threading.Thread] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.workers = max(1, self.workers)
+        self.input = queue.Queue(maxsize=max(1, self.queue_size))
+
+
+class TaskPipeline:
+    """
+    分阶段处理任务的流水线
+
+    处理器需要提供stages属性（需要经过的阶段名列表），以及与阶段同名的方法，
+    方法参数为任务对象。任务只进入自己需要的阶段
+    """
+
+    def __init__(self, processor_factory: Callable, stage_workers: Optional[Dict[str, int]] = None,
+                 queue_size: Optional[int] = None):
+        """
+        Args:
+            processor_factory: 根据work_type创建任务处理器
+            stage_workers: 各阶段工作线程数，未指定的阶段从设置读取
+            queue_size: 阶段之间的队列长度，队列满时上游阶段等待
+        """
+        self.processor_factory = processor_factory
+        stage_workers = stage_workers or {}
+        queue_size = queue_size or config.settings.get('pipeline_queue_size', 2)
+        self.stages = [
+            PipelineStage(name, stage_workers.get(name, config.settings.get(f'pipeline_{name}_workers', 1)), queue_size)
+            for name in PIPELINE_STAGES
+        ]
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def run(self, source: queue.Queue) -> None:
+        """
+        从source中取出所有任务并处理，全部任务处理完成后返回
+
+        Args:
+            source: 任务队列，例如config.lin_queue
+        """
+        for index, stage in enumerate(self.stages):
+            stage.threads = [
+                threading.Thread(target=self._stage_worker, args=(index,), name=f'{stage.name}-{i}', daemon=True)
+                for i in range(stage.workers)
+            ]
+            for thread in stage.threads:
+                thread.start()
+
+        while True:
+            try:
+                task = source.get_nowait()
+            except queue.Empty:
+                break
+            logger.debug(f'流水线获取到任务:{task.unid}')
+            try:
+                processor = self.processor_factory(task.work_type)
+            except Exception as e:
+                logger.error(f'创建任务处理器失败: {task.unid}, 错误: {e}')
+                self._mark_failed()
+                continue
+            self._forward(task, processor, -1)
+
+        # 上游阶段的线程全部退出后，下游阶段不会再收到新任务，再依次通知下游退出
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.input.put(_STOP)
+            for thread in stage.threads:
+                thread.join()
+
+        logger.info(f'流水线处理完成, 成功: {self.completed}, 失败: {self.failed}')
+
+    def _forward(self, task, processor, current_index: int) -> None:
+        """把任务交给下一个需要的阶段，没有后续阶段时任务完成"""
+        for index in range(current_index + 1, len(self.stages)):
+            if self.stages[index].name in processor.stages:
+                self.stages[index].input.put((task, processor))
+                return
+        with self._lock:
+            self.completed += 1
+        logger.debug(f'任务处理完成: {task.unid}')
+
+    def _mark_failed(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def _stage_worker(self, index: int) -> None:
+        """阶段工作线程"""
+        stage = self.stages[index]
+        while True:
+            item = stage.input.get()
+            if item is _STOP:
+                break
+            task, processor = item
+            logger.debug(f'[{stage.name}] 开始处理任务: {task.unid}')
+            try:
+                getattr(processor, stage.name)(task)
+            except Exception as e:
+                # 失败的任务不再进入后续阶段，错误信号由处理器发送
+                logger.exception(f'[{stage.name}] 任务处理失败: {task.unid}, 错误: {e}')
+                self._mark_failed()
+                continue
+            self._forward(task, processor, index)
@@ -22,6 +22,7 @@ from nice_ui.ui.profile import ProfileInterface
 from nice_ui.ui.setting_ui import SettingInterface
 from nice_ui.ui.video2srt import Video2SRT
 from nice_ui.ui.work_srt import WorkSrt
+from services.llm_client import close_all_clients
 from utils import logger
 from vendor.qfluentwidgets import FluentIcon as FIF, NavigationItemPosition
 from vendor.qfluentwidgets import (MessageBox, FluentWindow, MacFluentWindow, FluentBackgroundTheme, setThemeColor, )
@@ -426,6 +427,10 @@ class Window(_create_smart_window_class()):
             if hasattr(self, 'is_logged_in') and self.is_logged_in:
                 api_client.close_t()
                 logger.info("API client resources cleaned up")
+            close_all_clients()
+            # 停止云端ASR任务管理器，写入未落盘的任务状态
+            from app.cloud_asr.task_manager import stop_task_manager
+            stop_task_manager()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 
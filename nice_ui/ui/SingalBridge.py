@@ -11,6 +11,7 @@ class DataBridge(QObject):
     update_balance = Signal(int)  # 更新余额信号
     update_history = Signal(list)  # 更新历史记录信号
     task_error = Signal(str, str)  # 任务错误信号：(任务ID, 错误信息)
+    translation_line = Signal(str, int, str)  # 流式翻译的最新译文，显示在任务列表：(任务ID, 字幕序号, 译文)
 
     def __init__(self):
         super().__init__()
@@ -34,6 +35,16 @@ class DataBridge(QObject):
     def emit_whisper_working(self, unid, progress: int):
         self.whisper_working.emit(unid, progress)
 
+    def emit_translation_line(self, unid: str, entry_index: int, text: str):
+        """
+        一行字幕的译文已接收完整
+        Args:
+            unid: 任务ID
+            entry_index: 字幕序号，从0开始
+            text: 译文
+        """
+        self.translation_line.emit(unid, entry_index, text)
+
     def emit_whisper_finished(self, status: str):
         """
         Args:
@@ -71,6 +71,7 @@ class TableApp(CardWidget):
         """
         self.data_bridge.update_table.connect(self.table_row_init)
         self.data_bridge.whisper_working.connect(self.table_row_working)
+        self.data_bridge.translation_line.connect(self.table_row_translation_line)
         self.data_bridge.whisper_finished.connect(self.table_row_finish)
         self.selectAllBtn.stateChanged.connect(self._selectAll)
         self.selectAllBtn.stateChanged.connect(self.exportBtn.setVisible)
@@ -374,24 +375,36 @@ class TableApp(CardWidget):
             # todo 所有位置屏蔽开始任务按钮，当前trans，ast_trans任务不能开始。
             self._set_row_buttons(row_position, [ButtonType.DELETE])
 
-    def table_row_working(self, unid: str, progress: float):
+    def _cached_row(self, unid: str) -> Optional[int]:
         ask = self.row_cache
         if unid in ask:
             # logger.debug(f"缓存中找到:{unid}的索引")
-            row = self.row_cache[unid]
-        else:
-            logger.debug(f"缓存未找到文件:{unid}的索引,尝试从列表中查找")
-            row = self.find_row_by_identifier(unid)
-            if row is not None:
-                ask[unid] = row
-            else:
-                return
+            return ask[unid]
+        logger.debug(f"缓存未找到文件:{unid}的索引,尝试从列表中查找")
+        row = self.find_row_by_identifier(unid)
+        if row is not None:
+            ask[unid] = row
+        return row
+
+    def table_row_working(self, unid: str, progress: float):
+        row = self._cached_row(unid)
+        if row is None:
+            return
 
         progress_bar = self.table.cellWidget(row, TableWidgetColumn.JOB_STATUS)
         logger.info(f"更新文件:{unid}的进度条:{progress}")
         # todo: 处理中，删除别的任务，报错AttributeError: 'NoneType' object has no attribute 'setText'
         progress_bar.setText(f"处理中 {progress}%")
 
+    def table_row_translation_line(self, unid: str, entry_index: int, text: str):
+        """流式翻译时在任务状态的提示中显示最新收到的一行译文"""
+        row = self._cached_row(unid)
+        if row is None:
+            return
+        progress_bar = self.table.cellWidget(row, TableWidgetColumn.JOB_STATUS)
+        if progress_bar is not None:
+            progress_bar.setToolTip(f"第{entry_index + 1}行: {text}")
+
     def find_row_by_identifier(self, unid: str) -> Optional[int]:
         # 此函数用于根据唯一标识符（unid）在表格中查找行索引
         for row in range(self.table.rowCount()):
@@ -12,6 +12,7 @@ from nice_ui.ui import __version__
 from nice_ui.ui.style import LLMKeySet, TranslateKeySet
 from nice_ui.util.tools import start_tools
 from orm.queries import PromptsOrm
+from services.llm_client import invalidate_proxy_cache
 from utils import logger
 from vendor.qfluentwidgets import (TableWidget, BodyLabel, CaptionLabel, HyperlinkLabel, SubtitleLabel, ToolButton, RadioButton, LineEdit, PushButton, InfoBar,
                                    InfoBarPosition, FluentIcon, PrimaryPushButton, CardWidget, StrongBodyLabel, TransparentToolButton, SpinBox, MessageBox,
@@ -963,6 +964,9 @@ class ProxyPage(QWidget):
             QNetworkProxy.setApplicationProxy(QNetworkProxy.NoProxy)
             logger.info("禁用代理")
 
+        # 翻译请求使用新的代理设置
+        invalidate_proxy_cache()
+
         InfoBar.success(
             title="成功",
             content="代理设置已保存",
@@ -176,6 +176,9 @@ class ConfigManager:
                 'summary_length': 8000,
                 'max_split_length': 20,
                 'reflect_translate': True,
+                'fused_translate': True,
+                'stream': {'enabled': False, 'stall_timeout': 20, 'retry': 3, 'retry_delay': 1},
+                'token_chunking': {'enabled': False, 'max_lines': 40, 'target_latency': 60},
                 'subtitle_max_length': 75,
                 'target_multiplier': 1.2,
                 'min_subtitle_duration': 2.5,
@@ -370,11 +373,38 @@ class ConfigManager:
         translator_config = self.get_translator_config()
         return translator_config.get('max_entries', 10)
     
-    def get_sleep_time(self):
-        """翻译API调用间隔"""
+    def get_translate_concurrency(self) -> int:
+        """同一个翻译任务同时翻译的块数，默认1（逐块串行翻译）"""
         translator_config = self.get_translator_config()
-        return translator_config.get('sleep_time', 1)
-        
+        return translator_config.get('concurrency', 1)
+
+    def get_requests_per_minute(self) -> float:
+        """每个API配置每分钟最多请求数，0表示不限速；旧配置只有sleep_time（调用间隔秒数）时按间隔换算"""
+        translator_config = self.get_translator_config()
+        if 'requests_per_minute' not in translator_config and translator_config.get('sleep_time'):
+            return 60 / translator_config['sleep_time']
+        return translator_config.get('requests_per_minute', 60)
+
+    def get_translation_memory_config(self) -> Dict[str, Any]:
+        """翻译记忆配置：enabled 是否启用，max_entries 最多保存的条目数"""
+        translator_config = self.get_translator_config()
+        return translator_config.get('translation_memory', {})
+
+    def get_fused_translate(self) -> bool:
+        """二次优化翻译是否在一次请求中同时返回直译和意译，校验失败的块再回退为两步翻译"""
+        translator_config = self.get_translator_config()
+        return translator_config.get('fused_translate', True)
+
+    def get_token_chunking_config(self) -> Dict[str, Any]:
+        """按token预算切分翻译块：enabled 是否启用，max_lines 每块最多行数，target_latency 每块期望的最长耗时，
+        models 各模型的上下文和最大输出token数"""
+        translator_config = self.get_translator_config()
+        return translator_config.get('token_chunking', {})
+
+    def get_stream_translate(self) -> Dict[str, Any]:
+        """流式翻译配置：enabled 是否启用，stall_timeout 开始输出后多少秒没有新内容视为卡住，retry/retry_delay 重试次数和首次重试间隔"""
+        translator_config = self.get_translator_config()
+        return translator_config.get('stream', {})
 
 
 
@@ -463,11 +493,35 @@ def get_max_entries() -> int:
     """获取每个块的最大条目数"""
     return config_manager.get_max_entries()
 
-def get_sleep_time() -> int:
-    """翻译API调用间隔"""
-    return config_manager.get_sleep_time()
+def get_translate_concurrency() -> int:
+    """同一个翻译任务同时翻译的块数"""
+    return config_manager.get_translate_concurrency()
+
+
+def get_requests_per_minute() -> float:
+    """每个API配置每分钟最多请求数"""
+    return config_manager.get_requests_per_minute()
+
+
+def get_translation_memory_config() -> Dict[str, Any]:
+    """翻译记忆配置"""
+    return config_manager.get_translation_memory_config()
+
+
+def get_fused_translate() -> bool:
+    """是否一次请求完成直译和意译"""
+    return config_manager.get_fused_translate()
+
+
+def get_token_chunking_config() -> Dict[str, Any]:
+    """按token预算切分翻译块的配置"""
+    return config_manager.get_token_chunking_config()
+
+
+def get_stream_translate() -> Dict[str, Any]:
+    """流式翻译配置"""
+    return config_manager.get_stream_translate()
 
 if __name__ == '__main__':
     print(get_chunk_size())
     print(get_max_entries())
-    print(get_sleep_time())
@@ -0,0 +1,83 @@
+"""
+流式JSON对象解析
+LLM以流的方式返回 {"1": {...}, "2": {...}} 时，每个顶层成员接收完整后立即解析返回，不等待整个响应
+"""
+import json
+from typing import Any, List, Tuple
+
+_WHITESPACE = ' \t\r\n'
+
+
+class JsonMemberParser:
+    """增量解析顶层JSON对象的成员，对象之前的文本（如```json）被忽略"""
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.started = False
+        self.done = False
+
+    def _skip(self, pos: int, chars: str = _WHITESPACE) -> int:
+        while pos < len(self.buffer) and self.buffer[pos] in chars:
+            pos += 1
+        return pos
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        输入一段文本
+
+        Returns:
+            List[Tuple[str, Any]]: 本次新解析出的(键, 值)
+        """
+        if self.done:
+            return []
+        self.buffer += text
+        if not self.started:
+            start = self.buffer.find('{')
+            if start < 0:
+                self.buffer = ''
+                return []
+            self.buffer = self.buffer[start + 1:]
+            self.started = True
+
+        members = []
+        pos = 0
+        while True:
+            i = self._skip(pos, _WHITESPACE + ',')
+            if i >= len(self.buffer):
+                break
+            if self.buffer[i] == '}':
+                self.done = True
+                pos = i + 1
+                break
+            if self.buffer[i] != '"':
+                raise ValueError(f"JSON对象成员格式错误: {self.buffer[i:i + 50]!r}")
+            try:
+                key, i = self.decoder.raw_decode(self.buffer, i)
+            except json.JSONDecodeError:
+                break
+            i = self._skip(i)
+            if i >= len(self.buffer):
+                break
+            if self.buffer[i] != ':':
+                raise ValueError(f"JSON对象成员缺少冒号: {self.buffer[i:i + 50]!r}")
+            i = self._skip(i + 1)
+            if i >= len(self.buffer):
+                break
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, i)
+            except json.JSONDecodeError:
+                break
+            # 数字、true等在缓冲区末尾时可能还没接收完
+            if end == len(self.buffer) and not isinstance(value, (dict, list, str)):
+                break
+            members.append((key, value))
+            pos = end
+
+        self.buffer = self.buffer[pos:]
+        return members
+
+    def close(self) -> None:
+        """输入结束，对象不完整时抛出ValueError"""
+        if not self.done:
+            raise ValueError("JSON响应不完整" if self.started else "响应中没有JSON对象")
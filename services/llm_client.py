@@ -1,15 +1,29 @@
+import atexit
+import importlib.util
 import json
+import threading
+import time
 
 import httpx
 from openai import OpenAI
-from typing import Any, Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 from utils.agent_dict import AgentConfig
 from .decorators import except_handler
+from .json_stream import JsonMemberParser
+from .rate_limiter import get_rate_limiter
 from utils import logger
 
+# 代理设置缓存时间（秒），设置界面修改代理后会主动清除缓存
+PROXY_CACHE_TTL = 30
+# 每个客户端的连接池限制
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+# 安装了h2时使用HTTP/2，服务端不支持时httpx会自动回退到HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
 
-
+_proxy_cache: Tuple[float, Optional[str]] = (0.0, None)
+_client_pool: Dict[Tuple[str, str, Optional[str]], OpenAI] = {}
+_client_pool_lock = threading.Lock()
 
 
 def get_proxy_from_settings():
@@ -37,22 +51,42 @@ def get_proxy_from_settings():
         return None
 
 
-def create_openai_client(api_key: str, base_url: str) -> OpenAI:
+def get_cached_proxy() -> Optional[str]:
+    """获取代理配置，PROXY_CACHE_TTL秒内不重复读取QSettings"""
+    global _proxy_cache
+    cached_at, proxy = _proxy_cache
+    if time.monotonic() - cached_at > PROXY_CACHE_TTL:
+        proxy = get_proxy_from_settings()
+        _proxy_cache = (time.monotonic(), proxy)
+    return proxy
+
+
+def invalidate_proxy_cache() -> None:
+    """清除代理配置缓存，代理设置修改后调用"""
+    global _proxy_cache
+    _proxy_cache = (0.0, None)
+
+
+def create_openai_client(api_key: str, base_url: str, proxy: Optional[str] = None) -> OpenAI:
     """
-    创建支持代理的OpenAI客户端
+    创建支持代理的OpenAI客户端，启用keep-alive连接池
     
     Args:
         api_key: API密钥
         base_url: API基础URL
+        proxy: 代理URL
         
     Returns:
         OpenAI: 配置好的OpenAI客户端
     """
-    proxy = get_proxy_from_settings()
+    transport = httpx.HTTPTransport(local_address="0.0.0.0", http2=HTTP2_AVAILABLE, limits=POOL_LIMITS) if proxy else None
     http_client = httpx.Client(
         proxies=proxy,
-        transport=httpx.HTTPTransport(local_address="0.0.0.0")
-    ) if proxy else None
+        transport=transport,
+        http2=HTTP2_AVAILABLE,
+        limits=POOL_LIMITS,
+        timeout=httpx.Timeout(120, connect=10),
+    )
 
     return OpenAI(
         api_key=api_key,
@@ -61,6 +95,41 @@ def create_openai_client(api_key: str, base_url: str) -> OpenAI:
     )
 
 
+def get_openai_client(api_key: str, base_url: str) -> OpenAI:
+    """
+    从客户端池获取OpenAI客户端，按(base_url, key, proxy)复用，
+    同一个服务商的请求复用已建立的TCP/TLS连接
+
+    Args:
+        api_key: API密钥
+        base_url: API基础URL
+    """
+    proxy = get_cached_proxy()
+    key = (base_url, api_key, proxy)
+    with _client_pool_lock:
+        client = _client_pool.get(key)
+        if client is None:
+            client = create_openai_client(api_key, base_url, proxy)
+            _client_pool[key] = client
+            logger.debug(f"创建OpenAI客户端: {base_url}, 代理: {proxy}, HTTP/2: {HTTP2_AVAILABLE}")
+        return client
+
+
+def close_all_clients() -> None:
+    """关闭客户端池中的所有连接"""
+    with _client_pool_lock:
+        clients = list(_client_pool.values())
+        _client_pool.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"关闭OpenAI客户端失败: {e}")
+
+
+atexit.register(close_all_clients)
+
+
 # @except_handler("GPT request failed", retry=5, delay=1)
 def ask_gpt(model_api:AgentConfig, prompt: str, resp_type: Optional[str] = None,
            valid_def: Optional[callable] = None, log_title: str = "default") -> Any:
@@ -78,7 +147,10 @@ def ask_gpt(model_api:AgentConfig, prompt: str, resp_type: Optional[str] = None,
         响应内容，如果resp_type='json'则返回解析后的dict，否则返回字符串
     """
     # logger.trace(f'model_api:{model_api}')
-    client = create_openai_client(api_key=model_api.key, base_url=model_api.base_url)
+    client = get_openai_client(api_key=model_api.key, base_url=model_api.base_url)
+
+    # 同一个API配置的所有请求共用令牌桶限速
+    get_rate_limiter(model_api).acquire()
 
     # 设置响应格式
     response_format = None
@@ -158,4 +230,82 @@ def ask_gpt(model_api:AgentConfig, prompt: str, resp_type: Optional[str] = None,
             raise ValueError(f"API response error: {valid_resp['message']}")
 
     # logger.info(f"GPT调用成功 ({log_title})")
-    return resp
\ No newline at end of file
+    return resp
+
+class LLMStreamStalled(TimeoutError):
+    """流式响应长时间没有新内容"""
+
+
+def ask_gpt_stream(model_api: AgentConfig, prompt: str, log_title: str = "default",
+                   stall_timeout: float = 20, first_token_timeout: float = 120) -> Iterator[Tuple[str, Any]]:
+    """
+    流式调用GPT API，响应为JSON对象时每个顶层成员接收完整后立即返回
+
+    Args:
+        model_api: 模型API配置对象
+        prompt: 提示词
+        log_title: 日志标题
+        stall_timeout: 开始输出后超过该秒数没有新内容视为卡住
+        first_token_timeout: 等待第一段内容的最长秒数
+
+    Yields:
+        Tuple[str, Any]: (键, 值)
+
+    Raises:
+        LLMStreamStalled: 流卡住
+        ValueError: 响应不是完整的JSON对象
+    """
+    client = get_openai_client(api_key=model_api.key, base_url=model_api.base_url)
+    get_rate_limiter(model_api).acquire()
+
+    stream = client.chat.completions.create(
+        model=model_api.model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        timeout=first_token_timeout
+    )
+
+    # 监视线程：超时没有新内容时关闭连接，使阻塞的读取立即返回
+    state = {'last': time.monotonic(), 'received': False, 'stalled': False}
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(0.5):
+            limit = stall_timeout if state['received'] else first_token_timeout
+            if time.monotonic() - state['last'] > limit:
+                state['stalled'] = True
+                stream.close()
+                return
+
+    watcher = threading.Thread(target=watch, name=f'llm-stream-watch-{log_title}', daemon=True)
+    watcher.start()
+
+    parser = JsonMemberParser()
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            state['last'] = time.monotonic()
+            state['received'] = True
+            yield from parser.feed(content)
+            if parser.done:
+                break
+    except Exception as e:
+        if state['stalled']:
+            raise LLMStreamStalled(f"流式响应超过{stall_timeout if state['received'] else first_token_timeout}秒没有新内容 ({log_title})") from e
+        raise
+    finally:
+        finished.set()
+        stream.close()
+
+    if state['stalled']:
+        raise LLMStreamStalled(f"流式响应超时 ({log_title})")
+    try:
+        parser.close()
+    except ValueError as e:
+        error_msg = f"JSON解析失败 ({log_title}): {e}"
+        logger.error(error_msg)
+        raise ValueError(error_msg) from e
@@ -0,0 +1,74 @@
+"""
+LLM请求速率限制
+令牌桶算法，每个API配置（base_url + model + key）共用一个令牌桶，
+多个翻译线程、多个翻译任务同时请求同一个服务商时不会超过其速率限制
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.agent_dict import AgentConfig
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<=0表示不限速
+            capacity: 桶容量（允许的突发请求数），默认为1秒的令牌数且不小于1
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """按经过的时间补充令牌，调用方需持有self.lock"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，令牌不足时阻塞等待
+
+        Returns:
+            float: 等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+_buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(agent: AgentConfig, requests_per_minute: Optional[float] = None) -> TokenBucket:
+    """
+    获取API配置对应的令牌桶
+
+    Args:
+        agent: API配置
+        requests_per_minute: 每分钟请求数，默认读取translator.requests_per_minute配置
+    """
+    key = (agent.base_url, agent.model, agent.key or '')
+    with _buckets_lock:
+        if key not in _buckets:
+            if requests_per_minute is None:
+                from services.config_manager import get_requests_per_minute
+                requests_per_minute = get_requests_per_minute()
+            _buckets[key] = TokenBucket(requests_per_minute / 60)
+        return _buckets[key]
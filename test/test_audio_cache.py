@@ -0,0 +1,73 @@
+# 音频提取缓存：重复提取同一个源文件时跳过解码
+import time
+
+import numpy as np
+import soundfile as sf
+
+from app.audio_cache import AudioCache
+from app.video_tools import FFmpegJobs
+
+
+def _make_source(path, seconds=60, freq=440):
+    rate = 44100
+    t = np.arange(rate * seconds) / rate
+    samples = (np.sin(2 * np.pi * freq * t) * 0.3).astype(np.float32)
+    sf.write(str(path), np.stack([samples, samples], axis=1), rate, format='FLAC')
+
+
+def test_audio_cache_skips_decode(tmp_path, monkeypatch):
+    source = tmp_path / 'source.flac'
+    _make_source(source)
+    cache = AudioCache(tmp_path / 'cache', max_size_mb=100)
+
+    calls = []
+    convert_audio = FFmpegJobs.convert_audio
+    monkeypatch.setattr(FFmpegJobs, 'convert_audio', staticmethod(lambda *args: calls.append(args) or convert_audio(*args)))
+
+    start = time.perf_counter()
+    assert cache.convert(source, tmp_path / 'job1' / 'a.wav')
+    miss_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert cache.convert(source, tmp_path / 'job2' / 'a.wav')
+    hit_cost = time.perf_counter() - start
+    print(f"未命中: {miss_cost:.3f}s, 命中: {hit_cost:.3f}s")
+
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert (tmp_path / 'job1' / 'a.wav').read_bytes() == (tmp_path / 'job2' / 'a.wav').read_bytes()
+    assert sf.info(str(tmp_path / 'job2' / 'a.wav')).samplerate == 16000
+
+    # 输出是独立副本，就地修改不影响缓存
+    with open(tmp_path / 'job1' / 'a.wav', 'r+b') as f:
+        f.write(b'\0' * 64)
+    assert cache.convert(source, tmp_path / 'job5' / 'a.wav')
+    assert (tmp_path / 'job5' / 'a.wav').read_bytes() == (tmp_path / 'job2' / 'a.wav').read_bytes()
+    assert len(calls) == 1
+
+    # 解码参数不同时不能命中
+    assert cache.convert(source, tmp_path / 'job3' / 'a.wav', sample_rate=8000)
+    assert len(calls) == 2
+
+    # 索引持久化，重启后仍然命中
+    assert AudioCache(tmp_path / 'cache', max_size_mb=100).convert(source, tmp_path / 'job4' / 'a.wav')
+    assert len(calls) == 2
+
+
+def test_audio_cache_lru_eviction(tmp_path):
+    sources = []
+    for i, freq in enumerate((220, 440, 880)):
+        sources.append(tmp_path / f'source{i}.flac')
+        _make_source(sources[-1], seconds=20, freq=freq)
+
+    # 每个16kHz单声道20秒wav约625KB，上限只够放两个
+    cache = AudioCache(tmp_path / 'cache', max_size_mb=1.5)
+    for i, source in enumerate(sources):
+        assert cache.convert(source, tmp_path / f'out{i}.wav')
+        time.sleep(0.01)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['size_mb'] <= 1.5
+    # 最早使用的条目被删除，但已经输出到任务目录的文件不受影响
+    assert cache.make_key(str(sources[0]), 16000, 'mono', '.wav') not in cache.entries
+    assert (tmp_path / 'out0.wav').exists()
@@ -0,0 +1,62 @@
+# 文档翻译：多块并发翻译 vs 逐块串行翻译，结果顺序和进度信号
+import time
+
+from agent import enhanced_common_agent
+from agent.enhanced_common_agent import DocumentTranslator
+from services.rate_limiter import TokenBucket
+
+REQUEST_COST = 0.05  # 模拟一次LLM请求的耗时（秒）
+
+
+def _make_srt(count):
+    blocks = []
+    for i in range(count):
+        start, end = i * 2, i * 2 + 1
+        blocks.append(f"{i + 1}\n00:00:{start:02d},000 --> 00:00:{end:02d},000\nline {i} of the subtitle")
+    return "\n\n".join(blocks) + "\n"
+
+
+class FakeTranslator:
+    """模拟两步翻译，每块两次请求"""
+    terminology_manager = None
+
+    def translate_lines(self, lines, previous, after, note, theme, index, line_offset=0):
+        time.sleep(REQUEST_COST * 2 + (0.03 if index % 3 == 0 else 0))
+        return "\n".join(f"译文 {line}" for line in lines.split("\n")), lines
+
+
+def _run(concurrency, monkeypatch):
+    progress = []
+    monkeypatch.setattr(enhanced_common_agent.data_bridge, 'emit_whisper_working', lambda unid, p: progress.append(p))
+    translator = DocumentTranslator('fake')
+    translator._prepare_translation_data(_make_srt(50), chunk_size=600, max_entries=5)
+    translator.translator = FakeTranslator()
+    translator.theme_prompt = ''
+
+    start = time.perf_counter()
+    results = translator._translate_chunks('unid0001', concurrency)
+    cost = time.perf_counter() - start
+    return cost, results, progress, translator._match_translations_to_entries(results)
+
+
+def test_concurrent_translation_keeps_order(monkeypatch):
+    serial_cost, serial_results, serial_progress, serial_lines = _run(1, monkeypatch)
+    concurrent_cost, results, progress, lines = _run(4, monkeypatch)
+    print(f"串行: {serial_cost:.2f}s, 并发4: {concurrent_cost:.2f}s, 加速 {serial_cost / concurrent_cost:.1f}x")
+
+    assert [r[0] for r in results] == list(range(len(results)))
+    assert results == serial_results
+    assert lines == serial_lines and lines[7] == '译文 line 7 of the subtitle'
+    assert progress == sorted(progress) and progress[-1] == 100
+    assert len(progress) == len(serial_progress)
+    assert concurrent_cost < serial_cost / 2
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.perf_counter()
+    for _ in range(11):
+        bucket.acquire()
+    # 第一个令牌立即可用，其余10个按每秒20个补充
+    assert time.perf_counter() - start >= 0.45
+    assert TokenBucket(rate=0).acquire() == 0.0
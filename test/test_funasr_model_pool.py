@@ -0,0 +1,90 @@
+# FunASR模型池：命中率、引用计数、内存预算、空闲超时淘汰和模型调用锁
+import threading
+import time
+
+from app.funasr_model_pool import FunASRModelPool
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.active = 0
+        self.max_active = 0
+
+    def generate(self, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.005)
+        self.active -= 1
+        return [kwargs]
+
+
+def _make_pool(**kwargs):
+    loads = []
+
+    def loader(**model_kwargs):
+        loads.append(model_kwargs['model'])
+        time.sleep(0.01)
+        return FakeModel(**model_kwargs)
+
+    pool = FunASRModelPool(loader=loader, size_estimator=lambda model: 100 * MB, **kwargs)
+    return pool, loads
+
+
+def test_model_pool_reuse_and_stats():
+    pool, loads = _make_pool(idle_timeout=0, memory_budget_mb=0)
+    pool.warm_up({'model': 'asr'})
+    for _ in range(50):
+        with pool.use(model='asr') as model:
+            assert model.kwargs['model'] == 'asr'
+
+    stats = pool.stats()
+    assert loads == ['asr']
+    assert stats['hits'] == 50 and stats['misses'] == 1
+    assert stats['hit_rate'] > 0.98
+    assert stats['total_load_time'] > 0
+
+
+def test_model_pool_memory_budget_keeps_models_in_use():
+    pool, loads = _make_pool(idle_timeout=0, memory_budget_mb=250)
+    asr = pool.acquire(model='asr')
+    pool.warm_up({'model': 'punc'}, {'model': 'vad'})
+
+    # asr使用中不会被淘汰，超出预算时先淘汰最久未使用的punc
+    assert pool.stats()['loaded_models'] == 2
+    assert pool.acquire(model='asr') is asr
+    pool.acquire(model='punc')
+    assert loads == ['asr', 'punc', 'vad', 'punc']
+
+
+def test_model_pool_idle_timeout():
+    pool, loads = _make_pool(idle_timeout=0.05, memory_budget_mb=0)
+    model = pool.acquire(model='asr')
+    time.sleep(0.1)
+    assert pool.evict_idle() == 0  # 引用计数不为0
+
+    pool.release(model)
+    time.sleep(0.1)
+    assert pool.evict_idle() == 1
+    assert pool.stats()['evictions'] == 1
+    pool.clear()
+
+
+def test_model_lock_shared_across_users():
+    pool, _ = _make_pool(idle_timeout=0, memory_budget_mb=0)
+    # 两个任务各自获取同一个模型，并发调用generate
+    first, second = pool.acquire(model='asr'), pool.acquire(model='asr')
+    assert first is second and pool.model_lock(first) is pool.model_lock(second)
+
+    threads = [threading.Thread(target=lambda m=model: [pool.generate(m, input=i) for i in range(10)])
+               for model in (first, second) * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert first.max_active == 1
+
+    # 不同模型互不阻塞
+    assert pool.model_lock(pool.acquire(model='punc')) is not pool.model_lock(first)
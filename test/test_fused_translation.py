@@ -0,0 +1,96 @@
+# 合并翻译：一次请求同时返回直译和意译，与两步翻译比较请求数、提示词长度和耗时；结果不完整的块回退为两步翻译
+import re
+import time
+
+from agent import translator as translator_module
+from agent.translator import Translator
+from utils.agent_dict import AgentConfig
+
+LATENCY = 0.02  # 模拟一次LLM请求的耗时（秒）
+
+
+class StubLLM:
+    """按提示词中的字幕返回翻译结果，记录请求"""
+
+    def __init__(self, broken_fused_blocks=()):
+        self.calls = []
+        self.broken_fused_blocks = set(broken_fused_blocks)
+
+    def __call__(self, model_api, prompt, resp_type=None, valid_def=None, log_title='default'):
+        time.sleep(LATENCY)
+        self.calls.append((log_title, len(prompt)))
+        lines = re.search(r'<subtitles>\n(.*?)\n</subtitles>', prompt, re.S).group(1).split('\n')
+        step, index = log_title.rsplit('_', 1)
+        result = {}
+        for i, line in enumerate(lines, 1):
+            item = {'origin': line, 'direct': f'直译:{line}'}
+            if step in ('translate_fused', 'translate_expressiveness'):
+                item['free'] = f'意译:{line}'
+            result[str(i)] = item
+        if step == 'translate_fused' and int(index) in self.broken_fused_blocks:
+            del result['1']['free']
+        valid = valid_def(result)
+        if valid['status'] != 'success':
+            raise ValueError(f"API response error: {valid['message']}")
+        return result
+
+
+def _translator(monkeypatch, stub, fused):
+    monkeypatch.setattr(translator_module, 'get_translation_memory', lambda: None)
+    monkeypatch.setattr(translator_module, 'ask_gpt', stub)
+    translator = Translator(AgentConfig(base_url='http://stub/v1', model='stub', key='sk'), '中文', 'English')
+    translator.fused_translate = fused
+    translator.stream_translate = False
+    return translator
+
+
+def _chunks():
+    return ['\n'.join(f'chunk {c} line {i} of the subtitle' for i in range(10)) for c in range(5)]
+
+
+def _run(translator, chunks):
+    context = [f'context line {i}' for i in range(10)]
+    start = time.perf_counter()
+    results = [translator.translate_lines(chunk, context, context, 'note', 'theme', i)[0] for i, chunk in enumerate(chunks)]
+    return results, time.perf_counter() - start
+
+
+def test_fused_halves_requests(monkeypatch):
+    chunks = _chunks()
+    two_step = StubLLM()
+    expected, two_step_cost = _run(_translator(monkeypatch, two_step, fused=False), chunks)
+    fused = StubLLM()
+    results, fused_cost = _run(_translator(monkeypatch, fused, fused=True), chunks)
+
+    two_step_chars = sum(size for _, size in two_step.calls)
+    fused_chars = sum(size for _, size in fused.calls)
+    print(f"两步: {len(two_step.calls)}次请求, 提示词{two_step_chars}字符, {two_step_cost:.2f}s; "
+          f"合并: {len(fused.calls)}次请求, 提示词{fused_chars}字符, {fused_cost:.2f}s")
+
+    assert results == expected
+    assert results[0].split('\n')[3] == '意译:chunk 0 line 3 of the subtitle'
+    assert len(two_step.calls) == 2 * len(chunks)
+    assert len(fused.calls) == len(chunks)
+    assert fused_chars < two_step_chars * 0.6
+    assert fused_cost < two_step_cost * 0.75
+
+
+def test_invalid_fused_block_falls_back(monkeypatch):
+    chunks = _chunks()
+    stub = StubLLM(broken_fused_blocks={2})
+    results, _ = _run(_translator(monkeypatch, stub, fused=True), chunks)
+
+    assert [title for title, _ in stub.calls if title.endswith('_2')] == [
+        'translate_fused_2', 'translate_faithfulness_2', 'translate_expressiveness_2']
+    assert len(stub.calls) == len(chunks) + 2
+    assert results[2].split('\n')[0] == '意译:chunk 2 line 0 of the subtitle'
+
+
+def test_direct_only_ignores_fused(monkeypatch):
+    stub = StubLLM()
+    translator = _translator(monkeypatch, stub, fused=True)
+    translator.reflect_translate = False
+    result, _ = translator.translate_lines('hello\nworld', None, None, '', '', 0)
+
+    assert result == '直译:hello\n直译:world'
+    assert [title for title, _ in stub.calls] == ['translate_faithfulness_0']
@@ -0,0 +1,53 @@
+# 长音频读取的峰值内存对比：整文件sf.read vs 按VAD片段seek读取
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from app.listen import SrtWriter
+
+SAMPLE_RATE = 16000
+DURATION_S = 600  # 10分钟双声道合成音频
+SEGMENT_MS = 10000
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_segment_read_memory(tmp_path):
+    wav_path = str(tmp_path / 'long.wav')
+    with sf.SoundFile(wav_path, 'w', samplerate=SAMPLE_RATE, channels=2, subtype='PCM_16') as f:
+        block = (np.random.default_rng(0).standard_normal((SAMPLE_RATE * 60, 2)) * 0.1).astype(np.float32)
+        for _ in range(DURATION_S // 60):
+            f.write(block)
+    segments = [[start, start + SEGMENT_MS] for start in range(0, DURATION_S * 1000, SEGMENT_MS)]
+
+    def full_read():
+        audio_data, sample_rate = sf.read(wav_path)
+        for start, end in segments:
+            SrtWriter.crop_audio(audio_data, start, end, sample_rate)
+
+    def streaming_read():
+        with sf.SoundFile(wav_path) as audio_file:
+            for start, end in segments:
+                SrtWriter.read_audio_segment(audio_file, start, end)
+
+    full_peak = _peak_memory(full_read)
+    streaming_peak = _peak_memory(streaming_read)
+    print(f"整文件读取峰值: {full_peak / 1024 / 1024:.1f}MB, 分段读取峰值: {streaming_peak / 1024 / 1024:.1f}MB")
+
+    # 分段读取的峰值只与单个片段大小相关
+    segment_bytes = SAMPLE_RATE * SEGMENT_MS // 1000 * 2 * 4
+    assert streaming_peak < segment_bytes * 2
+    assert streaming_peak * 10 < full_peak
+
+    with sf.SoundFile(wav_path) as audio_file:
+        streamed = SrtWriter.read_audio_segment(audio_file, 30000, 31000)
+    full = SrtWriter.crop_audio(sf.read(wav_path, dtype='float32')[0], 30000, 31000, SAMPLE_RATE)
+    assert np.array_equal(streamed, full)
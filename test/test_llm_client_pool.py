@@ -0,0 +1,79 @@
+# OpenAI客户端池：每次请求新建客户端 vs 复用客户端的请求延迟（本地模拟服务）
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import llm_client
+
+REQUESTS = 60
+COMPLETION = {
+    "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "stub",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def _request(client):
+    start = time.perf_counter()
+    resp = client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}], timeout=10)
+    assert resp.choices[0].message.content == "ok"
+    return time.perf_counter() - start
+
+
+def test_client_pool_latency(monkeypatch):
+    monkeypatch.setattr(llm_client, "get_proxy_from_settings", lambda: None)
+    llm_client.invalidate_proxy_cache()
+    server = CountingServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    try:
+        fresh = []
+        for _ in range(REQUESTS):
+            client = llm_client.create_openai_client("sk-stub", base_url)
+            fresh.append(_request(client))
+            client.close()
+        fresh_connections = server.connections
+
+        pooled = [_request(llm_client.get_openai_client("sk-stub", base_url)) for _ in range(REQUESTS)]
+        pooled_connections = server.connections - fresh_connections
+    finally:
+        llm_client.close_all_clients()
+        server.shutdown()
+
+    fresh_avg, pooled_avg = sum(fresh) / REQUESTS * 1000, sum(pooled) / REQUESTS * 1000
+    print(f"每次新建客户端: {fresh_avg:.2f}ms/请求 {fresh_connections}个连接, "
+          f"客户端池: {pooled_avg:.2f}ms/请求 {pooled_connections}个连接")
+
+    assert fresh_connections == REQUESTS
+    assert pooled_connections == 1
+    assert llm_client.get_openai_client("sk-stub", base_url) is not llm_client.get_openai_client("sk-other", base_url)
+    llm_client.close_all_clients()
+    assert pooled_avg < fresh_avg
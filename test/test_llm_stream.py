@@ -0,0 +1,159 @@
+# 流式翻译：逐个解析JSON成员，第一行译文在整个响应结束前返回；流卡住时提前结束而不是等到120秒超时
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agent import translator as translator_module
+from agent.translator import Translator
+from services import llm_client
+from services.json_stream import JsonMemberParser
+from services.llm_client import LLMStreamStalled, ask_gpt_stream
+from utils.agent_dict import AgentConfig
+
+AGENT = AgentConfig(base_url='http://stub/v1', model='stub', key='sk')
+RESPONSE = {str(i): {'origin': f'line {i}', 'direct': f'直译 {i}', 'free': f'意译 {i}'} for i in range(1, 6)}
+
+
+def _tokens(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeStream:
+    """按固定间隔返回内容块的流，stall_after之后不再返回内容，直到被关闭"""
+
+    def __init__(self, tokens, interval=0.0, stall_after=None):
+        self.tokens = tokens
+        self.interval = interval
+        self.stall_after = stall_after
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for i, token in enumerate(self.tokens):
+            if self.stall_after is not None and i >= self.stall_after:
+                self.closed.wait(10)
+            if self.closed.is_set():
+                raise ConnectionError('stream closed')
+            time.sleep(self.interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    streams = []
+
+    def install(*stream_args, **stream_kwargs):
+        def create(**params):
+            assert params['stream'] is True
+            stream = FakeStream(*stream_args, **stream_kwargs)
+            streams.append(stream)
+            return stream
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(llm_client, 'get_openai_client', lambda **kwargs: client)
+        return streams
+
+    return install
+
+
+@pytest.mark.parametrize('size', [1, 3, 17, 10 ** 6])
+def test_parser_yields_members_incrementally(size):
+    text = '```json\n' + json.dumps(RESPONSE, ensure_ascii=False, indent=2) + '\n```'
+    parser = JsonMemberParser()
+    members = []
+    for token in _tokens(text, size):
+        members.extend(parser.feed(token))
+    parser.close()
+    assert dict(members) == RESPONSE
+    assert [key for key, _ in members] == list(RESPONSE)
+
+
+def test_parser_rejects_truncated_and_numbers_wait():
+    parser = JsonMemberParser()
+    assert parser.feed('{"a": 12') == []
+    assert parser.feed('3, "b": "x"') == [('a', 123), ('b', 'x')]
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_first_line_before_stream_ends(fake_llm):
+    tokens = _tokens('```json\n' + json.dumps(RESPONSE, ensure_ascii=False) + '\n```')
+    fake_llm(tokens, interval=0.005)
+
+    start = time.perf_counter()
+    arrivals = []
+    for key, item in ask_gpt_stream(AGENT, 'prompt', log_title='test'):
+        arrivals.append((key, time.perf_counter() - start))
+    total = time.perf_counter() - start
+    print(f"第一行: {arrivals[0][1]:.3f}s, 全部: {total:.3f}s")
+
+    assert [key for key, _ in arrivals] == list(RESPONSE)
+    assert arrivals[0][1] < total / 3
+
+
+def test_stalled_stream_detected_early(fake_llm):
+    tokens = _tokens(json.dumps(RESPONSE, ensure_ascii=False))
+    streams = fake_llm(tokens, stall_after=len(tokens) // 2)
+
+    received = []
+    start = time.perf_counter()
+    with pytest.raises(LLMStreamStalled):
+        for key, _ in ask_gpt_stream(AGENT, 'prompt', log_title='test', stall_timeout=0.5):
+            received.append(key)
+    assert time.perf_counter() - start < 2
+    assert received and received != list(RESPONSE)
+    assert streams[0].closed.is_set()
+
+
+def test_translator_streams_lines_to_callback(monkeypatch):
+    monkeypatch.setattr(translator_module, 'get_translation_memory', lambda: None)
+
+    def fake_stream(model_api, prompt, log_title='default', stall_timeout=20):
+        lines = prompt.split('<subtitles>\n')[1].split('\n</subtitles>')[0].split('\n')
+        for i, line in enumerate(lines, 1):
+            yield str(i), {'origin': line, 'direct': f'直译:{line}', 'free': f'意译:{line}'}
+
+    monkeypatch.setattr(translator_module, 'ask_gpt_stream', fake_stream)
+    translator = Translator(AGENT, '中文', 'English')
+    translator.stream_translate = True
+    translator.fused_translate = True
+    previews = []
+    translator.line_callback = lambda chunk, line, text: previews.append((chunk, line, text))
+
+    result, _ = translator.translate_lines('hello\nworld', None, None, '', '', 3)
+
+    assert result == '意译:hello\n意译:world'
+    assert previews == [(3, 0, '意译:hello'), (3, 1, '意译:world')]
+
+
+def test_translator_retries_stalled_stream_with_backoff(monkeypatch):
+    monkeypatch.setattr(translator_module, 'get_translation_memory', lambda: None)
+    attempts, sleeps = [], []
+
+    def flaky_stream(model_api, prompt, log_title='default', stall_timeout=20):
+        attempts.append(log_title)
+        if len(attempts) < 3:
+            raise LLMStreamStalled('stalled')
+        yield '1', {'origin': 'hello', 'direct': '直译:hello', 'free': '意译:hello'}
+
+    monkeypatch.setattr(translator_module, 'ask_gpt_stream', flaky_stream)
+    monkeypatch.setattr(translator_module.time, 'sleep', sleeps.append)
+    translator = Translator(AGENT, '中文', 'English')
+    translator.stream_translate = True
+    translator.fused_translate = True
+
+    result, _ = translator.translate_lines('hello', None, None, '', '', 0)
+
+    assert result == '意译:hello'
+    assert len(attempts) == 3
+    assert sleeps == [1, 2]
+
+
+def test_stream_translate_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(translator_module, 'get_stream_translate', lambda: {})
+    assert not Translator(AGENT, '中文', 'English').stream_translate
@@ -0,0 +1,84 @@
+# 长音频切分与合并：静音处切分，用录制的转写结果模拟各段的识别结果，离线验证合并
+import copy
+import json
+import os
+
+import numpy as np
+import soundfile as sf
+
+from app.cloud_asr.long_audio import AudioPiece, merge_piece_segments, plan_pieces, split_long_audio
+from app.cloud_asr.segment_converter import convert_to_segments
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ta_asr_result.json')
+
+
+def piece_response(data, start_ms, end_ms):
+    """模拟一段音频[start_ms, end_ms)的转写结果：只保留这段内的词，时间相对于这段的开头"""
+    data = copy.deepcopy(data)
+    sentences = []
+    for sentence in data['transcripts'][0]['sentences']:
+        words = [word for word in sentence['words'] if word['begin_time'] >= start_ms and word['end_time'] <= end_ms]
+        for word in words:
+            word['begin_time'] -= start_ms
+            word['end_time'] -= start_ms
+        if words:
+            sentence['words'] = words
+            sentences.append(sentence)
+    data['transcripts'][0]['sentences'] = sentences
+    return data
+
+
+def test_merge_recorded_pieces():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    expected = convert_to_segments(data)
+    duration = data['properties']['original_duration_in_milliseconds']
+    # 在segment之间（静音处）切分
+    splits = [expected[len(expected) // 3]['start'], expected[2 * len(expected) // 3]['start']]
+
+    plans = plan_pieces(duration, splits, overlap_ms=2000)
+    pieces, results = [], []
+    for index, (start, end, core_start, core_end) in enumerate(plans):
+        pieces.append(AudioPiece(index, f'part{index}.wav', start, core_start, core_end))
+        results.append(convert_to_segments(piece_response(data, start, end)))
+
+    assert merge_piece_segments(pieces, results) == expected
+
+
+def test_duplicate_at_boundary_kept_once():
+    pieces = [AudioPiece(0, 'a.wav', 0, 0, 10000), AudioPiece(1, 'b.wav', 8000, 10000, 20000)]
+    sentence = {'text': 'across the cut.', 'timestamp': [[8000, 9500], [9500, 11000], [11000, 12500]],
+                'start': 8000, 'end': 12500, 'spk': 0}
+    truncated = {'text': 'across the', 'timestamp': [[8000, 9500], [9500, 10000]], 'start': 8000, 'end': 10000, 'spk': 0}
+    # 第二段识别出完整的句子（相对时间），第一段只识别出被截断的部分，两者中点分别落在切分点两侧
+    later = {'text': 'later.', 'timestamp': [[5000, 6000]], 'start': 5000, 'end': 6000, 'spk': 0}
+    second = {**sentence, 'timestamp': [[b - 8000, e - 8000] for b, e in sentence['timestamp']], 'start': 0, 'end': 4500}
+
+    merged = merge_piece_segments(pieces, [[truncated], [second, later]])
+
+    assert [segment['text'] for segment in merged] == ['across the cut.', 'later.']
+    assert merged[0]['timestamp'] == sentence['timestamp']
+    assert merged[1]['start'] == 13000
+
+
+def test_split_at_silence(tmp_path):
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 0.1, 60 * sample_rate).astype(np.float32)
+    silences = [(18.5, 19.5), (41.0, 42.0)]
+    for start, end in silences:
+        audio[int(start * sample_rate):int(end * sample_rate)] = 0
+    path = tmp_path / 'long.wav'
+    sf.write(path, audio, sample_rate, subtype='PCM_16')
+
+    pieces = split_long_audio(str(path), str(tmp_path / 'pieces'), piece_seconds=20, overlap_seconds=1,
+                              search_seconds=5)
+
+    assert len(pieces) == 3
+    for piece, (start, end) in zip(pieces[1:], silences):
+        assert start * 1000 <= piece.core_start_ms <= end * 1000
+    assert pieces[0].core_start_ms == 0 and pieces[-1].core_end_ms == 60000
+    for piece in pieces:
+        info = sf.info(piece.path)
+        assert info.samplerate == sample_rate
+        assert abs(info.duration * 1000 - (min(60000, piece.core_end_ms + 1000) - piece.offset_ms)) < 2
@@ -0,0 +1,73 @@
+# 翻译结果按块序号对应到字幕条目：与原先的相似度匹配结果一致，缺失或重复的结果报错；大文件上的耗时对比
+import time
+from difflib import SequenceMatcher
+
+import pytest
+
+from agent.enhanced_common_agent import DocumentTranslator
+
+
+def _make_srt(count):
+    return "\n\n".join(f"{i + 1}\n00:{i // 60 % 60:02d}:{i % 60:02d},000 --> 00:{i // 60 % 60:02d}:{i % 60:02d},900\n"
+                       f"subtitle line {i} about topic {i % 37}" for i in range(count)) + "\n"
+
+
+def _translator(count, max_entries=10):
+    translator = DocumentTranslator('fake')
+    translator._prepare_translation_data(_make_srt(count), chunk_size=600, max_entries=max_entries)
+    results = [(i, text, "\n".join(f"译 {line}" for line in text.split("\n")))
+               for i, text in enumerate(translator.compat_data['text_chunks'])]
+    return translator, results
+
+
+def similarity_match(translator, results):
+    """原先的实现：每个块与所有结果比较相似度"""
+    all_translations = []
+    for i, chunk_entries in enumerate(translator.compat_data['entry_chunks']):
+        chunk_text = translator.compat_data['text_chunks'][i]
+        best = max(((r, SequenceMatcher(None, ''.join(r[1].split('\n')).lower(), chunk_text.lower()).ratio())
+                    for r in results), key=lambda x: x[1])
+        all_translations.extend(best[0][2].split('\n')[:len(chunk_entries)])
+    return all_translations
+
+
+def test_matches_reference():
+    translator, results = _translator(200)
+    lines = translator._match_translations_to_entries(results)
+    assert lines == similarity_match(translator, results)
+    assert lines[123] == '译 subtitle line 123 about topic 12'
+
+
+def test_integrity_check():
+    translator, results = _translator(50)
+    with pytest.raises(ValueError, match='missing chunks \\[2\\]'):
+        translator._match_translations_to_entries(results[:2] + results[3:])
+    with pytest.raises(ValueError, match='Duplicate'):
+        translator._match_translations_to_entries(results + [results[0]])
+
+    # 行数不一致时补齐/截断
+    short = list(results)
+    short[1] = (1, results[1][1], '只有一行')
+    lines = translator._match_translations_to_entries(short)
+    assert lines[10:20] == ['只有一行'] * 10
+
+
+def test_benchmark_large_srt():
+    translator, results = _translator(3000)
+    start = time.perf_counter()
+    lines = translator._match_translations_to_entries(results)
+    indexed = time.perf_counter() - start
+
+    # 原先的实现只在部分块上计时后按比例估算，避免测试过慢
+    sample = 20
+    chunks = len(results)
+    start = time.perf_counter()
+    for i in range(sample):
+        chunk_text = translator.compat_data['text_chunks'][i]
+        max(SequenceMatcher(None, ''.join(r[1].split('\n')).lower(), chunk_text.lower()).ratio() for r in results)
+    similarity = (time.perf_counter() - start) * chunks / sample
+
+    assert len(lines) == 3000
+    # 只比较数量级，留出足够余量避免机器负载波动导致失败
+    assert indexed < 0.1
+    assert indexed * 10 < similarity
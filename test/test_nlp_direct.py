@@ -0,0 +1,149 @@
+# 智能分句直接提交：本地模拟NLP服务，验证gzip内容提交、事件推送/长轮询等待和结果下载
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.nlp_api.nlp_client import NLPAPIClient
+
+SRT = "1\n00:00:00,000 --> 00:00:01,000\n你好。\n"
+
+
+class MockNLPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, sse: bool, process_seconds: float = 0.3):
+        super().__init__(('127.0.0.1', 0), MockHandler)
+        self.sse = sse
+        self.process_seconds = process_seconds
+        self.received = []
+        self.requests = []
+        self.done = threading.Event()
+        self.direct = True  # 是否提供直接提交接口，False时模拟旧版服务端
+
+    def status(self) -> str:
+        return 'completed' if self.done.is_set() else 'processing'
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, data, code=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.server.requests.append(('POST', url.path))
+        raw = self.rfile.read(int(self.headers['Content-Length']))
+        if not self.server.direct:
+            return self._json({'detail': 'Not Found'}, 404)
+        assert self.headers['Content-Encoding'] == 'gzip'
+        self.server.received.append((json.loads(gzip.decompress(raw)), parse_qs(url.query)))
+        threading.Timer(self.server.process_seconds, self.server.done.set).start()
+        self._json({'code': 200, 'data': {'task_id': 'task1'}, 'message': '任务创建成功'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(('GET', url.path))
+        if url.path == '/api/nlp/events/task1':
+            if not self.server.sse:
+                return self._json({'detail': 'Not Found'}, 404)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            self.wfile.write(b'data: {"status": "processing"}\n\n')
+            self.wfile.flush()
+            self.server.done.wait(5)
+            self.wfile.write(b'data: {"status": "completed", "result_url": "/files/task1.srt"}\n\n')
+            self.wfile.flush()
+        elif url.path == '/api/nlp/status/task1':
+            wait = float(parse_qs(url.query).get('wait', ['0'])[0])
+            self.server.done.wait(wait)
+            self._json({'code': 200, 'data': {'status': self.server.status()}})
+        elif url.path == '/api/nlp/result/task1':
+            self._json({'code': 200, 'data': {'result_url': '/files/task1.srt'}})
+        elif url.path == '/files/task1.srt':
+            body = SRT.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._json({'detail': 'Not Found'}, 404)
+
+
+@pytest.fixture
+def server(request):
+    server = MockNLPServer(sse=request.param)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('server', [True, False], indirect=True, ids=['sse', 'long_poll'])
+def test_direct_submit_and_wait(server, tmp_path):
+    segments = [{'text': '你好。', 'timestamp': [[0, 1000]], 'start': 0, 'end': 1000, 'spk': 0}]
+    segment_path = tmp_path / 'segment_data.json'
+    segment_path.write_text(json.dumps(segments, ensure_ascii=False), encoding='utf-8')
+    client = NLPAPIClient(f'http://127.0.0.1:{server.server_address[1]}/api', timeout=10)
+
+    success, task_id, error = client.submit_nlp_data(str(segment_path), 'zh')
+    assert success, error
+    assert server.received == [(segments, {'language': ['zh'], 'task_type': ['sentence_split']})]
+
+    updates = []
+    start = time.monotonic()
+    success, srt_url, error = client.wait_for_completion(task_id, max_wait_time=10,
+                                                         on_update=lambda *args: updates.append(args))
+    elapsed = time.monotonic() - start
+    assert success, error
+    assert srt_url == '/files/task1.srt'
+    # 完成后立即返回，而不是等到下一个固定的查询间隔
+    assert elapsed < server.process_seconds + 0.5
+    assert client.sse_supported is server.sse
+
+    success, error = client.download_srt_file(srt_url, str(tmp_path / 'out.srt'))
+    assert success, error
+    assert (tmp_path / 'out.srt').read_text(encoding='utf-8') == SRT
+
+    status_polls = [path for method, path in server.requests if path.startswith('/api/nlp/status')]
+    assert len(status_polls) <= 2
+
+
+@pytest.mark.parametrize('server', [False], indirect=True)
+def test_wait_timeout(server):
+    server.process_seconds = 60
+    client = NLPAPIClient(f'http://127.0.0.1:{server.server_address[1]}/api', timeout=10)
+    client.sse_supported = False
+    start = time.monotonic()
+    success, _, error = client.wait_for_completion('task1', max_wait_time=1)
+    assert not success and '超时' in error
+    assert time.monotonic() - start < 2.5
+
+
+@pytest.mark.parametrize('server', [False], indirect=True)
+def test_direct_submit_unsupported_remembered(server, tmp_path):
+    server.direct = False
+    segment_path = tmp_path / 'segment_data.json'
+    segment_path.write_text('[]', encoding='utf-8')
+    client = NLPAPIClient(f'http://127.0.0.1:{server.server_address[1]}/api', timeout=10)
+
+    for _ in range(3):
+        success, _, error = client.submit_nlp_data(str(segment_path), 'zh')
+        assert not success and error
+    assert client.direct_submit_supported is False
+    # 只请求过一次，之后不再尝试
+    assert server.requests == [('POST', '/api/nlp/process_data')]
@@ -0,0 +1,63 @@
+# 转写结果流式解析：按任意大小的数据块输入，结果与整体解析一致，缓冲区大小与文件大小无关
+import json
+import os
+
+import pytest
+
+from app.cloud_asr.result_stream import SentenceStreamParser, iter_stream_segments
+from app.cloud_asr.segment_converter import convert_to_segments
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ta_asr_result.json')
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 8192, 10 ** 7])
+def test_stream_matches_full_parse(chunk_size):
+    with open(FIXTURE, 'rb') as f:
+        raw = f.read()
+    expected = convert_to_segments(json.loads(raw))
+    assert list(iter_stream_segments(split(raw, chunk_size), batch_sentences=3)) == expected
+
+
+def test_multibyte_text_across_chunks():
+    data = {'transcripts': [{'text': '"sentences": [', 'sentences': [
+        {'words': [{'text': '你好', 'punctuation': '，', 'begin_time': 0, 'end_time': 500},
+                   {'text': '世界', 'punctuation': '。', 'begin_time': 500, 'end_time': 900}]},
+    ]}]}
+    raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    assert list(iter_stream_segments(split(raw, 1))) == convert_to_segments(data)
+
+
+def test_buffer_stays_bounded():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    sentences = data['transcripts'][0]['sentences']
+    data['transcripts'][0]['sentences'] = sentences * 50
+    raw = json.dumps(data, indent=4).encode('utf-8')
+    largest_sentence = max(len(json.dumps(sentence, indent=4)) for sentence in sentences)
+
+    parser = SentenceStreamParser()
+    count = 0
+    peak = 0
+    for chunk in split(raw, 4096):
+        count += len(parser.feed(chunk))
+        peak = max(peak, parser.buffered)
+    count += len(parser.close())
+
+    assert count == len(sentences) * 50
+    assert peak < largest_sentence * 2 + 4096
+    assert peak < len(raw) / 100
+
+
+def test_truncated_result_raises():
+    with open(FIXTURE, 'rb') as f:
+        raw = f.read()
+    with pytest.raises(ValueError):
+        list(iter_stream_segments(split(raw[:len(raw) // 2], 4096)))
+
+
+def test_missing_sentences():
+    assert list(iter_stream_segments([b'{"transcripts": []}'])) == []
@@ -0,0 +1,81 @@
+# segment_data紧凑格式：与JSON格式写入的内容一致，无法编码时改写.json文件；在转写结果fixture上比较文件大小
+import json
+import os
+
+import pytest
+
+from app.cloud_asr.segment_converter import convert_to_segments
+from utils.file_utils import write_segment_data_file
+from utils.segment_data import decode_compact, encode_compact
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ta_asr_result.json')
+
+
+def load_segments(repeat: int = 1):
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        segments = convert_to_segments(json.load(f))
+    span = segments[-1]['end'] + 1000
+    result = []
+    for k in range(repeat):
+        shift = k * span
+        for segment in segments:
+            result.append({
+                'text': segment['text'],
+                'timestamp': [[b + shift, e + shift] for b, e in segment['timestamp']],
+                'start': segment['start'] + shift,
+                'end': segment['end'] + shift,
+                'spk': segment['spk'],
+            })
+    return result
+
+
+def test_roundtrip_and_both_formats(tmp_path):
+    segments = load_segments()
+    json_path = tmp_path / 'a_segment_data.json'
+    compact_path = tmp_path / 'a_segment_data.bin'
+    assert write_segment_data_file(segments, str(json_path)) == str(json_path)
+    assert write_segment_data_file(segments, str(compact_path), compact=True) == str(compact_path)
+
+    # 默认的JSON格式与旧版本相同
+    assert json_path.read_text(encoding='utf-8') == json.dumps(segments, ensure_ascii=False, indent=2)
+    assert decode_compact(compact_path.read_bytes()) == segments
+
+
+def test_edge_cases():
+    segments = [
+        {'text': '', 'timestamp': [], 'start': None, 'end': None, 'spk': 0},
+        {'text': '换行\n和emoji 😀', 'timestamp': [[5000, 5200]], 'start': 5000, 'end': 5200, 'spk': 2},
+        # 时间回退（合并结果中偶有出现）也能还原
+        {'text': 'b', 'timestamp': [[4000, 4100], [3900, 4300]], 'start': 3900, 'end': 4300, 'spk': 1},
+    ]
+    assert decode_compact(encode_compact(segments)) == segments
+    assert decode_compact(encode_compact(segments, compress=False)) == segments
+    assert decode_compact(encode_compact([])) == []
+
+
+def test_non_integer_timestamps_fall_back_to_json(tmp_path):
+    segments = [{'text': 'a', 'timestamp': [[0.5, 1.5]], 'start': 0.5, 'end': 1.5, 'spk': 0}]
+    with pytest.raises(ValueError):
+        encode_compact(segments)
+    path = tmp_path / 'float_segment_data.bin'
+    written = write_segment_data_file(segments, str(path), compact=True)
+    assert written == str(tmp_path / 'float_segment_data.json')
+    assert not path.exists()
+    assert json.loads((tmp_path / 'float_segment_data.json').read_text(encoding='utf-8')) == segments
+
+
+def test_compact_size():
+    segments = load_segments(repeat=50)
+    sizes = {}
+    for name, encode, decode in (
+            ('json_indent', lambda s: json.dumps(s, ensure_ascii=False, indent=2).encode('utf-8'), json.loads),
+            ('json_compact', lambda s: json.dumps(s, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+             json.loads),
+            ('columnar_gzip', encode_compact, decode_compact),
+    ):
+        data = encode(segments)
+        assert decode(data) == segments
+        sizes[name] = len(data)
+
+    assert sizes['columnar_gzip'] * 5 < sizes['json_indent']
+    assert sizes['json_compact'] < sizes['json_indent']
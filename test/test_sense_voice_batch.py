@@ -0,0 +1,71 @@
+# SenseVoice 批处理/并行模式与串行模式的耗时对比
+import time
+
+import numpy as np
+import soundfile as sf
+
+from app.listen import SrtWriter
+
+SAMPLE_RATE = 16000
+CALL_COST = 0.02  # 模拟每次模型调用的固定开销（秒）
+ITEM_COST = 0.005  # 模拟每个片段的计算开销（秒）
+
+
+class FakeModel:
+    """模拟FunASR AutoModel.generate，单次调用和批量调用返回相同结构"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.active = 0  # 同一时间正在执行的generate调用数
+
+    def generate(self, input, **kwargs):
+        self.active += 1
+        try:
+            # 共享的AutoModel不是线程安全的，同一个模型不能有并发调用
+            assert self.active == 1
+            return self._generate(input)
+        finally:
+            self.active -= 1
+
+    def _generate(self, input):
+        if self.kind == 'time':
+            audios, texts = input
+            items = list(zip(audios, texts)) if isinstance(audios, list) else [input]
+        else:
+            items = input if isinstance(input, list) else [input]
+        time.sleep(CALL_COST + ITEM_COST * len(items))
+
+        if self.kind == 'asr':
+            # 音频以内存中的单声道采样数组传入，不经过临时文件
+            assert all(isinstance(item, np.ndarray) and item.ndim == 1 for item in items)
+            return [{'text': 'hello world'} for _ in items]
+        if self.kind == 'time':
+            return [{'text': 'hello world', 'timestamp': [[0, 300], [300, 600]]} for _ in items]
+        return [{'text': 'hello world.', 'punc_array': [1, 3]} for _ in items]
+
+
+def _make_writer(tmp_path, max_workers, batch_size):
+    wav_path = tmp_path / 'bench.wav'
+    if not wav_path.exists():
+        sf.write(str(wav_path), np.zeros(SAMPLE_RATE * 60, dtype=np.float32), SAMPLE_RATE)
+    return SrtWriter('bench', str(wav_path), 'bench', 'en', max_workers=max_workers, batch_size=batch_size)
+
+
+def test_sense_voice_batch_vs_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(SrtWriter, 'custom_rich_transcription_postprocess', staticmethod(lambda s: s))
+    models = {'asr': FakeModel('asr'), 'time': FakeModel('time'), 'punc': FakeModel('punc')}
+    segments = [[i * 1000, i * 1000 + 800] for i in range(48)]
+
+    serial_writer = _make_writer(tmp_path, max_workers=1, batch_size=1)
+    start = time.perf_counter()
+    serial = serial_writer._process_audio_segments(segments, models)
+    serial_cost = time.perf_counter() - start
+
+    batch_writer = _make_writer(tmp_path, max_workers=4, batch_size=8)
+    start = time.perf_counter()
+    batched = batch_writer._process_audio_segments(segments, models)
+    batch_cost = time.perf_counter() - start
+
+    assert batched == serial
+    assert [item['start'] for item in batched] == sorted(item['start'] for item in batched)
+    assert batch_cost < serial_cost
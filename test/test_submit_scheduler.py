@@ -0,0 +1,69 @@
+# 云ASR提交调度：40个任务并行上传提交，并发数不超过上限；任务结束时通过Future通知等待方
+import threading
+import time
+
+import pytest
+
+from app.cloud_asr.submit_scheduler import CompletionRegistry, SubmissionScheduler
+
+
+def test_batch_submitted_concurrently():
+    state = {'active': 0, 'max_active': 0}
+    lock = threading.Lock()
+
+    def submit(task_id):
+        with lock:
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+        time.sleep(0.05)  # 模拟上传和提交
+        with lock:
+            state['active'] -= 1
+        return task_id
+
+    scheduler = SubmissionScheduler(submit, max_concurrency=8)
+    start = time.monotonic()
+    futures = [scheduler.schedule(f'task{i}') for i in range(40)]
+    # 调用方不会被上传阻塞
+    assert time.monotonic() - start < 0.05
+    assert [future.result(5) for future in futures] == [f'task{i}' for i in range(40)]
+    elapsed = time.monotonic() - start
+    scheduler.shutdown()
+
+    assert state['max_active'] == 8
+    assert elapsed < 40 * 0.05 / 2
+    assert scheduler.pending_count() == 0
+
+
+def test_duplicate_schedule_and_errors():
+    release = threading.Event()
+
+    def submit(task_id):
+        release.wait(5)
+        if task_id == 'bad':
+            raise ConnectionError('上传失败')
+
+    scheduler = SubmissionScheduler(submit, max_concurrency=2)
+    first = scheduler.schedule('task')
+    assert scheduler.schedule('task') is first
+    bad = scheduler.schedule('bad')
+    release.set()
+
+    first.result(5)
+    with pytest.raises(ConnectionError):
+        bad.result(5)
+    scheduler.shutdown()
+
+
+def test_completion_registry_wakes_waiters():
+    registry = CompletionRegistry()
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(registry.future('task').result(5))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    registry.resolve('task', 'COMPLETED')
+    for waiter in waiters:
+        waiter.join(5)
+    assert results == ['COMPLETED'] * 3
+    # 已结束的任务再次等待时拿到新的Future，由调用方检查状态后设置
+    assert not registry.future('task').done()
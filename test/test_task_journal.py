@@ -0,0 +1,79 @@
+# 云ASR任务状态日志：追加写入 vs 每次更新重写全部任务
+import json
+import time
+
+from app.cloud_asr.task_journal import TaskJournal
+
+TASKS = 300
+UPDATES = 20
+
+
+def _task(i, progress=0, status="RUNNING", updated_at=None):
+    return {"task_id": f"task{i}", "audio_file": f"/data/audio{i}.wav", "language": "zh",
+            "status": status, "progress": progress, "created_at": 0.0, "updated_at": updated_at or time.time()}
+
+
+def test_journal_write_cost_independent_of_task_count(tmp_path):
+    tasks = {f"task{i}": _task(i) for i in range(TASKS)}
+
+    # 旧实现：每次更新重写全部任务
+    legacy_file = tmp_path / "asr_tasks.json"
+    start = time.perf_counter()
+    for progress in range(UPDATES):
+        tasks["task0"] = _task(0, progress)
+        with open(legacy_file, "w", encoding="utf-8") as f:
+            json.dump(list(tasks.values()), f, ensure_ascii=False, indent=2)
+    legacy_cost = time.perf_counter() - start
+
+    journal = TaskJournal(tmp_path / "asr_tasks.jsonl", flush_interval=0)
+    journal.load(legacy_file=legacy_file)
+    start = time.perf_counter()
+    for progress in range(UPDATES):
+        journal.record(_task(0, progress))
+    journal_cost = time.perf_counter() - start
+    print(f"全量重写: {legacy_cost * 1000 / UPDATES:.2f}ms/次, 追加日志: {journal_cost * 1000 / UPDATES:.3f}ms/次")
+
+    assert (tmp_path / "asr_tasks.json.bak").exists() and not legacy_file.exists()
+    assert journal_cost < legacy_cost
+    reloaded = TaskJournal(tmp_path / "asr_tasks.jsonl").load()
+    assert len(reloaded) == TASKS and reloaded["task0"]["progress"] == UPDATES - 1
+
+
+def test_journal_debounce_compaction_and_retention(tmp_path):
+    path = tmp_path / "asr_tasks.jsonl"
+    journal = TaskJournal(path, flush_interval=0.05, compact_min_lines=10)
+    journal.load()
+    for progress in range(100):
+        journal.record(_task(1, progress))
+    journal.record(_task(2, 100, "COMPLETED", updated_at=time.time() - 30 * 24 * 3600))
+    journal.close()
+
+    # 刷新间隔内的多次更新合并为一次写入
+    assert journal.writes <= 3
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"task_id": "task1", "progr')  # 模拟写了一半的最后一行
+
+    reloaded = TaskJournal(path, retention_days=7)
+    state = reloaded.load()
+    assert state["task1"]["progress"] == 99
+    assert "task2" not in state
+    # 过期任务和损坏的行在加载时通过压缩清理
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+    for progress in range(50):
+        reloaded.record(_task(3, progress))
+        reloaded.flush()
+    assert len(path.read_text(encoding="utf-8").splitlines()) <= reloaded.compact_min_lines + 1
+
+
+def test_journal_finished_status_written_immediately(tmp_path):
+    path = tmp_path / "asr_tasks.jsonl"
+    journal = TaskJournal(path, flush_interval=60)
+    journal.load()
+    journal.record(_task(1, 10))
+    assert not path.exists()
+
+    # 终态不等待后台线程，程序随后退出也不会丢失
+    journal.record(_task(1, 100, "COMPLETED"))
+    assert TaskJournal(path).load()["task1"]["status"] == "COMPLETED"
+    journal.close()
@@ -0,0 +1,81 @@
+# 任务流水线：不同任务的 提取/识别/翻译 阶段重叠执行，单个任务内的进度信号顺序不变
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+from nice_ui.task.task_pipeline import STAGE_ASR, STAGE_EXTRACT, STAGE_TRANSLATE, TaskPipeline
+
+STAGE_COST = 0.05
+
+
+class FakeProcessor:
+    """模拟ASR+翻译任务，每个阶段固定耗时，并记录进度信号"""
+
+    stages = (STAGE_EXTRACT, STAGE_ASR, STAGE_TRANSLATE)
+
+    def __init__(self, events, lock):
+        self.events = events
+        self.lock = lock
+
+    def _run(self, task, stage):
+        with self.lock:
+            self.events.append((task.unid, f'{stage}_start'))
+        time.sleep(STAGE_COST)
+        with self.lock:
+            self.events.append((task.unid, f'{stage}_finished'))
+
+    def extract_audio(self, task):
+        self._run(task, STAGE_EXTRACT)
+
+    def recognize(self, task):
+        if task.unid == 'fail':
+            raise RuntimeError('识别失败')
+        self._run(task, STAGE_ASR)
+
+    def translate(self, task):
+        self._run(task, STAGE_TRANSLATE)
+
+
+def _make_queue(unids):
+    source = queue.Queue()
+    for unid in unids:
+        source.put(SimpleNamespace(unid=unid, work_type=3))
+    return source
+
+
+def test_pipeline_overlaps_stages():
+    events, lock = [], threading.Lock()
+    unids = [f'task{i}' for i in range(6)]
+
+    def run(workers):
+        events.clear()
+        pipeline = TaskPipeline(lambda work_type: FakeProcessor(events, lock),
+                                stage_workers={name: workers for name in (STAGE_EXTRACT, STAGE_ASR, STAGE_TRANSLATE)},
+                                queue_size=2)
+        start = time.perf_counter()
+        pipeline.run(_make_queue(unids))
+        return time.perf_counter() - start, pipeline
+
+    # 每个阶段一个线程也能重叠，约 (任务数+阶段数-1) 个阶段耗时
+    pipeline_cost, pipeline = run(1)
+    serial_cost = STAGE_COST * 3 * len(unids)
+    print(f"串行估计: {serial_cost:.2f}s, 流水线: {pipeline_cost:.2f}s")
+    assert pipeline.completed == len(unids)
+    assert pipeline_cost < serial_cost * 0.7
+
+    expected = [f'{stage}_{state}' for stage in (STAGE_EXTRACT, STAGE_ASR, STAGE_TRANSLATE)
+                for state in ('start', 'finished')]
+    for unid in unids:
+        assert [name for task_unid, name in events if task_unid == unid] == expected
+
+
+def test_pipeline_failed_task_skips_later_stages():
+    events, lock = [], threading.Lock()
+    pipeline = TaskPipeline(lambda work_type: FakeProcessor(events, lock),
+                            stage_workers={STAGE_EXTRACT: 1, STAGE_ASR: 1, STAGE_TRANSLATE: 1}, queue_size=1)
+    pipeline.run(_make_queue(['ok1', 'fail', 'ok2']))
+
+    assert pipeline.completed == 2 and pipeline.failed == 1
+    assert ('fail', f'{STAGE_TRANSLATE}_start') not in events
+    assert ('ok2', f'{STAGE_TRANSLATE}_finished') in events
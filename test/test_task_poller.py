@@ -0,0 +1,97 @@
+# 云ASR轮询：模拟Transcription.fetch，验证并发上限、退避和后处理不阻塞状态查询
+import threading
+import time
+from types import SimpleNamespace
+
+from app.cloud_asr.task_poller import TranscriptionPoller
+
+
+class FakeTranscription:
+    """模拟DashScope Transcription，任务在提交后finish_after秒完成"""
+
+    def __init__(self, fetch_cost=0.01):
+        self.fetch_cost = fetch_cost
+        self.tasks = {}
+        self.calls = {}
+        self.finished_at = {}  # 查询到任务结束的时间
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def async_call(self, task_id, finish_after, status='SUCCEEDED'):
+        self.tasks[task_id] = (time.monotonic() + finish_after, status)
+        return SimpleNamespace(output=SimpleNamespace(task_id=task_id, task_status='PENDING'))
+
+    def fetch(self, task):
+        task_id = task.output.task_id
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls[task_id] = self.calls.get(task_id, 0) + 1
+        time.sleep(self.fetch_cost)
+        with self.lock:
+            self.active -= 1
+        finish_at, status = self.tasks[task_id]
+        if time.monotonic() < finish_at:
+            status = 'RUNNING'
+        elif task_id not in self.finished_at:
+            self.finished_at[task_id] = time.monotonic()
+        return SimpleNamespace(output=SimpleNamespace(task_id=task_id, task_status=status))
+
+
+def test_poller_concurrency_backoff_and_post_processing():
+    transcription = FakeTranscription()
+    finished, failed, done_at = [], [], {}
+    all_done = threading.Event()
+
+    def on_succeeded(key, response):
+        if key == 'slow':
+            time.sleep(0.5)  # 模拟下载结果和生成字幕耗时较长
+        done_at[key] = time.monotonic()
+        finished.append(key)
+        if len(finished) + len(failed) == 12:
+            all_done.set()
+
+    def on_failed(key, response):
+        failed.append(key)
+        if len(finished) + len(failed) == 12:
+            all_done.set()
+
+    poller = TranscriptionPoller(transcription.fetch, lambda key, response: None, on_succeeded, on_failed,
+                                 max_concurrency=3, min_interval=0.02, max_interval=0.2, first_poll_ratio=0.01)
+    start = time.monotonic()
+    poller.add('slow', transcription.async_call('slow', 0.05), duration=2)
+    poller.add('failed', transcription.async_call('failed', 0.1, status='FAILED'), duration=2)
+    for i in range(10):
+        poller.add(f'task{i}', transcription.async_call(f'task{i}', 0.2 + i * 0.05), duration=20)
+
+    assert all_done.wait(10)
+    poller.stop()
+
+    assert failed == ['failed'] and len(finished) == 11
+    assert transcription.max_active <= 3
+    # 慢任务的后处理在单独线程中执行，期间其他任务的状态查询照常进行
+    assert sum(transcription.finished_at[f'task{i}'] < done_at['slow'] for i in range(10)) >= 3
+    # 指数退避：长任务的查询次数远少于按最小间隔查询
+    longest = 0.2 + 9 * 0.05
+    assert transcription.calls['task9'] < longest / 0.02 / 2
+    print(f"总耗时: {time.monotonic() - start:.2f}s, 查询次数: {poller.total_polls}, 最大并发: {transcription.max_active}")
+
+
+def test_poller_retries_fetch_errors():
+    transcription = FakeTranscription(fetch_cost=0)
+    errors = {'count': 0}
+    done = threading.Event()
+
+    def flaky_fetch(handle):
+        if errors['count'] < 2:
+            errors['count'] += 1
+            raise ConnectionError('网络错误')
+        return transcription.fetch(handle)
+
+    poller = TranscriptionPoller(flaky_fetch, lambda key, response: None, lambda key, response: done.set(),
+                                 lambda key, response: None, min_interval=0.01, max_interval=0.05)
+    poller.add('task', transcription.async_call('task', 0))
+    assert done.wait(5)
+    poller.stop()
+    assert poller.pending_count() == 0
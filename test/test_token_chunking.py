@@ -0,0 +1,131 @@
+# 按token预算切分翻译块：中英文token估算，块的输出不超过模型限制，块的行数不超过max_lines，校验失败时拆分重试并缩小之后切分的块
+from agent.enhanced_common_agent import DocumentTranslator
+from agent.srt_translator_adapter import SRTEntry, SRTTranslatorAdapter
+from agent.token_budget import ChunkBudget, ChunkTuner, create_chunk_budget, estimate_tokens
+from agent import enhanced_common_agent, token_budget
+from utils.agent_dict import AgentConfig
+
+
+def _entries(texts):
+    return [SRTEntry(i + 1, '00:00:00,000', '00:00:01,000', text, f'{i + 1}\n00:00:00,000 --> 00:00:01,000')
+            for i, text in enumerate(texts)]
+
+
+def _srt(texts):
+    return '\n\n'.join(f'{i + 1}\n00:00:{i % 60:02d},000 --> 00:00:{i % 60:02d},500\n{text}'
+                       for i, text in enumerate(texts)) + '\n'
+
+
+ENGLISH = [f'This is subtitle line number {i}, and it says something fairly ordinary.' for i in range(300)]
+CHINESE = ['这是一行比较长的中文字幕，用来测试按照token数量切分翻译块的效果，每个汉字大约是一个token。' * 2
+           for _ in range(300)]
+
+
+def test_estimate_cjk_and_latin():
+    english = 'The quick brown fox jumps over the lazy dog.'
+    chinese = '敏捷的棕色狐狸跳过了那只懒狗。'
+    assert 8 <= estimate_tokens(english) <= 14
+    assert 12 <= estimate_tokens(chinese) <= 18
+    # 字符数相近时中文的token数远多于英文
+    assert estimate_tokens('一' * 40) > 3 * estimate_tokens('a word ' * 6)
+    assert estimate_tokens('') == 0
+
+
+def test_chunks_fill_budget_without_exceeding_output():
+    budget = ChunkBudget(context_tokens=65536, max_output_tokens=8192, prompt_overhead=1500)
+    adapter = SRTTranslatorAdapter()
+    old_chunks = adapter.split_entries_into_chunks(_entries(ENGLISH), 600, 10)
+
+    for texts in (ENGLISH, CHINESE):
+        chunks = adapter.split_entries_into_chunks(_entries(texts), budget=budget)
+        assert sum(len(chunk) for chunk in chunks) == len(texts)
+        for chunk in chunks:
+            costs = [budget.line_cost(entry.text) for entry in chunk]
+            assert sum(output for _, output in costs) <= budget.output_limit or len(chunk) == 1
+            assert sum(input_ for input_, _ in costs) <= budget.input_limit
+            assert len(chunk) <= budget.max_lines
+        print(f"{texts[0][:4]}: {len(chunks)}块, 每块{len(texts) / len(chunks):.0f}行")
+        if texts is ENGLISH:
+            # 更少、更满的请求
+            assert len(chunks) * 3 < len(old_chunks)
+
+    # 中文每行token更多，块的行数更少
+    chinese_chunks = adapter.split_entries_into_chunks(_entries(CHINESE), budget=budget)
+    english_chunks = adapter.split_entries_into_chunks(_entries(ENGLISH), budget=budget)
+    assert len(chinese_chunks) > len(english_chunks)
+
+
+def test_small_model_limits():
+    agent = AgentConfig(base_url='http://stub/v1', model='moonshot-v1-8k', key='sk')
+    budget = create_chunk_budget(agent, prompt_overhead=1500, scale=1.0)
+    assert (budget.context_tokens, budget.max_output_tokens) == (8192, 4096)
+    chunks = SRTTranslatorAdapter.split_entries_into_chunks(_entries(CHINESE), budget=budget)
+    assert all(sum(budget.line_cost(e.text)[1] for e in chunk) <= budget.output_limit for chunk in chunks)
+    # 缩小系数后块更小
+    smaller = SRTTranslatorAdapter.split_entries_into_chunks(_entries(CHINESE), budget=create_chunk_budget(
+        agent, prompt_overhead=1500, scale=0.5))
+    assert len(smaller) > len(chunks)
+
+
+def test_tuner_adapts():
+    tuner = ChunkTuner(target_latency=10)
+    assert tuner.record_failure() == 0.7
+    assert tuner.record_success(20) == 0.35
+    for _ in range(50):
+        tuner.record_success(1)
+    assert tuner.scale == 1.0
+    for _ in range(20):
+        tuner.record_failure()
+    assert tuner.scale == tuner.min_scale
+
+
+class FlakyTranslator:
+    """超过4行的块返回漏行的结果"""
+    terminology_manager = None
+
+    def __init__(self):
+        self.calls = []
+
+    def translate_lines(self, lines, previous, after, note, theme, index, line_offset=0):
+        self.calls.append((index, line_offset, len(lines.split('\n'))))
+        if len(lines.split('\n')) > 4:
+            raise ValueError('Fused translation length mismatch')
+        return '\n'.join(f'译 {line}' for line in lines.split('\n')), lines
+
+
+def test_failed_chunk_split_and_retried():
+    translator = DocumentTranslator('fake')
+    translator._prepare_translation_data(_srt(ENGLISH[:12]), chunk_size=100000, max_entries=12)
+    translator.translator = FlakyTranslator()
+    translator.theme_prompt = ''
+    translator.chunk_tuner = ChunkTuner()
+
+    results = translator._translate_chunks('unid0001', 1)
+    lines = translator._match_translations_to_entries(results)
+
+    assert lines == [f'译 {text}' for text in ENGLISH[:12]]
+    # 12行 -> 6+6 -> 3+3+3+3
+    assert [call for call in translator.translator.calls if call[2] == 3] == [(0, 0, 3), (0, 3, 3), (0, 6, 3), (0, 9, 3)]
+    assert translator.chunk_tuner.scale < 1.0
+
+
+class OverheadTranslator:
+    def prompt_overhead_tokens(self, summary, notes):
+        return 1000
+
+
+def test_token_chunks_capped_by_max_lines(monkeypatch):
+    monkeypatch.setattr(enhanced_common_agent, 'get_target_multiplier', lambda: 1.2)
+    monkeypatch.setattr(token_budget, 'get_token_chunking_config', lambda: {'max_lines': 15})
+    agent = AgentConfig(base_url='http://stub/v1', model='qwen-plus', key='sk')
+    translator = DocumentTranslator('fake')
+    # 按token预算切分时max_entries不再限制行数
+    translator._prepare_translation_data(_srt(ENGLISH), chunk_size=100000, max_entries=5)
+    translator.translator = OverheadTranslator()
+    translator.theme_prompt = ''
+
+    translator._split_by_token_budget(agent)
+
+    chunks = translator.compat_data['entry_chunks']
+    assert sum(len(chunk) for chunk in chunks) == len(ENGLISH)
+    assert max(len(chunk) for chunk in chunks) == 15
@@ -0,0 +1,128 @@
+# 文档翻译断点：中途失败后重新添加同一个文件的任务（新的任务ID和输出目录），只请求未完成的块，
+# 重启后按原来的方式切分；其他API配置的断点不复用，过期断点被清理
+import os
+import time
+
+import pytest
+
+from agent import enhanced_common_agent
+from agent.enhanced_common_agent import DocumentTranslator
+from agent.translation_checkpoint import CHECKPOINT_SUFFIX, prune_checkpoints
+from nice_ui.task import WORK_TYPE
+from nice_ui.util.tools import format_job_msg
+from utils.agent_dict import AgentConfig
+
+
+def _make_srt(count):
+    return "\n\n".join(f"{i + 1}\n00:00:{i % 60:02d},000 --> 00:00:{i % 60:02d},900\nline {i} of the subtitle"
+                       for i in range(count)) + "\n"
+
+
+class FakeTranslator:
+    terminology_manager = None
+
+    def __init__(self, fail_index=None, model='stub'):
+        self.fail_index = fail_index
+        self.calls = []
+        self.agent = AgentConfig(base_url='http://stub/v1', model=model, key='sk')
+
+    def memory_scope(self):
+        return {'source_language': 'English', 'target_language': '中文', 'model': self.agent.model,
+                'prompt_version': '1-fused'}
+
+    def translate_lines(self, lines, previous, after, note, theme, index, line_offset=0):
+        self.calls.append(index)
+        if index == self.fail_index:
+            raise RuntimeError('API error after retries')
+        return "\n".join(f"译文 {line}" for line in lines.split("\n")), lines
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.srt'
+    path.write_text(_make_srt(60), encoding='utf-8')
+    return path
+
+
+def _checkpoints(tmp_path):
+    return list((tmp_path / 'checkpoints').glob(f'*{CHECKPOINT_SUFFIX}'))
+
+
+def _run(tmp_path, source, translator, max_entries=5):
+    """和界面添加翻译任务一样，每次用format_job_msg生成新的任务ID和输出路径"""
+    job = format_job_msg(source.as_posix(), tmp_path / 'result', WORK_TYPE.TRANS)
+    srt_content = source.read_text(encoding='utf-8')
+    document = DocumentTranslator('fake')
+    document._prepare_translation_data(srt_content, chunk_size=600, max_entries=max_entries)
+    document.translator = translator
+    document.theme_prompt = ''
+    document._open_checkpoint(srt_content, str(tmp_path / 'checkpoints'))
+    results = document._translate_chunks(job.unid, 2)
+    lines = document._match_translations_to_entries(results)
+    document._save_translated_srt(lines, job.srt_dirname)
+    document.checkpoint.remove()
+    return document, lines, job
+
+
+@pytest.fixture(autouse=True)
+def no_signals(monkeypatch):
+    monkeypatch.setattr(enhanced_common_agent.data_bridge, 'emit_whisper_working', lambda *args: None)
+    monkeypatch.setattr(enhanced_common_agent.data_bridge, 'emit_translation_line', lambda *args: None)
+
+
+def test_new_task_resumes_missing_chunks(tmp_path, source):
+    failing = FakeTranslator(fail_index=7)
+    with pytest.raises(RuntimeError):
+        _run(tmp_path, source, failing)
+    assert len(_checkpoints(tmp_path)) == 1
+    finished_before = set(failing.calls) - {7}
+
+    # 重新添加任务：任务ID和输出目录都是新的，切分参数变了也按断点中的方式切分
+    time.sleep(0.01)
+    retry = FakeTranslator()
+    document, lines, job = _run(tmp_path, source, retry, max_entries=8)
+
+    assert len(document.compat_data['entry_chunks']) == 12
+    assert 7 in retry.calls
+    assert not finished_before & set(retry.calls)
+    assert lines == [f"译文 line {i} of the subtitle" for i in range(60)]
+    assert os.path.exists(job.srt_dirname)
+    assert not _checkpoints(tmp_path)
+
+
+def test_other_agent_checkpoint_not_reused(tmp_path, source):
+    with pytest.raises(RuntimeError):
+        _run(tmp_path, source, FakeTranslator(fail_index=3))
+
+    other = FakeTranslator(model='other')
+    document, _, _ = _run(tmp_path, source, other, max_entries=8)
+    assert sorted(other.calls) == list(range(len(document.compat_data['entry_chunks'])))
+    assert len(document.compat_data['entry_chunks']) == 8
+    # 原模型的断点保留，换回原模型时仍可继续
+    assert len(_checkpoints(tmp_path)) == 1
+
+
+def test_truncated_last_line_ignored(tmp_path, source):
+    with pytest.raises(RuntimeError):
+        _run(tmp_path, source, FakeTranslator(fail_index=11))
+    path, = _checkpoints(tmp_path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "chunk", "hash": "abc", "transla')
+
+    retry = FakeTranslator()
+    _, lines, _ = _run(tmp_path, source, retry)
+    assert 11 in retry.calls and len(retry.calls) < 12
+    assert lines[59] == "译文 line 59 of the subtitle"
+
+
+def test_prune_expired_checkpoints(tmp_path):
+    directory = tmp_path / 'checkpoints'
+    directory.mkdir()
+    old, new = directory / f'old{CHECKPOINT_SUFFIX}', directory / f'new{CHECKPOINT_SUFFIX}'
+    old.write_text('{}\n')
+    new.write_text('{}\n')
+    stale = time.time() - 8 * 86400
+    os.utime(old, (stale, stale))
+
+    assert prune_checkpoints(directory) == 1
+    assert not old.exists() and new.exists()
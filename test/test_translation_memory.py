@@ -0,0 +1,60 @@
+# 翻译记忆：全部命中跳过API，部分命中只发送未命中的行
+from agent import translator as translator_module
+from agent.translation_memory import TranslationMemory
+from agent.translator import Translator
+from utils.agent_dict import AgentConfig
+
+
+def _make_translator(tmp_path, monkeypatch, calls):
+    monkeypatch.setattr(translator_module, "get_translation_memory", lambda: None)
+    translator = Translator(AgentConfig(base_url="http://stub/v1", model="stub", key="sk"), "中文", "English")
+    translator.translation_memory = TranslationMemory(tmp_path / "tm.db", max_entries=100)
+
+    def fake_llm(self, lines, *args):
+        calls.append(lines.split("\n"))
+        return "\n".join(f"译:{line}" for line in lines.split("\n")), lines
+
+    monkeypatch.setattr(Translator, "_translate_lines_with_llm", fake_llm)
+    return translator
+
+
+def test_translation_memory_hits_and_partial_misses(tmp_path, monkeypatch):
+    calls = []
+    translator = _make_translator(tmp_path, monkeypatch, calls)
+    chunk = "Previously on the show\nhello\nworld"
+
+    assert translator.translate_lines(chunk, None, None, "", "")[0] == "译:Previously on the show\n译:hello\n译:world"
+    assert len(calls) == 1
+
+    # 全部命中，不请求API
+    assert translator.translate_lines(chunk, None, None, "", "")[0] == "译:Previously on the show\n译:hello\n译:world"
+    assert len(calls) == 1
+
+    # 部分命中，只发送未命中的行，结果按原顺序合并
+    result, _ = translator.translate_lines("Previously on the show\nnew line\nworld", None, None, "", "")
+    assert result == "译:Previously on the show\n译:new line\n译:world"
+    assert calls[-1] == ["new line"]
+
+    stats = translator.translation_memory.stats()
+    assert stats["hits"] == 5 and stats["misses"] == 4 and stats["skipped_chunks"] == 1
+
+    # 目标语言不同时不能复用
+    translator.target_language = "日本語"
+    translator.translate_lines(chunk, None, None, "", "")
+    assert len(calls) == 3
+
+
+def test_translation_memory_lru_eviction(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.db", max_entries=10)
+    scope = dict(source_language="en", target_language="zh", model="m", prompt_version="1")
+    memory.store([f"line {i}" for i in range(10)], [f"译 {i}" for i in range(10)], **scope)
+    memory.lookup(["line 0"], **scope)
+    memory.store(["line 10"], ["译 10"], **scope)
+
+    assert memory.stats()["entries"] <= 10
+    # 刚使用过的条目保留，最久未使用的被删除
+    assert memory.lookup(["line 0", "line 10", "line 1"], **scope) == ["译 0", "译 10", None]
+
+    # 持久化，重新打开后仍然命中
+    memory.close()
+    assert TranslationMemory(tmp_path / "tm.db").lookup(["line 0"], **scope) == ["译 0"]
@@ -0,0 +1,46 @@
+# OSS上传索引：内容相同的文件复用已上传的对象，过期后重新上传
+import time
+
+from app.cloud_asr import upload_index as upload_index_module
+from app.cloud_asr.upload_index import UploadIndex
+
+
+def test_reuse_by_content_hash(tmp_path):
+    index = UploadIndex(tmp_path / 'index.json')
+    first = tmp_path / 'a_segment_data.json'
+    second = tmp_path / 'b_segment_data.json'
+    first.write_bytes(b'{"segments": []}' * 1000)
+    second.write_bytes(first.read_bytes())
+
+    digest = index.content_hash(str(first))
+    assert index.lookup(digest) is None
+    index.record(digest, 'nlp_segments/1_a_segment_data.json', first.stat().st_size, expires=24 * 3600)
+
+    # 内容相同的另一个文件命中同一个对象
+    assert index.content_hash(str(second)) == digest
+    assert index.lookup(digest) == 'nlp_segments/1_a_segment_data.json'
+    assert index.mark_reused(digest) == first.stat().st_size
+
+    # 重新加载后仍然有效
+    reloaded = UploadIndex(tmp_path / 'index.json')
+    assert reloaded.lookup(digest) == 'nlp_segments/1_a_segment_data.json'
+    assert reloaded.stats()['bytes_saved'] == first.stat().st_size
+
+
+def test_expiring_entries_are_not_reused(tmp_path, monkeypatch):
+    index = UploadIndex(tmp_path / 'index.json')
+    index.record('digest', 'audio/a.wav', 100, expires=2 * 3600)
+    assert index.lookup('digest') == 'audio/a.wav'
+
+    # 剩余有效期不足时重新上传
+    now = time.time()
+    monkeypatch.setattr(upload_index_module.time, 'time', lambda: now + 1.5 * 3600)
+    assert index.lookup('digest') is None
+    assert index.stats()['entries'] == 0
+
+
+def test_invalidate(tmp_path):
+    index = UploadIndex(tmp_path / 'index.json')
+    index.record('digest', 'audio/a.wav', 100, expires=24 * 3600)
+    index.invalidate('digest')
+    assert index.lookup('digest') is None
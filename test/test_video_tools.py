@@ -0,0 +1,67 @@
+# convert_mp4_to_wav 吞吐量对比：旧版双声道直接编码 vs 重采样为16kHz单声道
+import time
+from pathlib import Path
+
+import av
+import numpy as np
+import soundfile as sf
+
+from app.video_tools import FFmpegJobs
+
+DURATION_S = 120
+
+
+def _make_source(path: Path):
+    """生成44.1kHz双声道AAC的合成音频"""
+    rate = 44100
+    with av.open(str(path), 'w') as container:
+        stream = container.add_stream('aac', rate=rate, layout='stereo')
+        t = np.arange(rate * DURATION_S) / rate
+        samples = (np.sin(2 * np.pi * 440 * t) * 0.3).astype(np.float32)
+        planar = np.stack([samples, samples])
+        for i in range(0, planar.shape[1], 1024):
+            frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(planar[:, i:i + 1024]), format='fltp', layout='stereo')
+            frame.sample_rate = rate
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode(None))
+
+
+def _legacy_convert_mp4_to_wav(input_path, output_path):
+    """优化前的实现：双声道pcm_s16le，不显式重采样"""
+    with av.open(str(input_path)) as input_container:
+        with av.open(str(output_path), 'w') as output_container:
+            output_stream = output_container.add_stream('pcm_s16le', rate=16000, layout='stereo')
+            input_stream = input_container.streams.audio[0]
+            input_stream.codec_context.skip_frame = 'NONKEY'
+            for frame in input_container.decode(input_stream):
+                frame.pts = None
+                output_container.mux(output_stream.encode(frame))
+            output_container.mux(output_stream.encode(None))
+
+
+def test_convert_mp4_to_wav_throughput(tmp_path):
+    source = tmp_path / 'source.m4a'
+    _make_source(source)
+
+    legacy_wav = tmp_path / 'legacy.wav'
+    start = time.perf_counter()
+    _legacy_convert_mp4_to_wav(source, legacy_wav)
+    legacy_cost = time.perf_counter() - start
+
+    mono_wav = tmp_path / 'mono.wav'
+    start = time.perf_counter()
+    assert FFmpegJobs.convert_mp4_to_wav(source, mono_wav)
+    mono_cost = time.perf_counter() - start
+
+    flac = tmp_path / 'mono.flac'
+    assert FFmpegJobs.convert_audio(source, flac)
+
+    legacy_size, mono_size, flac_size = (p.stat().st_size for p in (legacy_wav, mono_wav, flac))
+    print(f"旧版: {legacy_cost:.2f}s {legacy_size / 1024:.0f}KB, 新版: {mono_cost:.2f}s {mono_size / 1024:.0f}KB, "
+          f"FLAC: {flac_size / 1024:.0f}KB, 实时倍率 {DURATION_S / mono_cost:.0f}x")
+
+    info = sf.info(str(mono_wav))
+    assert info.samplerate == 16000 and info.channels == 1
+    assert abs(info.duration - DURATION_S) < 0.5
+    assert mono_size < legacy_size * 0.6
+    assert flac_size < mono_size
@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 from typing import List, Dict, Union, Any
 
@@ -55,15 +56,20 @@ def funasr_write_txt_file(segments, txt_file_path):
         txt_file.write(segments)
 
 
-def write_segment_data_file(segments, segment_data_file_path):
+def write_segment_data_file(segments, segment_data_file_path, compact: bool = False) -> str:
     """
     将 segments 数据写入 segment_data 文件，用于 NLP 任务
 
     Args:
         segments: FunASR 输出的句子信息列表
         segment_data_file_path: segment_data 文件路径
+        compact: 使用紧凑格式（见 utils.segment_data），时间戳无法用紧凑格式保存时改为写入同名的.json文件
+
+    Returns:
+        str: 实际写入的文件路径
     """
     import json
+    from utils.segment_data import encode_compact
 
     # 确保数据格式适合 NLP 处理
     segment_data = []
@@ -78,11 +84,23 @@ def write_segment_data_file(segments, segment_data_file_path):
         }
         segment_data.append(data_item)
 
+    if compact:
+        try:
+            data = encode_compact(segment_data)
+            with open(segment_data_file_path, "wb") as f:
+                f.write(data)
+            logger.info(f"已写入紧凑格式 segment_data 文件: {segment_data_file_path}, 包含 {len(segment_data)} 个片段")
+            return segment_data_file_path
+        except ValueError as e:
+            segment_data_file_path = f"{os.path.splitext(segment_data_file_path)[0]}.json"
+            logger.warning(f"无法使用紧凑格式写入 segment_data，改为JSON: {segment_data_file_path}, {str(e)}")
+
     # 写入 JSON 格式的文件
     with open(segment_data_file_path, "w", encoding="utf-8") as f:
         json.dump(segment_data, f, ensure_ascii=False, indent=2)
 
     logger.info(f"已写入 segment_data 文件: {segment_data_file_path}, 包含 {len(segment_data)} 个片段")
+    return segment_data_file_path
 
 
 def funasr_format_time(seconds):
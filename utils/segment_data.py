@@ -0,0 +1,141 @@
+"""
+segment_data 紧凑格式
+长音频的segment_data用JSON保存时每个词一个[start, end]列表，文件可达几十MB。紧凑格式按列保存：
+
+    MAGIC(4) | 版本(1) | 压缩方式(1) | 内容
+    内容 = 计数(segments, words, 文本字节数, 各3个uint32)
+           | 每句词数 | 开始时间 | 结束时间 | 说话人 | 每句文本字节数   (各int32 × segments)
+           | 词时间戳与前一个值的差值 (int32 × words × 2)
+           | 所有句子的utf-8文本拼接
+
+服务端按文件头区分格式（is_compact），旧的JSON文件照常处理；decode_compact是格式的参考解码实现
+"""
+import gzip
+import struct
+from typing import Any, Dict, List
+
+import numpy as np
+
+MAGIC = b'LTSD'
+VERSION = 1
+CODEC_RAW = 0
+CODEC_GZIP = 1
+
+# 开始/结束时间为None时保存的值
+MISSING = np.iinfo(np.int32).min
+_INT32_MAX = np.iinfo(np.int32).max
+
+_COUNTS = struct.Struct('<III')
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def encode_compact(segments: List[Dict[str, Any]], compress: bool = True) -> bytes:
+    """
+    把segments编码为紧凑格式
+
+    Raises:
+        ValueError: 时间戳不是整数毫秒或超出int32范围，无法用紧凑格式保存
+    """
+    count = len(segments)
+    word_counts = np.empty(count, dtype='<i4')
+    starts = np.empty(count, dtype='<i4')
+    ends = np.empty(count, dtype='<i4')
+    speakers = np.empty(count, dtype='<i4')
+    text_lengths = np.empty(count, dtype='<i4')
+    flat_times = []
+    texts = []
+
+    for i, segment in enumerate(segments):
+        timestamp = segment.get('timestamp') or []
+        for pair in timestamp:
+            if len(pair) != 2 or not _is_int(pair[0]) or not _is_int(pair[1]):
+                raise ValueError(f"第{i}句的时间戳不是整数毫秒: {pair}")
+            flat_times.extend(pair)
+        word_counts[i] = len(timestamp)
+
+        for column, key in ((starts, 'start'), (ends, 'end')):
+            value = segment.get(key)
+            if value is None:
+                column[i] = MISSING
+            elif _is_int(value) and MISSING < value <= _INT32_MAX:
+                column[i] = value
+            else:
+                raise ValueError(f"第{i}句的{key}不是整数毫秒: {value}")
+        speaker = segment.get('spk', 0)
+        if not _is_int(speaker):
+            raise ValueError(f"第{i}句的spk不是整数: {speaker}")
+        speakers[i] = speaker
+
+        text = (segment.get('text') or '').encode('utf-8')
+        text_lengths[i] = len(text)
+        texts.append(text)
+
+    times = np.asarray(flat_times, dtype=np.int64)
+    deltas = np.diff(times, prepend=0)
+    if len(deltas) and (deltas.min() <= MISSING or deltas.max() > _INT32_MAX):
+        raise ValueError("时间戳差值超出int32范围")
+    text_blob = b''.join(texts)
+
+    body = b''.join((
+        _COUNTS.pack(count, len(times) // 2, len(text_blob)),
+        word_counts.tobytes(), starts.tobytes(), ends.tobytes(), speakers.tobytes(), text_lengths.tobytes(),
+        deltas.astype('<i4').tobytes(),
+        text_blob,
+    ))
+    if compress:
+        return MAGIC + bytes((VERSION, CODEC_GZIP)) + gzip.compress(body, compresslevel=6)
+    return MAGIC + bytes((VERSION, CODEC_RAW)) + body
+
+
+def decode_compact(data: bytes) -> List[Dict[str, Any]]:
+    """解码紧凑格式"""
+    if data[:4] != MAGIC:
+        raise ValueError("不是紧凑格式的segment_data")
+    version, codec = data[4], data[5]
+    if version != VERSION:
+        raise ValueError(f"不支持的segment_data版本: {version}")
+    body = data[6:]
+    if codec == CODEC_GZIP:
+        body = gzip.decompress(body)
+    elif codec != CODEC_RAW:
+        raise ValueError(f"不支持的segment_data压缩方式: {codec}")
+
+    count, words, text_size = _COUNTS.unpack_from(body)
+    offset = _COUNTS.size
+    columns = []
+    for _ in range(5):
+        columns.append(np.frombuffer(body, dtype='<i4', count=count, offset=offset))
+        offset += count * 4
+    word_counts, starts, ends, speakers, text_lengths = columns
+    deltas = np.frombuffer(body, dtype='<i4', count=words * 2, offset=offset)
+    offset += words * 8
+    text_blob = body[offset:offset + text_size]
+    if len(text_blob) != text_size:
+        raise ValueError("segment_data内容不完整")
+
+    pairs = np.cumsum(deltas, dtype=np.int64).reshape(-1, 2).tolist()
+    word_ends = np.cumsum(word_counts).tolist()
+    text_ends = np.cumsum(text_lengths).tolist()
+    starts = starts.tolist()
+    ends = ends.tolist()
+    speakers = speakers.tolist()
+
+    segments = []
+    word_start = text_start = 0
+    for i in range(count):
+        segments.append({
+            'text': text_blob[text_start:text_ends[i]].decode('utf-8'),
+            'timestamp': pairs[word_start:word_ends[i]],
+            'start': None if starts[i] == MISSING else starts[i],
+            'end': None if ends[i] == MISSING else ends[i],
+            'spk': speakers[i],
+        })
+        word_start, text_start = word_ends[i], text_ends[i]
+    return segments
+
+
+def is_compact(data: bytes) -> bool:
+    return data[:4] == MAGIC